@@ -4,24 +4,40 @@ import logging
 import os
 import re
 from datetime import datetime, timedelta
-from typing import List
+from functools import partial
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import (ParseMode, BotCommand, ReplyKeyboardMarkup, 
                           KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton)
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
-from aiogram.utils import executor
+from aiogram.utils import exceptions, executor
+from aiogram.dispatcher.webhook import BOT_DISPATCHER_KEY, WebhookRequestHandler
 from aiohttp import web
 
+from db import Database
+from repository import NewTask, Notification, OutboxRepository, ReminderRepository, TaskRepository, UserRepository
+from permissions import AccessMiddleware, PermissionCache, public
+from fsm_storage import create_storage
+from migrations import migrate
+from scheduler import DeadlineScheduler
+from notify import MESSAGE_LIMIT, MessageDispatcher, split_message
+from reminders import DIGEST_HEADER_RESERVE, ReminderSender
+from outbox import OutboxWorker
+from callbacks import PAGE_PREFIX, PageRef, decode_page, encode_page, filter_token
+from executors import ExecutorCache, ExecutorPicker
+from dates import format_date, format_deadline_time, parse_date, parse_deadline
+from quick_task import parse_quick_task
+from task_import import BULK_LIMIT, executor_names, parse_task_lines, read_task_file
+from sessions import SessionCache
+from page_cache import PageCache, RenderedPage
+from counters import ActiveCounters
+from export import COMPRESSIONS, csv_filename, spooled_file, spooled_stream, write_csv, write_tasks_xlsx
+
 import csv
 import io
 from aiogram.types import InputFile
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
-from aiogram.utils import exceptions
 from aiogram.types import ChatMemberUpdated, ChatType
 
 # Настройка логирования
@@ -33,94 +49,150 @@ logger = logging.getLogger(__name__)
 
 # Конфигурация
 API_TOKEN = os.getenv('apibotkey')
-DB_PATH = "/bd1/tasks.db"
-
-# Список разрешенных пользователей
-ALLOWED_USERS: List[str] = []  
-
-def update_allowed_users(conn):
-    global ALLOWED_USERS
-    cursor = conn.cursor()
-    cursor.execute('SELECT CAST(tg_user_id as INT) FROM users')
-    ALLOWED_USERS = [row[0] for row in cursor.fetchall()]
-
-# Список модераторов
-MODERATOR_USERS: List[str] = []  
-
-def update_moderator_users(conn):
-    global MODERATOR_USERS
-    cursor = conn.cursor()
-    cursor.execute("""SELECT CAST(tg_user_id as INT) FROM users WHERE is_moderator = 'moderator' """)
-    MODERATOR_USERS = [row[0] for row in cursor.fetchall()]
+DB_PATH = os.getenv('DB_PATH', "/bd1/tasks.db")
+
+# Настройки SQLite: размер пула соединений чтения, число одновременных выгрузок и PRAGMA
+DB_READERS = int(os.getenv('DB_READERS', '2'))
+DB_EXPORTERS = int(os.getenv('DB_EXPORTERS', '1'))
+DB_PRAGMAS = {
+    "synchronous": os.getenv('DB_SYNCHRONOUS', 'NORMAL'),
+    "mmap_size": int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv('DB_CACHE_SIZE', '-16000')),
+    "busy_timeout": int(os.getenv('DB_BUSY_TIMEOUT', '5000')),
+}
+
+# Хранилище состояний диалогов: sqlite (по умолчанию), redis или memory
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+
+# Ограничения исходящих сообщений (сообщений в секунду и одновременных запросов)
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', '25'))
+NOTIFY_CHAT_RATE = float(os.getenv('NOTIFY_CHAT_RATE', '1'))
+NOTIFY_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', '8'))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '4'))
+# Сессии просмотра списков задач
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '10000'))
+SESSION_TTL = int(os.getenv('SESSION_TTL', '86400'))
+# Готовые страницы списков задач
+PAGE_CACHE_SIZE = int(os.getenv('PAGE_CACHE_SIZE', '1000'))
+
+# Напоминания: digest - одно сообщение со списком задач на чат, single - по сообщению на задачу
+REMINDER_MODE = os.getenv('REMINDER_MODE', 'digest')
+# Время напоминания для сроков без времени
+REMINDER_DAY_START = datetime.strptime(os.getenv('REMINDER_DAY_START', '09:00'), "%H:%M").time()
+# Шаги напоминаний: смещения от срока в секундах через запятую, например "0,3600,86400"
+REMINDER_STEPS = [int(step) for step in os.getenv('REMINDER_STEPS', '0').split(',') if step.strip()]
+# Интервал повтора после последнего шага, пока задача не закрыта (0 - без повтора)
+REMINDER_REPEAT = int(os.getenv('REMINDER_REPEAT', '21600'))
+
+# Webhook (если WEBHOOK_HOST не задан, бот работает через long polling)
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', f"/webhook/{WEBHOOK_SECRET}" if WEBHOOK_SECRET else "/webhook")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '20'))
 
 # ID администратора (может удалять задачи)
 ADMIN_ID = int(os.getenv('admin'))
 
-# Инициализация бота и диспетчера
-bot = Bot(token=API_TOKEN, parse_mode=ParseMode.HTML)
-dp = Dispatcher(bot, storage=MemoryStorage())
-
 # Инициализация базы данных
-def init_db():
+def create_schema(conn):
+    cursor = conn.cursor()
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    creator_id TEXT,
+                    user_id TEXT,
+                    chat_id INTEGER,
+                    task_text TEXT,
+                    status TEXT DEFAULT 'новая',
+                    deadline TEXT)
+                    ''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+                    tg_user_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    username TEXT,
+                    is_moderator TEXT)
+                    ''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS tasks_log (
+                    id INTEGER,
+                    creator_id TEXT,
+                    user_id TEXT,
+                    chat_id INTEGER,
+                    task_text TEXT,
+                    status TEXT,
+                    deadline TEXT,
+                    priority TEXT,
+                    id_log INTEGER PRIMARY KEY AUTOINCREMENT)
+                    ''')
+
+    # Индексы при инициализации БД
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_chat_id ON tasks(chat_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_creator_id ON tasks(creator_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_log_id ON tasks_log(id)')
+    # Индексы по статусу и сроку заменены составными в migrations.py
+
+def init_db() -> Database:
+    """Создание схемы и пула соединений: WAL, одно соединение записи и пул чтения"""
     try:
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-        cursor = conn.cursor()
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS tasks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        creator_id TEXT,
-                        user_id TEXT,
-                        chat_id INTEGER,
-                        task_text TEXT,
-                        status TEXT DEFAULT 'новая',
-                        deadline TEXT)
-                        ''')
-        conn.commit()
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        tg_user_id TEXT PRIMARY KEY,
-                        name TEXT,
-                        username TEXT,
-                        is_moderator TEXT)
-                        ''')
-        conn.commit()
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS tasks_log (
-                        id INTEGER,
-                        creator_id TEXT,
-                        user_id TEXT,
-                        chat_id INTEGER,
-                        task_text TEXT,
-                        status TEXT,
-                        deadline TEXT,
-                        priority TEXT,
-                        id_log INTEGER PRIMARY KEY AUTOINCREMENT)
-                        ''')
-
-        # Индексы при инициализации БД
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_chat_id ON tasks(chat_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_creator_id ON tasks(creator_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks(deadline)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_log_id ON tasks_log(id)')
-        
-        conn.commit()
-      
-        return conn
+        database = Database(DB_PATH, readers=DB_READERS, pragmas=DB_PRAGMAS, exporters=DB_EXPORTERS)
+        database.run_sync(create_schema)
+        database.run_sync(migrate)
+        return database
     except sqlite3.Error as e:
         logger.error(f"Ошибка при инициализации БД: {e}")
         raise
 
-# Для фоновых задач
-def create_db_connection():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-conn = init_db()
-update_allowed_users(conn)
-update_moderator_users(conn)
+db = init_db()
+tasks_repo = TaskRepository(db)
+users_repo = UserRepository(db)
+reminders_repo = ReminderRepository(db)
+outbox_repo = OutboxRepository(db)
 
-background_conn = create_db_connection()
+# Инициализация бота и диспетчера
+bot = Bot(token=API_TOKEN, parse_mode=ParseMode.HTML)
+dp = Dispatcher(bot, storage=create_storage(FSM_STORAGE, db))
+
+# Уведомления и напоминания идут через общий ограничитель скорости
+notifier = MessageDispatcher(bot, global_rate=NOTIFY_GLOBAL_RATE, chat_rate=NOTIFY_CHAT_RATE,
+                             concurrency=NOTIFY_CONCURRENCY)
+
+# Уведомления другим пользователям пишутся в outbox вместе с задачей и отправляются в фоне
+outbox = OutboxWorker(outbox_repo, notifier, workers=OUTBOX_WORKERS)
+tasks_repo.subscribe(outbox.wake)
+
+
+def assignment_notifications(executor_tg_id, author_id, text, parse_mode=None):
+    """Уведомление исполнителю о назначении, если исполнитель - не сам автор"""
+    if executor_tg_id is None or executor_tg_id == str(author_id):
+        return []
+    return [Notification(executor_tg_id, text, f"assign:{{task_id}}:{executor_tg_id}", parse_mode)]
+
+def digest_notifications(chat_id, header: str, entries, key: str):
+    """Одно уведомление со списком записей; длинный список - несколькими сообщениями"""
+    parts = split_message(entries, limit=MESSAGE_LIMIT - DIGEST_HEADER_RESERVE)
+    return [Notification(chat_id, header + part, f"{key}:{number}", ParseMode.HTML) for number, part in enumerate(parts)]
+
+# Клавиатуры выбора исполнителя собираются один раз и сбрасываются при изменении задач
+executor_cache = ExecutorCache(tasks_repo)
+tasks_repo.subscribe(executor_cache.on_task_change)
+
+PICK_NEW_TASK = ExecutorPicker("executor_select", ("✏️ Ввести @username вручную", "executor_select|manual"),
+                               include_done=True, none_data=None)
+PICK_STATUS = ExecutorPicker("executor_for_status", ("✏️ Ввести ID задачи вручную", "status_manual_id"))
+PICK_TEXT_EDIT = ExecutorPicker("text_edit_executor", ("✏️ Ввести ID задачи вручную", "text_edit_manual_id"),
+                                none_data="none")
+PICK_EXECUTOR_FILTER = ExecutorPicker("executor_filter", ("✏️ Ввести ID задачи", "executor_manual_id"))
+PICK_NEW_EXECUTOR = ExecutorPicker("executor_choice", ("✏️ Ввести вручную", "executor_manual_input"),
+                                   include_done=True, none_data=None, icon=False)
+PICK_DEADLINE = ExecutorPicker("deadline_filter", ("✏️ Ввести ID задачи", "deadline_manual_id"))
+PICK_LIST = ExecutorPicker("listtasks_executor")
+
+# Права доступа: одна проверка в middleware вместо проверки в каждом обработчике
+permissions = PermissionCache(ADMIN_ID)
+dp.middleware.setup(AccessMiddleware(permissions))
 
 # ======================
 # КЛАВИАТУРЫ И ИНТЕРФЕЙС
@@ -190,6 +262,7 @@ async def set_bot_commands(bot: Bot):
     commands = [
         BotCommand(command="/newtask", description="Создать задачу"),
         BotCommand(command="/quicktask", description="Быстрая задача"),
+        BotCommand(command="/bulktask", description="Несколько задач сразу"),
         BotCommand(command="/setstatus", description="Изменить статус"),
         BotCommand(command="/settext", description="Изменить задачу"),
         BotCommand(command="/setexecutor", description="Изменить исполнителя"),
@@ -205,16 +278,13 @@ async def set_bot_commands(bot: Bot):
         BotCommand(command="/deletetask", description="Удалить задачу (админ)"),
         BotCommand(command="/export4", description="Список пользователей (админ)"),
         BotCommand(command="/adduser", description="Добавить пользователя (админ)"),
-        BotCommand(command="/removeuser", description="Удалить пользователя (админ)")
+        BotCommand(command="/removeuser", description="Удалить пользователя (админ)"),
+        BotCommand(command="/recount", description="Пересчитать счетчики задач (админ)")
     ]
     await bot.set_my_commands(commands)
 
 @dp.message_handler(commands=["start"])
 async def start_command(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS and message.from_user.id != ADMIN_ID:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type == "private":
         await bot.send_message(chat_id=message.chat.id, text=
             "Выберите команду:",
@@ -229,23 +299,14 @@ async def start_command(message: types.Message):
 # Команды вызывают те же функции, что и кнопки
 @dp.message_handler(commands=["newtask"])
 async def cmd_new_task(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     await new_task_start(message)  # Тот же обработчик, что и для кнопки "➕ Новая задача"
 
 @dp.message_handler(commands=["quicktask"])
 async def cmd_quick_task(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     await quick_task_start(message)  # Тот же обработчик, что и для кнопки "⚡ Быстрая задача"
 
 @dp.message_handler(commands=["setstatus"])
 async def cmd_set_status(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Менять статус можно только в ЛС")
         return
@@ -253,9 +314,6 @@ async def cmd_set_status(message: types.Message):
 
 @dp.message_handler(commands=["settext"])
 async def cmd_set_status(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Менять задачу можно только в ЛС")
         return
@@ -263,9 +321,6 @@ async def cmd_set_status(message: types.Message):
 
 @dp.message_handler(commands=["setexecutor"])
 async def cmd_set_executor(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Менять исполнителя можно только в ЛС")
         return
@@ -273,9 +328,6 @@ async def cmd_set_executor(message: types.Message):
 
 @dp.message_handler(commands=["setdeadline"])
 async def cmd_set_deadline(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Менять срок можно только в ЛС")
         return
@@ -283,8 +335,6 @@ async def cmd_set_deadline(message: types.Message):
 
 @dp.message_handler(commands=["listtasks"])
 async def cmd_list_tasks(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Выводить список можно только в ЛС")
         return  
@@ -292,8 +342,6 @@ async def cmd_list_tasks(message: types.Message):
 
 @dp.message_handler(commands=["listtasksdate"])
 async def cmd_list_tasks_date(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Выводить список можно только в ЛС")
         return  
@@ -301,23 +349,14 @@ async def cmd_list_tasks_date(message: types.Message):
 
 @dp.message_handler(commands=["export"])
 async def cmd_export_tasks(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     await export_tasks_to_csv(message)  # Аналогично кнопке "📤 Экспорт задач"
 
 @dp.message_handler(commands=["export2"])
 async def cmd_export_tasks(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     await export_tasks_to_csv2(message)  # Аналогично кнопке "📤 Экспорт (с исполненными)"
 
 @dp.message_handler(commands=["cancel"])
 async def cmd_cancel(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
     await cancel_handler(message)  # Тот же обработчик, что и для кнопки "⛔ Отмена"
 
 # ======================
@@ -336,10 +375,6 @@ class TaskDeletion(StatesGroup):
 
 @dp.message_handler(lambda message: message.text == "⛔ Отмена", state='*')
 async def cancel_handler(message: types.Message, state: FSMContext):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
-      
     current_state = await state.get_state()
     if current_state:
         await state.finish()
@@ -349,33 +384,12 @@ async def cancel_handler(message: types.Message, state: FSMContext):
     else:
         await message.reply("Действие отменено. Возвращаемся к стартовому меню.", reply_markup=menu_keyboard)
 
-def format_date(date_str):
-    try:
-        # Пытаемся распарсить срок как дату со временем
-        dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M")
-    except Exception:
-        try:
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-        except Exception:
-            return date_str
-
-    # Если время равно 00:00, выводим только дату
-    if dt.hour == 0 and dt.minute == 0:
-        return dt.strftime("%d.%m.%Y")
-    else:
-        # Выводим дату с временем в скобках, например "10.05.2025 (12:30)"
-        return f"{dt.strftime('%d.%m.%Y')} ({dt.strftime('%H:%M')})"
-
 # ======================
 # СОЗДАНИЕ ЗАДАЧ
 # ======================
 
 @dp.message_handler(lambda message: message.text == "➕ Новая задача")
 async def new_task_start(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
@@ -386,19 +400,8 @@ async def new_task_start(message: types.Message):
 
 @dp.message_handler(state=TaskCreation.waiting_for_title)
 async def process_title(message: types.Message, state: FSMContext):
-    # Получаем список исполнителей из БД
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status <> 'удалено' LIMIT 20")
-    executors = [executor[0] for executor in cursor.fetchall() if executor[0]]
-
-    # Создаём inline-клавиатуру (замена ReplyKeyboardMarkup)
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    for i in range(0, len(executors), 2):
-        row_buttons = [InlineKeyboardButton(f"👤 {name}", callback_data=f"executor_select|{name}")
-                       for name in executors[i:i+2]]
-        keyboard.row(*row_buttons)
-    # Кнопка для ручного ввода
-    keyboard.add(InlineKeyboardButton("✏️ Ввести @username вручную", callback_data="executor_select|manual"))
+    # Клавиатура исполнителей с кнопкой ручного ввода
+    _, keyboard = await executor_cache.keyboard(PICK_NEW_TASK)
 
     await bot.send_message(
         chat_id=message.chat.id,
@@ -448,9 +451,10 @@ async def process_executor(message: types.Message, state: FSMContext):
 async def process_deadline(callback_query: types.CallbackQuery, state: FSMContext):
     """Обработка выбора дедлайна"""
     if callback_query.data == "set_deadline_custom":
-        # Сохраняем callback_query в состоянии
-        await state.update_data(callback_query=callback_query)
-        await bot.send_message(chat_id=callback_query.from_user.id, text="⏳ Введите срок в формате DD.MM.YYYY:")
+        # Запоминаем чат с клавиатурой, ответ придет туда же
+        await state.update_data(reply_chat_id=callback_query.message.chat.id,
+                                reply_chat_type=callback_query.message.chat.type)
+        await bot.send_message(chat_id=callback_query.from_user.id, text="⏳ Введите срок в формате DD.MM.YYYY (можно «завтра 18:00», «пт», «через 3 дня»):")
         return
     elif callback_query.data == "set_deadline_none":
         await save_task(callback_query, state, deadline=None)
@@ -462,35 +466,9 @@ async def process_deadline(callback_query: types.CallbackQuery, state: FSMContex
 async def process_custom_deadline(message: types.Message, state: FSMContext):
     """Обработка ввода собственного срока"""
     try:
-        # Попытка парсинга по первому шаблону
-        try:
-            dt = datetime.strptime(message.text.strip(), "%Y-%m-%d %H:%M")
-        except ValueError:
-            try:
-                dt = datetime.strptime(message.text.strip(), "%d.%m.%Y %H:%M")
-            except ValueError:
-                try:
-                    dt = datetime.strptime(message.text.strip(), "%d.%m.%y %H:%M")
-                except ValueError:
-                    try:
-                        dt = datetime.strptime(message.text.strip(), "%Y-%m-%d")
-                    except ValueError:
-                        # Если не получилось, пробуем другой формат
-                        try:
-                            dt = datetime.strptime(message.text.strip(), "%d.%m.%Y")
-                        except ValueError:
-                            dt = datetime.strptime(message.text.strip(), "%d.%m.%y")
-        new_deadline = dt.strftime("%Y-%m-%d %H:%M")
-        
-        # Получаем сохраненный callback_query из состояния (если он есть)
-        user_data = await state.get_data()
-        callback_query = user_data.get('callback_query')
-        
-        if callback_query:
-            await save_task(callback_query, state, new_deadline)
-        else:
-            await save_task(message, state, new_deadline)
-            
+        new_deadline = parse_deadline(message.text)
+        await save_task(message, state, new_deadline)
+
     except ValueError:
         # Определяем клавиатуру в зависимости от типа чата
         reply_markup = menu_keyboard if message.chat.type == "private" else group_menu_keyboard
@@ -509,25 +487,14 @@ async def save_task(message_obj, state: FSMContext, deadline: str):
             chat_id = message_obj.from_user.id
             chat_id2 = message_obj.message.chat.id
             chat_type = message_obj.message.chat.type
-            message_to_reply = message_obj.message
         else:  # Это обычное сообщение (types.Message)
             chat_id = message_obj.from_user.id
-            chat_id2 = message_obj.message.chat.id
-            chat_type = message_obj.chat.type
-            message_to_reply = message_obj
+            chat_id2 = user_data.get('reply_chat_id', message_obj.chat.id)
+            chat_type = user_data.get('reply_chat_type', message_obj.chat.type)
 
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO tasks (user_id, chat_id, task_text, deadline, creator_id) VALUES (?, ?, ?, ?, ?)",
-            (executor, chat_id, task_text, deadline, chat_id)
-        )
-        conn.commit()
-
-        cursor.execute("SELECT tg_user_id FROM users WHERE username=?",(executor,))
-        username = cursor.fetchone()
+        executor_tg_id = await users_repo.tg_id_by_username(executor)
 
-        cursor.execute("SELECT username FROM users WHERE tg_user_id=?",(chat_id,))
-        creator = cursor.fetchone()
+        creator = await users_repo.username_by_tg_id(chat_id)
 
         response = (
             f"📌 <b>{task_text}</b>\n"
@@ -535,7 +502,7 @@ async def save_task(message_obj, state: FSMContext, deadline: str):
         )
 
         response2 = (
-            f"🔔 Вам назначена новая задача от {creator[0]}:\n\n"
+            f"🔔 Вам назначена новая задача от {creator}:\n\n"
             f"📌 <b>{task_text}</b>\n"
         )
         if deadline:
@@ -544,23 +511,22 @@ async def save_task(message_obj, state: FSMContext, deadline: str):
         else:
             response += "⏳ Без срока"
             response2 += "⏳ Без срока"
+
+        # Уведомление исполнителю пишется в outbox в той же транзакции, что и задача
+        await tasks_repo.create(executor, chat_id, task_text, deadline, chat_id,
+                                notifications=assignment_notifications(executor_tg_id, chat_id, response2,
+                                                                       ParseMode.HTML))
             
         # Определяем клавиатуру в зависимости от типа чата
         reply_markup = menu_keyboard if chat_type == "private" else group_menu_keyboard
         
         # Отправляем сообщение с клавиатурой
-        await bot.send_message(
-            chat_id=chat_id2,
-            text=response,
+        await notifier.send(
+            chat_id2,
+            response,
             parse_mode=ParseMode.HTML,
             reply_markup=reply_markup
         )
-        if username is not None and username[0] is not None and username[0] != str(chat_id):
-            await bot.send_message(
-                chat_id=username[0],
-                text=response2,
-                parse_mode=ParseMode.HTML
-            )
   
     except sqlite3.Error as e:
         logger.error(f"Ошибка БД при сохранении задачи: {e}")
@@ -573,77 +539,16 @@ async def save_task(message_obj, state: FSMContext, deadline: str):
 # СОЗДАНИЕ ЗАДАЧИ ИЗ ОДНОГО СООБЩЕНИЯ
 # ======================
 
-def parse_deadline(deadline_str: str) -> str:
-    """Преобразует текстовое представление даты в формат YYYY-MM-DD"""
-    today = datetime.today()
-    weekday_map = {
-        'пн': 0, 'пон': 0, 'понедельник': 0,
-        'вт': 1, 'вто': 1, 'вторник': 1,
-        'ср': 2, 'сре': 2, 'среда': 2,
-        'чт': 3, 'чет': 3, 'четверг': 3,
-        'пт': 4, 'пят': 4, 'пятница': 4,
-        'сб': 5, 'суб': 5, 'суббота': 5,
-        'вс': 6, 'вос': 6, 'воскресенье': 6
-    }
-    
-    lower_str = deadline_str.lower()
-    
-    if lower_str == 'сегодня':
-        return today.strftime("%Y-%m-%d")
-    
-    if lower_str == 'завтра':
-        return (today + timedelta(days=1)).strftime("%Y-%m-%d")
-    
-    if lower_str in weekday_map:
-        target_weekday = weekday_map[lower_str]
-        current_weekday = today.weekday()
-        
-        days_ahead = target_weekday - current_weekday
-        if days_ahead <= 0:
-            days_ahead += 7
-            
-        return (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
-
-    # Попытка парсинга по первому шаблону
-    try:
-        dt = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except ValueError:
-        try:
-            dt = datetime.strptime(deadline_str, "%d.%m.%Y %H:%M")
-            return dt.strftime("%Y-%m-%d %H:%M")
-        except ValueError:
-            try:
-                dt = datetime.strptime(deadline_str, "%d.%m.%y %H:%M")
-                return dt.strftime("%Y-%m-%d %H:%M")
-            except ValueError:
-                try:
-                    dt = datetime.strptime(deadline_str, "%Y-%m-%d")
-                    return dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    # Если не получилось, пробуем другой формат
-                    try:
-                        dt = datetime.strptime(deadline_str, "%d.%m.%Y")
-                        return dt.strftime("%Y-%m-%d")
-                    except ValueError:
-                        try:
-                            dt = datetime.strptime(deadline_str, "%d.%m.%y")
-                            return dt.strftime("%Y-%m-%d")
-                        except ValueError:
-                            raise ValueError("Неверный формат даты. Используйте DD.MM.YYYY")
-
 class QuickTaskCreation(StatesGroup):
     waiting_for_full_data = State()
 
 @dp.message_handler(lambda message: message.text == "⚡ Быстрая задача")
 async def quick_task_start(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
     """Начало быстрого создания задачи"""
     await bot.send_message(chat_id=message.from_user.id, text=
         "📝 Введите данные в формате:\n"
-        "текст задачи @исполнитель //срок"
+        "текст задачи @исполнитель //срок\n"
+        "Можно указать несколько исполнителей, #теги и приоритет (!! или !1, !2, !3)"
     )
     await QuickTaskCreation.waiting_for_full_data.set()
 
@@ -653,68 +558,44 @@ async def process_quick_task(message: types.Message, state: FSMContext):
     """Обработка быстрого создания задачи"""
     try:
         text = message.text if message.text else (message.caption if message.caption else "")
-        
-        # Парсим данные с помощью регулярных выражений
-        if text and text.startswith('@'):
-            # Захватить всё до появления '//' или до конца строки.
-            task_match = re.search(r'^(.*?)(?=//|$)', text)
-        else:
-            # Захватывать всё от начала до пробела перед @, если он есть, или до конца строки.
-            task_match = re.search(r'^(.*?)(\s@|$)', text)
-        executor_match = re.search(r'(@[^\s]+)', text)
-        deadline_match = re.search(r'//\s*(.+)', text)
-        deadline_raw = deadline_match.group(1) if deadline_match else None
-
-        task_text = task_match.group(1).strip() if task_match else None
-        executor = executor_match.group(0).strip() if executor_match else None
-        deadline = deadline_match.group(1) if deadline_match else None
-
-        # Валидация обязательного поля
-        if not task_text:
-            raise ValueError("Не указан текст задачи")
+        quick = parse_quick_task(text)
 
         # Проверка формата даты
-        deadline_raw = deadline_match.group(1) if deadline_match else None
         deadline = None
-        if deadline_raw:
+        if quick.deadline:
             try:
-                deadline = parse_deadline(deadline_raw)
+                deadline = parse_deadline(quick.deadline)
             except ValueError as e:
                 raise ValueError(f"Ошибка в сроке: {str(e)}")
 
-        # Сохранение в БД
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO tasks (user_id, chat_id, task_text, deadline, creator_id) VALUES (?, ?, ?, ?, ?)",
-            (executor, message.from_user.id, task_text, deadline, message.from_user.id)
-        )
-        conn.commit()
-
-        cursor.execute("SELECT tg_user_id FROM users WHERE username=?",(executor,))
-        username = cursor.fetchone()
-
-        cursor.execute("SELECT username FROM users WHERE tg_user_id=?",(message.from_user.id,))
-        creator = cursor.fetchone()
+        creator = await users_repo.username_by_tg_id(message.from_user.id)
+        deadline_text = format_date(deadline) if deadline else 'не указан'
 
         response = (
-            f"📌 <b>{task_text}</b>\n"
-            f"👤 {executor if executor else 'не указан'} ⏳ {format_date(deadline) if deadline else 'не указан'}"
+            f"📌 <b>{quick.text}</b>\n"
+            f"👤 {', '.join(quick.executors) if quick.executors else 'не указан'} ⏳ {deadline_text}"
         )
+        if quick.priority:
+            response += f" ❗ {quick.priority}"
 
         response2 = (
-            f"🔔 Вам назначена новая задача от {creator[0]}:\n\n"
-            f"📌 <b>{task_text}</b>\n"
-            f"⏳ {format_date(deadline) if deadline else 'не указан'}"
+            f"🔔 Вам назначена новая задача от {creator}:\n\n"
+            f"📌 <b>{quick.text}</b>\n"
+            f"⏳ {deadline_text}"
+        )
+
+        # По задаче на каждого исполнителя - одной транзакцией вместе с уведомлениями
+        notifications = []
+        for executor in quick.executors:
+            executor_tg_id = await users_repo.tg_id_by_username(executor)
+            notifications += assignment_notifications(executor_tg_id, message.from_user.id, response2)
+        await tasks_repo.create_many(
+            [NewTask(executor, quick.text, deadline, quick.priority) for executor in quick.executors or (None,)],
+            message.from_user.id, message.from_user.id, notifications
         )
           
         await bot.send_message(chat_id=message.from_user.id, text=response)
 
-        if username is not None and username[0] is not None and username[0] != str(message.from_user.id):
-          await bot.send_message(
-              chat_id=username[0],
-              text=response2
-          )
-
     except ValueError as e:
         await bot.send_message(chat_id=message.from_user.id,text=f"⚠ Ошибка: {str(e)}")
     except sqlite3.Error as e:
@@ -726,6 +607,98 @@ async def process_quick_task(message: types.Message, state: FSMContext):
     finally:
         await state.finish()
 
+# ======================
+# МАССОВОЕ СОЗДАНИЕ ЗАДАЧ
+# ======================
+
+# Файлы больше этого размера не скачиваются
+BULK_FILE_LIMIT = 5 * 1024 * 1024
+BULK_ERRORS_SHOWN = 10
+
+class BulkTaskCreation(StatesGroup):
+    waiting_for_data = State()
+
+@dp.message_handler(commands=["bulktask"])
+async def bulk_task_start(message: types.Message):
+    """Начало массового создания задач"""
+    await bot.send_message(chat_id=message.from_user.id, text=
+        "📝 Отправьте задачи по одной в строке в формате быстрой задачи:\n"
+        "текст задачи @исполнитель //срок\n\n"
+        f"или файл CSV/XLSX с колонками как в /export (не больше {BULK_LIMIT} задач)"
+    )
+    await BulkTaskCreation.waiting_for_data.set()
+
+def bulk_notifications(tasks, executor_ids: dict, author_id, creator) -> list:
+    """Одно уведомление на исполнителя со всеми его задачами (длинное - несколькими сообщениями)"""
+    by_executor = {}
+    for task in tasks:
+        tg_id = executor_ids.get(task.executor)
+        if tg_id is not None and tg_id != str(author_id):
+            by_executor.setdefault(tg_id, []).append(
+                f"📌 <b>{task.task_text}</b>" + (f"\n⏳ {format_date(task.deadline)}" if task.deadline else "")
+            )
+    notifications = []
+    for tg_id, entries in by_executor.items():
+        notifications += digest_notifications(tg_id, f"🔔 Вам назначено задач от {creator}: {len(entries)}\n\n",
+                                              entries, f"bulk:{{task_id}}:{tg_id}")
+    return notifications
+
+@dp.message_handler(state=BulkTaskCreation.waiting_for_data,
+                    content_types=[types.ContentType.TEXT, types.ContentType.DOCUMENT])
+async def process_bulk_tasks(message: types.Message, state: FSMContext):
+    """Создание задач из многострочного сообщения или файла одной транзакцией"""
+    try:
+        if message.document:
+            if message.document.file_size and message.document.file_size > BULK_FILE_LIMIT:
+                raise ValueError("Файл слишком большой")
+            data = io.BytesIO()
+            await message.document.download(destination_file=data)
+            # В /export исполнитель записан именем пользователя: сопоставляем с @username
+            names = executor_names(await users_repo.all())
+            # Разбор книги Excel - в отдельном потоке, чтобы не держать цикл событий
+            tasks, errors = await asyncio.get_running_loop().run_in_executor(
+                None, read_task_file, message.document.file_name or "", data.getvalue(), names
+            )
+        else:
+            tasks, errors = parse_task_lines(message.text)
+
+        if errors:
+            shown = "\n".join(errors[:BULK_ERRORS_SHOWN])
+            more = f"\n... и еще {len(errors) - BULK_ERRORS_SHOWN}" if len(errors) > BULK_ERRORS_SHOWN else ""
+            raise ValueError(f"задачи не созданы:\n{shown}{more}")
+        if not tasks:
+            raise ValueError("Не найдено ни одной задачи")
+
+        executor_ids = {}
+        for executor in {task.executor for task in tasks if task.executor}:
+            executor_ids[executor] = await users_repo.tg_id_by_username(executor)
+        creator = await users_repo.username_by_tg_id(message.from_user.id)
+
+        created = await tasks_repo.create_many(
+            tasks, message.from_user.id, message.from_user.id,
+            bulk_notifications(tasks, executor_ids, message.from_user.id, creator)
+        )
+
+        counts = {}
+        for task in created:
+            counts[task.user_id] = counts.get(task.user_id, 0) + 1
+        summary = "\n".join(f"👤 {executor or 'Без исполнителя'}: {count}" for executor, count in counts.items())
+        await bot.send_message(
+            chat_id=message.from_user.id,
+            text=f"✅ Создано задач: {len(created)} (🔹{created[0].id} - 🔹{created[-1].id})\n\n{summary}"
+        )
+
+    except ValueError as e:
+        await bot.send_message(chat_id=message.from_user.id, text=f"⚠ Ошибка: {str(e)}")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка БД: {e}")
+        await bot.send_message(chat_id=message.from_user.id, text="⚠ Ошибка при сохранении задач")
+    except Exception as e:
+        logger.error(f"Ошибка при массовом создании задач: {e}", exc_info=True)
+        await bot.send_message(chat_id=message.from_user.id, text="⚠ Не удалось прочитать задачи")
+    finally:
+        await state.finish()
+
 # ======================
 # ИЗМЕНЕНИЕ СТАТУСА
 # ======================
@@ -737,10 +710,6 @@ class StatusUpdate(StatesGroup):
 
 @dp.message_handler(lambda message: message.text == "🔄 Изменить статус")
 async def status_select_task(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return 
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
@@ -748,34 +717,11 @@ async def status_select_task(message: types.Message):
     """Показ списка задач для изменения статуса"""
     
     # Сначала получаем список уникальных исполнителей
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT DISTINCT user_id FROM tasks 
-        WHERE status NOT IN ('удалено', 'исполнено')
-        LIMIT 20
-    """)
-    
-    executors = cursor.fetchall()
+    executors, keyboard = await executor_cache.keyboard(PICK_STATUS)
     
     if not executors:
         await message.reply("❌ Нет задач для изменения статуса")
         return
-
-    keyboard = InlineKeyboardMarkup(row_width=2)  # Устанавливаем количество кнопок в ряду
-    
-    # Разбиваем исполнителей на группы по 2
-    for i in range(0, len(executors), 2):
-        row = executors[i:i+2]  # Берем группу из 2 элементов
-        row_buttons = [
-            InlineKeyboardButton(
-                f"👤 {executor[0] if executor[0] else 'Без исполнителя'}",
-                callback_data=f"executor_for_status|{executor[0]}"
-            ) for executor in row
-        ]
-        keyboard.add(*row_buttons)  # Добавляем группу кнопок в клавиатуру
-    
-    # Добавляем кнопку для ввода ID вручную
-    keyboard.add(InlineKeyboardButton("✏️ Ввести ID задачи вручную", callback_data="status_manual_id"))
     
     await message.reply("Выберите исполнителя для фильтрации задач:", reply_markup=keyboard)
     await StatusUpdate.waiting_for_executor.set()
@@ -790,33 +736,17 @@ async def process_executor_selection(callback_query: types.CallbackQuery, state:
 async def show_filtered_tasks(message_obj, executor):
     """Показать задачи выбранного исполнителя"""
     try:
-        cursor = conn.cursor()
-        if executor.lower() == "none":  # Проверяем, ищем ли задачи без исполнителя
-            cursor.execute("""
-                SELECT id, task_text, status 
-                FROM tasks
-                WHERE user_id IS NULL AND status NOT IN ('удалено', 'исполнено')
-                ORDER BY id DESC 
-                LIMIT 20
-            """)
-        else:
-            cursor.execute("""
-                SELECT id, task_text, status 
-                FROM tasks
-                WHERE user_id = ? AND status NOT IN ('удалено', 'исполнено')
-                ORDER BY id DESC 
-                LIMIT 20
-            """, (executor,))
-        
-        tasks = cursor.fetchall()
+        tasks = await tasks_repo.list_for_executor(executor)
 
         keyboard = InlineKeyboardMarkup(row_width=1)
-        for task_id, task_text, status in tasks:
+        for task in tasks:
             keyboard.add(InlineKeyboardButton(
-                f"{task_text[:30]}... (🔹: {task_id}, 🔄: {status})", 
-                callback_data=f"status_task_{task_id}"
+                f"{task.task_text[:30]}... (🔹: {task.id}, 🔄: {task.status})", 
+                callback_data=f"status_task_{task.id}"
             ))
         
+        if len(tasks) > 1:
+            keyboard.add(multi_select_button("status"))
         keyboard.add(InlineKeyboardButton("✏️ Ввести ID вручную", callback_data="status_manual_id"))
         
         await bot.send_message(
@@ -834,7 +764,7 @@ async def process_selected_task_status(callback_query: types.CallbackQuery, stat
     """Обработка выбранной задачи для изменения статуса"""
     task_id = callback_query.data.split("_")[2]  # Формат: status_task_123
     await state.update_data(task_id=task_id)
-    await show_status_options(callback_query.message, task_id)  # Передаем task_id
+    await show_status_options(callback_query.message, [task_id])
     await StatusUpdate.waiting_for_status_choice.set()
 
 @dp.callback_query_handler(lambda c: c.data == "status_manual_id", state=[StatusUpdate.waiting_for_executor, StatusUpdate.waiting_for_task_selection])
@@ -848,35 +778,36 @@ async def process_manual_task_id_status(message: types.Message, state: FSMContex
     """Обработка ручного ввода ID задачи для изменения статуса"""
     try:
         task_id = int(message.text)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM tasks WHERE id=?", (task_id,))
-        if not cursor.fetchone():
+        if not await tasks_repo.exists(task_id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача не найдена!")
             await state.finish()
             return
         
         await state.update_data(task_id=task_id)
-        await show_status_options(message, task_id)  # Передаем task_id
+        await show_status_options(message, [task_id])
         await StatusUpdate.waiting_for_status_choice.set()
     except ValueError:
         await bot.send_message(chat_id=message.from_user.id, text="⚠ Введите числовой ID задачи!")
         await state.finish()
 
-async def show_status_options(message_obj, task_id):
-    """Показать варианты статусов"""
+async def show_status_options(message_obj, task_ids):
+    """Показать варианты статусов для одной или нескольких выбранных задач"""
     keyboard = InlineKeyboardMarkup(row_width=3)
 
-    cursor = conn.cursor()
-    cursor.execute("SELECT creator_id FROM tasks WHERE id=?", (task_id,))
-    task_creator = cursor.fetchone()
-    if int(task_creator[0]) == message_obj.chat.id or message_obj.chat.id in MODERATOR_USERS:
+    if len(task_ids) == 1:
+        tasks = [await tasks_repo.get(task_ids[0])]
+        target = task_ids[0]
+    else:
+        tasks = await tasks_repo.get_active_many(task_ids)
+        target = "all"  # id задач берутся из состояния
+    if permissions.is_moderator(message_obj.chat.id) or all(task.creator_id == str(message_obj.chat.id) for task in tasks):
         statuses = ["новая", "в работе", "ожидает доклада", "исполнено", "удалено"]
     else:
         statuses = ["новая", "в работе", "ожидает доклада", "исполнено"]
     
     buttons = [InlineKeyboardButton(
         status, 
-        callback_data=f"set_status_{task_id}_{status}"
+        callback_data=f"set_status_{target}_{status}"
     ) for status in statuses]
     keyboard.add(*buttons)
     await bot.send_message(chat_id=message_obj.chat.id, text="📌 Выберите новый статус:", reply_markup=keyboard)
@@ -887,31 +818,27 @@ async def process_status_update(callback_query: types.CallbackQuery, state: FSMC
     try:
         # Извлекаем task_id и новый статус из callback_data
         _, _, task_id, new_status = callback_query.data.split("_")
+        if task_id == "all":
+            user_data = await state.get_data()
+            await save_status_many(callback_query.from_user.id, user_data['task_ids'], new_status)
+            await state.finish()
+            return
         
-        cursor = conn.cursor()
-      
-        cursor.execute("SELECT creator_id, task_text FROM tasks WHERE id=?", (task_id,))
-        result = cursor.fetchone()
+        task = await tasks_repo.get(task_id)
         
-        if result:
-            creator, task_text = result
+        if task:
+            creator, task_text = task.creator_id, task.task_text
       
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id 
-            FROM tasks 
-            WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET status=?, chat_id=? WHERE id=?", (new_status, callback_query.from_user.id, task_id))
-        conn.commit()
-        
-        await bot.send_message(chat_id=callback_query.from_user.id, text=f"✅ Статус задачи {task_id} изменен на '{new_status}'")
-        
+        notifications = []
         if creator is not None and creator != str(callback_query.from_user.id) and new_status in ('исполнено', 'удалено'):
-          await bot.send_message(
-              chat_id=creator,
-              text=f"✅ Статус задачи {task_id} ({task_text}) изменен на '{new_status}'"
-          )
+            notifications.append(Notification(
+                creator, f"✅ Статус задачи {task_id} ({task_text}) изменен на '{new_status}'",
+                f"status:{{task_id}}:{new_status}"
+            ))
+
+        await tasks_repo.set_status(task_id, new_status, callback_query.from_user.id, notifications=notifications)
+        
+        await notifier.send(callback_query.from_user.id, f"✅ Статус задачи {task_id} изменен на '{new_status}'")
 
         await state.finish()
     except Exception as e:
@@ -933,40 +860,19 @@ class TaskTextEditing(StatesGroup):
 
 @dp.message_handler(lambda message: message.text == "✏️ Изменить задачу")
 async def text_edit_start(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
     if message.chat.type != "private":
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
         return
 
-    cursor = conn.cursor()
     # Если пользователь — модератор, показываем всех исполнителей, иначе – только исполнителей задач, созданных им
-    if message.from_user.id in MODERATOR_USERS:
-        cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status NOT IN ('удалено','исполнено') LIMIT 20")
+    if permissions.is_moderator(message.from_user.id):
+        executors, keyboard = await executor_cache.keyboard(PICK_TEXT_EDIT)
     else:
-        cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE creator_id=? AND status NOT IN ('удалено','исполнено') LIMIT 20", (message.from_user.id,))
-    executors = cursor.fetchall()
+        executors, keyboard = await executor_cache.keyboard(PICK_TEXT_EDIT, creator_id=message.from_user.id)
 
     if not executors:
         await bot.send_message(chat_id=message.from_user.id, text="❌ Нет задач для изменения")
         return
-
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    buttons = []
-    # Формируем кнопки для каждого исполнителя
-    for (executor,) in executors:
-        if executor:
-            label = f"👤 {executor}"
-            data = executor
-        else:
-            label = "👤 Без исполнителя"
-            data = "none"
-        buttons.append(InlineKeyboardButton(label, callback_data=f"text_edit_executor|{data}"))
-    # Добавляем кнопки исполнителей одним вызовом, чтобы они распределились по рядам согласно row_width
-    keyboard.add(*buttons)
-    # Добавляем отдельный ряд для ручного ввода ID задачи
-    keyboard.add(InlineKeyboardButton("✏️ Ввести ID задачи вручную", callback_data="text_edit_manual_id"))
     
     await bot.send_message(
         chat_id=message.from_user.id,
@@ -983,18 +889,10 @@ async def process_text_edit_executor(callback_query: types.CallbackQuery, state:
     await state.update_data(executor=executor)
     
     # После выбора исполнителя выводим список задач, отфильтрованных по выбранному исполнителю
-    cursor = conn.cursor()
-    if executor.lower() == "none":
-        if callback_query.from_user.id in MODERATOR_USERS:
-            cursor.execute("SELECT id, task_text FROM tasks WHERE user_id IS NULL AND status NOT IN ('удалено','исполнено') LIMIT 20")
-        else:
-            cursor.execute("SELECT id, task_text FROM tasks WHERE user_id IS NULL AND creator_id=? AND status NOT IN ('удалено','исполнено') LIMIT 20", (callback_query.from_user.id,))
+    if permissions.is_moderator(callback_query.from_user.id):
+        tasks = await tasks_repo.list_for_executor(executor)
     else:
-        if callback_query.from_user.id in MODERATOR_USERS:
-            cursor.execute("SELECT id, task_text FROM tasks WHERE user_id=? AND status NOT IN ('удалено','исполнено') LIMIT 20", (executor,))
-        else:
-            cursor.execute("SELECT id, task_text FROM tasks WHERE user_id=? AND creator_id=? AND status NOT IN ('удалено','исполнено') LIMIT 20", (executor, callback_query.from_user.id))
-    tasks = cursor.fetchall()
+        tasks = await tasks_repo.list_for_executor(executor, creator_id=callback_query.from_user.id)
     
     if not tasks:
         await bot.send_message(chat_id=callback_query.from_user.id, text="❌ Нет задач для выбранного исполнителя.")
@@ -1002,9 +900,9 @@ async def process_text_edit_executor(callback_query: types.CallbackQuery, state:
         return
 
     keyboard = InlineKeyboardMarkup(row_width=1)
-    for task_id, task_text in tasks:
-        preview = (task_text[:30] + "...") if len(task_text) > 30 else task_text
-        keyboard.add(InlineKeyboardButton(f"🔹 {preview} (ID: {task_id})", callback_data=f"text_edit_task_{task_id}"))
+    for task in tasks:
+        preview = (task.task_text[:30] + "...") if len(task.task_text) > 30 else task.task_text
+        keyboard.add(InlineKeyboardButton(f"🔹 {preview} (ID: {task.id})", callback_data=f"text_edit_task_{task.id}"))
     # Добавляем кнопку для ручного ввода ID задачи
     keyboard.add(InlineKeyboardButton("✏️ Ввести ID задачи вручную", callback_data="text_edit_manual_id"))
     
@@ -1025,14 +923,12 @@ async def process_text_edit_task(callback_query: types.CallbackQuery, state: FSM
         await state.finish()
         return
 
-    cursor = conn.cursor()
-    cursor.execute("SELECT task_text, creator_id FROM tasks WHERE id=?", (task_id,))
-    result = cursor.fetchone()
-    if not result:
+    task = await tasks_repo.get(task_id)
+    if not task:
         await bot.send_message(chat_id=callback_query.from_user.id, text="⚠ Задача не найдена!")
         await state.finish()
         return
-    current_text, creator_id = result
+    current_text, creator_id = task.task_text, task.creator_id
     await state.update_data(task_id=task_id, old_text=current_text, creator_id=creator_id)
     
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -1065,14 +961,12 @@ async def process_task_id_text_edit(message: types.Message, state: FSMContext):
         await state.finish()
         return
 
-    cursor = conn.cursor()
-    cursor.execute("SELECT task_text, creator_id FROM tasks WHERE id=?", (task_id,))
-    result = cursor.fetchone()
-    if not result:
+    task = await tasks_repo.get(task_id)
+    if not task:
         await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача не найдена!")
         await state.finish()
         return
-    current_text, creator_id = result
+    current_text, creator_id = task.task_text, task.creator_id
     await state.update_data(task_id=task_id, old_text=current_text, creator_id=creator_id)
     
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -1090,7 +984,7 @@ async def process_text_edit_choice_full(callback_query: types.CallbackQuery, sta
     data = await state.get_data()
     creator_id = data.get("creator_id")
     # Полная замена разрешена только если пользователь – создатель задачи или модератор
-    if int(creator_id) != callback_query.from_user.id and callback_query.from_user.id not in MODERATOR_USERS:
+    if int(creator_id) != callback_query.from_user.id and not permissions.is_moderator(callback_query.from_user.id):
         await bot.send_message(callback_query.from_user.id,
                                text="⚠ Полная замена текста доступна только создателю задачи или модераторам!")
         await state.finish()
@@ -1106,14 +1000,7 @@ async def process_text_replacement(message: types.Message, state: FSMContext):
     data = await state.get_data()
     task_id = data.get("task_id")
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id
-            FROM tasks WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET task_text=?, chat_id=? WHERE id=?", (new_text, message.from_user.id, task_id))
-        conn.commit()
+        await tasks_repo.set_text(task_id, new_text, message.from_user.id)
         await bot.send_message(message.chat.id, text=f"✅ Текст задачи {task_id} успешно обновлен.")
     except Exception as e:
         logger.error(f"Ошибка при обновлении текста задачи: {e}")
@@ -1134,22 +1021,10 @@ async def process_text_append(message: types.Message, state: FSMContext):
     data = await state.get_data()
     task_id = data.get("task_id")
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT task_text FROM tasks WHERE id=?", (task_id,))
-        result = cursor.fetchone()
-        if not result:
+        if not await tasks_repo.append_text(task_id, append_text, message.from_user.id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача не найдена!")
             await state.finish()
             return
-        old_text = result[0]
-        new_text = old_text + "\n" + append_text
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id
-            FROM tasks WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET task_text=?, chat_id=? WHERE id=?", (new_text, message.from_user.id, task_id))
-        conn.commit()
         await bot.send_message(chat_id=message.from_user.id, text=f"✅ Текст задачи {task_id} успешно дополнен.")
     except Exception as e:
         logger.error(f"Ошибка при дополнении текста задачи: {e}")
@@ -1169,35 +1044,16 @@ class ExecutorUpdate(StatesGroup):
 @dp.message_handler(lambda message: message.text == "👤 Изменить исполнителя")
 async def executor_select_task(message: types.Message):
     """Начало процесса изменения исполнителя"""
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
     
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status NOT IN ('удалено', 'исполнено') LIMIT 20")
-    executors = cursor.fetchall()
+    # Inline-клавиатура с исполнителями
+    executors, keyboard = await executor_cache.keyboard(PICK_EXECUTOR_FILTER)
     
     if not executors:
         await message.reply("❌ Нет задач для изменения исполнителя")
         return
-
-    # Создаем inline-клавиатуру с исполнителями
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    for i in range(0, len(executors), 2):
-        row = executors[i:i+2]
-        row_buttons = [
-            InlineKeyboardButton(
-                f"👤 {executor[0] if executor[0] else 'Без исполнителя'}",
-                callback_data=f"executor_filter|{executor[0]}"
-            ) for executor in row
-        ]
-        keyboard.add(*row_buttons)
-    
-    keyboard.add(InlineKeyboardButton("✏️ Ввести ID задачи", callback_data="executor_manual_id"))
     await message.reply("Выберите исполнителя для фильтрации задач:", reply_markup=keyboard)
     await ExecutorUpdate.waiting_for_executor.set()
 
@@ -1212,52 +1068,20 @@ async def process_executor_filter(callback_query: types.CallbackQuery, state: FS
 async def show_executor_tasks(message_obj, executor):
     """Отображение задач выбранного исполнителя"""
     try:
-        cursor = conn.cursor()
-
-        if message_obj.chat.id in MODERATOR_USERS:
-            if executor.lower() == "none":
-                cursor.execute("""
-                    SELECT id, task_text, status 
-                    FROM tasks
-                    WHERE user_id IS NULL AND status NOT IN ('удалено', 'исполнено')
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """)
-            else:
-                cursor.execute("""
-                    SELECT id, task_text, status 
-                    FROM tasks
-                    WHERE user_id = ? AND status NOT IN ('удалено', 'исполнено')
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (executor,))
+        if permissions.is_moderator(message_obj.chat.id):
+            tasks = await tasks_repo.list_for_executor(executor)
         else:
-            if executor.lower() == "none":
-                cursor.execute("""
-                    SELECT id, task_text, status 
-                    FROM tasks
-                    WHERE user_id IS NULL AND status NOT IN ('удалено', 'исполнено') AND creator_id=?
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (str(message_obj.chat.id),))
-            else:
-                cursor.execute("""
-                    SELECT id, task_text, status 
-                    FROM tasks
-                    WHERE user_id = ? AND status NOT IN ('удалено', 'исполнено') AND creator_id=?
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (executor, str(message_obj.chat.id)))
-
-        tasks = cursor.fetchall()
+            tasks = await tasks_repo.list_for_executor(executor, creator_id=message_obj.chat.id)
 
         keyboard = InlineKeyboardMarkup(row_width=1)
-        for task_id, task_text, current_executor in tasks:
+        for task in tasks:
             keyboard.add(InlineKeyboardButton(
-                f"{task_text[:30]}... (ID: {task_id})", 
-                callback_data=f"executor_task_{task_id}"
+                f"{task.task_text[:30]}... (ID: {task.id})", 
+                callback_data=f"executor_task_{task.id}"
             ))
 
+        if len(tasks) > 1:
+            keyboard.add(multi_select_button("executor"))
         keyboard.add(InlineKeyboardButton("✏️ Ввести ID вручную", callback_data="executor_manual_id"))
         await bot.send_message(
             chat_id=message_obj.chat.id,
@@ -1273,27 +1097,8 @@ async def process_selected_task_executor(callback_query: types.CallbackQuery, st
     task_id = callback_query.data.split("_")[2]
     await state.update_data(task_id=task_id)
     
-    # Получаем список исполнителей для inline-клавиатуры
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status<>'удалено' LIMIT 20")
-    executors = cursor.fetchall()
-    
-    # Создаем inline-клавиатуру
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    buttons = []
-    for executor in executors:
-        if executor[0]:
-            buttons.append(InlineKeyboardButton(
-                executor[0], 
-                callback_data=f"executor_choice|{executor[0]}"
-            ))
-    
-    # Добавляем кнопку ручного ввода
-    keyboard.add(*buttons)
-    keyboard.row(InlineKeyboardButton(
-        "✏️ Ввести вручную", 
-        callback_data="executor_manual_input"
-    ))
+    # Inline-клавиатура исполнителей с кнопкой ручного ввода
+    _, keyboard = await executor_cache.keyboard(PICK_NEW_EXECUTOR)
     
     await bot.send_message(
         chat_id=callback_query.from_user.id,
@@ -1316,33 +1121,15 @@ async def process_manual_task_id_executor(message: types.Message, state: FSMCont
     """Обработка ручного ввода ID задачи"""
     try:
         task_id = int(message.text)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM tasks WHERE id=?", (task_id,))
-        if not cursor.fetchone():
+        if not await tasks_repo.exists(task_id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача не найдена!")
             await state.finish()
             return
         
         await state.update_data(task_id=task_id)
         
-        # Повторно используем логику создания inline-клавиатуры
-        cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status<>'удалено' LIMIT 20")
-        executors = cursor.fetchall()
-        
-        keyboard = InlineKeyboardMarkup(row_width=2)
-        buttons = []
-        for executor in executors:
-            if executor[0]:
-                buttons.append(InlineKeyboardButton(
-                    executor[0], 
-                    callback_data=f"executor_choice|{executor[0]}"
-                ))
-        
-        keyboard.add(*buttons)
-        keyboard.row(InlineKeyboardButton(
-            "✏️ Ввести вручную", 
-            callback_data="executor_manual_input"
-        ))
+        # Та же клавиатура, что и при выборе задачи из списка
+        _, keyboard = await executor_cache.keyboard(PICK_NEW_EXECUTOR)
         
         await bot.send_message(
             chat_id=message.from_user.id,
@@ -1382,26 +1169,25 @@ async def process_and_save_executor(message_obj, new_executor: str, state: FSMCo
     """Общая логика сохранения нового исполнителя"""
     try:
         user_data = await state.get_data()
+        if user_data.get('task_ids'):
+            await save_executor_many(message_obj.chat.id, user_data['task_ids'], new_executor)
+            await state.finish()
+            return
         task_id = user_data['task_id']
         chat_type = message_obj.chat.type
       
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT creator_id FROM tasks WHERE id=?", (task_id,))
-        task_creator = cursor.fetchone()
-        if int(task_creator[0]) != message_obj.chat.id and message_obj.chat.id not in MODERATOR_USERS:
+        task = await tasks_repo.get(task_id)
+        if int(task.creator_id) != message_obj.chat.id and not permissions.is_moderator(message_obj.chat.id):
             await bot.send_message(chat_id=message_obj.chat.id, text="⚠ Вы не можете изменить эту задачу!")
             await state.finish()
             return
           
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id
-            FROM tasks 
-            WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET user_id=?, chat_id=? WHERE id=?", (new_executor, message_obj.chat.id, task_id))
-        conn.commit()
+        executor_tg_id = await users_repo.tg_id_by_username(new_executor)
+        notification = f"🔔 Вам назначена задача 🔹{task_id}:\n\n📌 <b>{task.task_text}</b>"
+        if task.deadline:
+            notification += f"\n⏳ {format_date(task.deadline)}"
+        await tasks_repo.set_executor(task_id, new_executor, message_obj.chat.id,
+                                      notifications=assignment_notifications(executor_tg_id, message_obj.chat.id, notification))
 
         reply_markup = menu_keyboard if chat_type == "private" else group_menu_keyboard
         await bot.send_message(
@@ -1428,34 +1214,15 @@ class TaskUpdate(StatesGroup):
 
 @dp.message_handler(lambda message: message.text == "⏳ Изменить срок")
 async def deadline_select_task(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
     
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE status NOT IN ('удалено', 'исполнено') LIMIT 20")
-    executors = cursor.fetchall()
+    executors, keyboard = await executor_cache.keyboard(PICK_DEADLINE)
     
     if not executors:
         await message.reply("❌ Нет задач для изменения срока")
         return
-
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    for i in range(0, len(executors), 2):
-        row = executors[i:i+2]
-        row_buttons = [
-            InlineKeyboardButton(
-                f"👤 {executor[0] if executor[0] else 'Без исполнителя'}",
-                callback_data=f"deadline_filter|{executor[0]}"
-            ) for executor in row
-        ]
-        keyboard.add(*row_buttons)
-    
-    keyboard.add(InlineKeyboardButton("✏️ Ввести ID задачи", callback_data="deadline_manual_id"))
     await message.reply("Выберите исполнителя для фильтрации задач:", reply_markup=keyboard)
     await TaskUpdate.waiting_for_executor.set()
 
@@ -1468,51 +1235,20 @@ async def process_deadline_filter(callback_query: types.CallbackQuery, state: FS
 
 async def show_deadline_tasks(message_obj, executor):
     try:
-        cursor = conn.cursor()
-        if message_obj.chat.id in MODERATOR_USERS:
-            if executor.lower() == "none":
-                cursor.execute("""
-                    SELECT id, task_text, deadline 
-                    FROM tasks
-                    WHERE user_id IS NULL AND status NOT IN ('удалено', 'исполнено')
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """)
-            else:
-                cursor.execute("""
-                    SELECT id, task_text, deadline 
-                    FROM tasks
-                    WHERE user_id = ? AND status NOT IN ('удалено', 'исполнено')
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (executor,))
+        if permissions.is_moderator(message_obj.chat.id):
+            tasks = await tasks_repo.list_for_executor(executor)
         else:
-            if executor.lower() == "none":
-                cursor.execute("""
-                    SELECT id, task_text, deadline 
-                    FROM tasks
-                    WHERE user_id IS NULL AND status NOT IN ('удалено', 'исполнено') AND creator_id=?
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (str(message_obj.chat.id),))
-            else:
-                cursor.execute("""
-                    SELECT id, task_text, deadline 
-                    FROM tasks
-                    WHERE user_id = ? AND status NOT IN ('удалено', 'исполнено') AND creator_id=?
-                    ORDER BY id DESC 
-                    LIMIT 20
-                """, (executor, str(message_obj.chat.id)))
-        
-        tasks = cursor.fetchall()
+            tasks = await tasks_repo.list_for_executor(executor, creator_id=message_obj.chat.id)
 
         keyboard = InlineKeyboardMarkup(row_width=1)
-        for task_id, task_text, deadline in tasks:
+        for task in tasks:
             keyboard.add(InlineKeyboardButton(
-                f"{task_text[:30]}... (ID: {task_id})", 
-                callback_data=f"deadline_task_{task_id}"
+                f"{task.task_text[:30]}... (ID: {task.id})", 
+                callback_data=f"deadline_task_{task.id}"
             ))
 
+        if len(tasks) > 1:
+            keyboard.add(multi_select_button("deadline"))
         keyboard.add(InlineKeyboardButton("✏️ Ввести ID вручную", callback_data="deadline_manual_id"))
         await bot.send_message(
             chat_id=message_obj.chat.id,
@@ -1543,9 +1279,7 @@ async def process_manual_task_id(message: types.Message, state: FSMContext):
     """Обработка ручного ввода ID задачи"""
     try:
         task_id = int(message.text)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM tasks WHERE id=?", (task_id,))
-        if not cursor.fetchone():
+        if not await tasks_repo.exists(task_id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача не найдена!")
             return
         
@@ -1565,11 +1299,10 @@ async def show_deadline_options(message_obj):
 async def process_deadline_choice(callback_query: types.CallbackQuery, state: FSMContext):
     """Обработка выбора типа срока"""
     if callback_query.data == "set_deadline_custom":
-        await bot.send_message(chat_id=callback_query.from_user.id, text="📅 Введите дату в формате DD.MM.YYYY:")
+        await bot.send_message(chat_id=callback_query.from_user.id, text="📅 Введите дату в формате DD.MM.YYYY (можно «завтра 18:00», «пт», «через 3 дня»):")
         await TaskUpdate.waiting_for_custom_deadline.set()
     else:
         user_data = await state.get_data()
-        task_id = user_data['task_id']
         
         if callback_query.data == "set_deadline_none":
             new_deadline = None
@@ -1577,24 +1310,20 @@ async def process_deadline_choice(callback_query: types.CallbackQuery, state: FS
         else:
             new_deadline = callback_query.data.split("_")[2]
             response = f"✅ Новый срок: {new_deadline}"
-        
-        cursor = conn.cursor()
 
-        cursor.execute("SELECT creator_id FROM tasks WHERE id=?", (task_id,))
-        task_creator = cursor.fetchone()
-        if int(task_creator[0]) != callback_query.from_user.id and callback_query.from_user.id not in MODERATOR_USERS:
+        if user_data.get('task_ids'):
+            await save_deadline_many(callback_query.from_user.id, user_data['task_ids'], new_deadline, response)
+            await state.finish()
+            return
+        task_id = user_data['task_id']
+        
+        task = await tasks_repo.get(task_id)
+        if int(task.creator_id) != callback_query.from_user.id and not permissions.is_moderator(callback_query.from_user.id):
             await bot.send_message(chat_id=callback_query.from_user.id, text="⚠ Вы не можете изменить эту задачу!")
             await state.finish()
             return
           
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id
-            FROM tasks 
-            WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET deadline=?, chat_id=? WHERE id=?", (new_deadline, callback_query.from_user.id, task_id))
-        conn.commit()
+        await tasks_repo.set_deadline(task_id, new_deadline, callback_query.from_user.id)
         
         await bot.send_message(chat_id=callback_query.from_user.id, text=response)
         await state.finish()
@@ -1603,46 +1332,23 @@ async def process_deadline_choice(callback_query: types.CallbackQuery, state: FS
 async def process_custom_deadline(message: types.Message, state: FSMContext):
     """Обработка ввода даты вручную"""
     try:
-        # Попытка парсинга по первому шаблону
-        try:
-            dt = datetime.strptime(message.text.strip(), "%Y-%m-%d %H:%M")
-        except ValueError:
-            try:
-                dt = datetime.strptime(message.text.strip(), "%d.%m.%Y %H:%M")
-            except ValueError:
-                try:
-                    dt = datetime.strptime(message.text.strip(), "%d.%m.%y %H:%M")
-                except ValueError:
-                    try:
-                        dt = datetime.strptime(message.text.strip(), "%Y-%m-%d")
-                    except ValueError:
-                        # Если не получилось, пробуем другой формат
-                        try:
-                            dt = datetime.strptime(message.text.strip(), "%d.%m.%Y")
-                        except ValueError:
-                            dt = datetime.strptime(message.text.strip(), "%d.%m.%y")
-        new_deadline = dt.strftime("%Y-%m-%d %H:%M")
+        new_deadline = parse_deadline(message.text)
         
         user_data = await state.get_data()
+        if user_data.get('task_ids'):
+            await save_deadline_many(message.from_user.id, user_data['task_ids'], new_deadline,
+                                     f"✅ Новый срок установлен: {new_deadline}")
+            await state.finish()
+            return
         task_id = user_data['task_id']
         
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT creator_id FROM tasks WHERE id=?", (task_id,))
-        task_creator = cursor.fetchone()
-        if int(task_creator[0]) != message.from_user.id and message.from_user.id not in MODERATOR_USERS:
+        task = await tasks_repo.get(task_id)
+        if int(task.creator_id) != message.from_user.id and not permissions.is_moderator(message.from_user.id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Вы не можете изменить эту задачу!")
             await state.finish()
             return
   
-        cursor.execute("""
-            INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id)
-            SELECT id, user_id, chat_id, task_text, status, deadline, creator_id
-            FROM tasks 
-            WHERE id=?
-        """, (task_id,))
-        cursor.execute("UPDATE tasks SET deadline=?, chat_id=? WHERE id=?", (new_deadline, message.from_user.id, task_id))
-        conn.commit()
+        await tasks_repo.set_deadline(task_id, new_deadline, message.from_user.id)
         
         await bot.send_message(chat_id=message.from_user.id,text=f"✅ Новый срок установлен: {new_deadline}")
         await state.finish()
@@ -1650,45 +1356,188 @@ async def process_custom_deadline(message: types.Message, state: FSMContext):
         await bot.send_message(chat_id=message.from_user.id, text="⚠ Неверный формат даты! Используйте DD.MM.YYYY")
         await state.finish()
 
+# ======================
+# ВЫБОР НЕСКОЛЬКИХ ЗАДАЧ
+# ======================
+
+# Сценарии, в списке задач которых можно отметить несколько задач
+MULTI_SELECT_STATES = [
+    StatusUpdate.waiting_for_task_selection,
+    ExecutorUpdate.waiting_for_task_selection,
+    TaskUpdate.waiting_for_task_selection,
+]
+
+# Сколько задач исполнителя доступно для выбора и сколько показывается на странице
+MULTI_SELECT_LIMIT = 500
+MULTI_SELECT_PAGE = 10
+
+def multi_select_button(flow: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton("☑️ Выбрать несколько", callback_data=f"multi_{flow}_on")
+
+def multi_select_keyboard(flow: str, tasks, selected, page: int = 0) -> InlineKeyboardMarkup:
+    """Страница списка задач с отметками выбора, листанием, выбором всех и кнопкой применения"""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    pages = max(1, (len(tasks) + MULTI_SELECT_PAGE - 1) // MULTI_SELECT_PAGE)
+    for task_id, label in tasks[page * MULTI_SELECT_PAGE:(page + 1) * MULTI_SELECT_PAGE]:
+        mark = "✅" if task_id in selected else "⬜"
+        keyboard.add(InlineKeyboardButton(f"{mark} {label}", callback_data=f"multi_{flow}_{task_id}"))
+    if pages > 1:
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"multi_{flow}_page_{page-1}"))
+        buttons.append(InlineKeyboardButton(f"{page+1}/{pages}", callback_data="tasks_page"))
+        if page + 1 < pages:
+            buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"multi_{flow}_page_{page+1}"))
+        keyboard.row(*buttons)
+    all_selected = len(selected) == len(tasks)
+    keyboard.add(InlineKeyboardButton("⬜ Снять все" if all_selected else f"☑️ Выбрать все ({len(tasks)})",
+                                      callback_data=f"multi_{flow}_all"))
+    keyboard.add(InlineKeyboardButton(f"▶️ Применить к выбранным ({len(selected)})", callback_data=f"multi_{flow}_apply"))
+    return keyboard
+
+@dp.callback_query_handler(lambda c: c.data.startswith("multi_"), state=MULTI_SELECT_STATES)
+async def process_multi_select(callback_query: types.CallbackQuery, state: FSMContext):
+    """Включение режима выбора, отметка задач и переход к изменению выбранных"""
+    _, flow, action = callback_query.data.split("_", 2)
+    user_id = callback_query.from_user.id
+    message = callback_query.message
+    user_data = await state.get_data()
+
+    if action == "apply":
+        selected = user_data.get('selected', [])
+        if not selected:
+            await bot.answer_callback_query(callback_query.id, text="Не выбрано ни одной задачи")
+            return
+        await bot.answer_callback_query(callback_query.id)
+        await bot.edit_message_reply_markup(chat_id=message.chat.id, message_id=message.message_id, reply_markup=None)
+        await state.update_data(task_ids=selected)
+        if flow == "status":
+            await show_status_options(message, selected)
+            await StatusUpdate.waiting_for_status_choice.set()
+        elif flow == "executor":
+            _, keyboard = await executor_cache.keyboard(PICK_NEW_EXECUTOR)
+            await bot.send_message(chat_id=user_id, text=f"👤 Выберите нового исполнителя для задач: {len(selected)}",
+                                   reply_markup=keyboard)
+            await ExecutorUpdate.waiting_for_new_executor.set()
+        else:
+            await show_deadline_options(message)
+            await TaskUpdate.waiting_for_deadline_choice.set()
+        return
+
+    listed = user_data.get('multi_tasks', [])
+    selected = user_data.get('selected', [])
+    page = user_data.get('multi_page', 0)
+    if action == "on":
+        # Список запоминается в состоянии, отметки и листание не перечитывают задачи
+        executor = user_data.get('executor')
+        creator_id = None if flow == "status" or permissions.is_moderator(user_id) else user_id
+        tasks = await tasks_repo.list_for_executor(executor, creator_id=creator_id, limit=MULTI_SELECT_LIMIT)
+        listed = [(task.id, f"{task.task_text[:30]}... (🔹: {task.id})") for task in tasks]
+        selected, page = [], 0
+        await state.update_data(multi_tasks=listed, selected=selected, multi_page=page)
+    elif action.startswith("page_"):
+        page = int(action[len("page_"):])
+        await state.update_data(multi_page=page)
+    elif action == "all":
+        selected = [] if len(selected) == len(listed) else [task_id for task_id, _ in listed]
+        await state.update_data(selected=selected)
+    else:
+        task_id = int(action)
+        if task_id in selected:
+            selected = [item for item in selected if item != task_id]
+        else:
+            selected = selected + [task_id]
+        await state.update_data(selected=selected)
+
+    await bot.edit_message_reply_markup(chat_id=message.chat.id, message_id=message.message_id,
+                                        reply_markup=multi_select_keyboard(flow, listed, selected, page))
+    await bot.answer_callback_query(callback_query.id)
+
+async def editable_tasks(user_id, task_ids):
+    """Активные задачи из списка; None, если пользователь не может изменить какую-то из них"""
+    tasks = await tasks_repo.get_active_many(task_ids)
+    if not permissions.is_moderator(user_id) and any(task.creator_id != str(user_id) for task in tasks):
+        return None
+    return tasks
+
+def task_ids_text(tasks) -> str:
+    return ", ".join(f"🔹{task.id}" for task in tasks)
+
+async def save_status_many(user_id, task_ids, new_status):
+    """Статус выбранных задач - одной транзакцией, авторам по одному уведомлению"""
+    tasks = await tasks_repo.get_active_many(task_ids)
+    notifications = []
+    if new_status in ('исполнено', 'удалено'):
+        if new_status == 'удалено' and await editable_tasks(user_id, task_ids) is None:
+            await bot.send_message(chat_id=user_id, text="⚠ Среди выбранных есть задачи, которые вы не можете удалить!")
+            return
+        by_creator = {}
+        for task in tasks:
+            if task.creator_id is not None and task.creator_id != str(user_id):
+                by_creator.setdefault(task.creator_id, []).append(f"🔹{task.id} ({task.task_text})")
+        for creator, entries in by_creator.items():
+            notifications += digest_notifications(creator, f"✅ Статус задач изменен на '{new_status}':\n\n",
+                                                  entries, f"status:{{task_id}}:{new_status}:{creator}")
+    changed = await tasks_repo.set_status_many([task.id for task in tasks], new_status, user_id, notifications)
+    await notifier.send(user_id, f"✅ Статус задач {task_ids_text(changed)} изменен на '{new_status}'")
+
+async def save_executor_many(user_id, task_ids, new_executor: str):
+    """Новый исполнитель выбранных задач - одной транзакцией и одним уведомлением"""
+    tasks = await editable_tasks(user_id, task_ids)
+    if tasks is None:
+        await bot.send_message(chat_id=user_id, text="⚠ Среди выбранных есть задачи, которые вы не можете изменить!")
+        return
+    executor_tg_id = await users_repo.tg_id_by_username(new_executor)
+    notifications = []
+    if executor_tg_id is not None and executor_tg_id != str(user_id):
+        entries = [f"🔹{task.id}: <b>{task.task_text}</b>" + (f"\n⏳ {format_date(task.deadline)}" if task.deadline else "")
+                   for task in tasks]
+        notifications = digest_notifications(executor_tg_id, f"🔔 Вам назначены задачи ({len(entries)}):\n\n",
+                                             entries, f"assign:{{task_id}}:{executor_tg_id}:many")
+    changed = await tasks_repo.set_executor_many([task.id for task in tasks], new_executor, user_id, notifications)
+    await bot.send_message(
+        chat_id=user_id,
+        text=f"✅ Исполнитель задач {task_ids_text(changed)} изменен на '{new_executor}'",
+        reply_markup=menu_keyboard
+    )
+
+async def save_deadline_many(user_id, task_ids, new_deadline, response: str):
+    """Новый срок выбранных задач - одной транзакцией"""
+    tasks = await editable_tasks(user_id, task_ids)
+    if tasks is None:
+        await bot.send_message(chat_id=user_id, text="⚠ Среди выбранных есть задачи, которые вы не можете изменить!")
+        return
+    changed = await tasks_repo.set_deadline_many([task.id for task in tasks], new_deadline, user_id)
+    await bot.send_message(chat_id=user_id, text=f"{response}\nЗадачи: {task_ids_text(changed)}")
+
 # ======================
 # СПИСОК ЗАДАЧ
 # ======================
 
-current_page = {}
-current_filters = {}
+# Фильтр, страница и курсор едут в callback_data кнопок листания (callbacks.py).
+# Сессия нужна только для фильтра, который не влез в 64 байта кнопки.
+# Вид "e" - список по исполнителю, "d" - по сроку
+view_sessions = SessionCache(max_size=SESSION_CACHE_SIZE, ttl=SESSION_TTL)
+# Страницы списков строятся один раз до следующего изменения задач
+page_cache = PageCache(max_size=PAGE_CACHE_SIZE)
+tasks_repo.subscribe(page_cache.on_task_change)
+# Число активных задач для числа страниц: загружается при запуске, дальше обновляется по изменениям
+active_counters = ActiveCounters(tasks_repo)
+tasks_repo.subscribe(active_counters.on_task_change)
+SESSION_EXPIRED_TEXT = "⌛ Список устарел, откройте его заново"
 
 @dp.message_handler(lambda message: message.text == "📋 Список задач")
 async def list_tasks(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
 
     """Просмотр списка задач с выбором исполнителя и пагинацией"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT user_id FROM tasks 
-            WHERE status NOT IN ('удалено', 'исполнено')
-            LIMIT 20
-        """)
-        executors = cursor.fetchall()
+        executors, keyboard = await executor_cache.keyboard(PICK_LIST)
         if not executors:
             await message.reply("❌ Нет задач для отображения")
             return
-        keyboard = InlineKeyboardMarkup(row_width=2)
-        for i in range(0, len(executors), 2):
-            row = executors[i:i+2]
-            row_buttons = [
-                InlineKeyboardButton(
-                    f"👤 {executor[0] if executor[0] else 'Без исполнителя'}",
-                    callback_data=f"listtasks_executor|{executor[0]}"
-                ) for executor in row
-            ]
-            keyboard.add(*row_buttons)
         await message.reply("Выберите исполнителя для фильтрации задач:", reply_markup=keyboard)
     except Exception as e:
         logger.error(f"Ошибка при получении списка задач: {str(e)}")
@@ -1698,173 +1547,147 @@ async def list_tasks(message: types.Message):
 async def process_listtasks_executor(callback_query: types.CallbackQuery):
     executor = callback_query.data.split("|")[1]
     user_id = callback_query.from_user.id
-    current_page[user_id] = 0
-    current_filters[user_id] = executor  # Сохраняем фильтр
-    sent_message = await show_tasks_page(callback_query.message, user_id, page=0, executor_filter=executor)
-    current_page[f"{user_id}_message_id"] = sent_message.message_id
+    await show_tasks_page(callback_query.message.chat.id, user_id, page=0, executor_filter=executor)
     await bot.answer_callback_query(callback_query.id)
 
 
-async def show_tasks_page(message: types.Message, user_id: int, page: int, executor_filter: str = None):
-    try:
-        cursor = conn.cursor()
-        # Если указан фильтр по исполнителю, добавляем условие
-        if executor_filter and executor_filter.lower() == "none":
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено') AND user_id IS NULL")
-        elif executor_filter:
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено') AND user_id = ?", (executor_filter,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено')")
-        total_tasks = cursor.fetchone()[0]
-        
-        if total_tasks == 0:
-            return await bot.send_message(message.chat.id, "📭 Нет активных задач.")
-        
-        total_pages = (total_tasks - 1) // 10
-        page = max(0, min(page, total_pages))
-        
-        # Получаем задачи с учетом фильтра
-        if executor_filter:
-            if executor_filter.lower() == "none":
-                cursor.execute("""
-                    SELECT id, user_id, task_text, status, deadline 
-                    FROM tasks 
-                    WHERE status NOT IN ('удалено','исполнено') AND user_id IS NULL
-                    ORDER BY datetime(deadline) ASC, id ASC
-                    LIMIT 10 OFFSET ?
-                """, (page * 10,))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, task_text, status, deadline 
-                    FROM tasks 
-                    WHERE status NOT IN ('удалено','исполнено') AND user_id = ?
-                    ORDER BY datetime(deadline) ASC, id ASC
-                    LIMIT 10 OFFSET ?
-                """, (executor_filter, page * 10))
-        else:
-            cursor.execute("""
-                SELECT id, user_id, task_text, status, deadline 
-                FROM tasks 
-                WHERE status NOT IN ('удалено','исполнено')
-                ORDER BY datetime(deadline) ASC, id ASC
-                LIMIT 10 OFFSET ?
-            """, (page * 10,))
-        tasks = cursor.fetchall()
-
-        result = []
-        for task in tasks:
-            task_id, task_user, task_text, status, deadline = task
-            result.append(
-                f"🔹: {task_id} 📝: {task_text}\n\n"
-                f"🔄: {status} ⏳: {format_date(deadline) if deadline else 'нет срока'}\n"
-                f"──────────"
-            )
-        keyboard = InlineKeyboardMarkup(row_width=3)
-        buttons = []
-        if page > 0:
-            buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"tasks_prev_{page-1}"))
-        buttons.append(InlineKeyboardButton(f"{page+1}/{total_pages+1}", callback_data="tasks_page"))
-        if page < total_pages:
-            buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"tasks_next_{page+1}"))
-        keyboard.row(*buttons)
-        
-        header = f"📋 Список задач (страница {page+1} из {total_pages+1})"
-        if executor_filter:
-            executor_display = 'Без исполнителя' if str(executor_filter).lower() == 'none' else executor_filter
-            header = f"📋 Задачи для 👤: <b>{executor_display}</b> (страница {page+1} из {total_pages+1})"
-        sent_message = await bot.send_message(
-            chat_id=message.chat.id,
-            text=header + ":\n\n" + "\n".join(result),
-            reply_markup=keyboard,
-            parse_mode=ParseMode.HTML
+def remember_filter(user_id: int, view: str, filter_value: str) -> str:
+    """Сохранить длинный фильтр в сессии пользователя, вернуть ключ для кнопок"""
+    token = filter_token(filter_value)
+    view_sessions.open(user_id, f"{view}~{token}", filter_value)
+    return token
+
+def page_callback(user_id: int, ref: PageRef) -> str:
+    """callback_data кнопки листания; длинный фильтр уходит в сессию пользователя"""
+    data = encode_page(ref)
+    if data is None:
+        token = remember_filter(user_id, ref.view, ref.filter)
+        data = encode_page(ref._replace(filter=None, token=token))
+    return data
+
+def keyboard_uses_session(keyboard) -> bool:
+    """Есть ли в кнопках листания ссылки на фильтр в сессии"""
+    if keyboard is None:
+        return False
+    return any(button.callback_data.startswith(PAGE_PREFIX + ":") and decode_page(button.callback_data).token
+               for row in keyboard.inline_keyboard for button in row)
+
+def tasks_page_keyboard(user_id: int, view: str, filter_value: str, page: int, pages: int, tasks,
+                        has_prev: bool, has_next: bool):
+    """Кнопки листания: в callback_data вид списка, фильтр, номер страницы, число страниц и id задачи-границы"""
+    keyboard = InlineKeyboardMarkup(row_width=3)
+    buttons = []
+    if has_prev:
+        ref = PageRef(view, True, page - 1, pages, tasks[0].id, filter_value)
+        buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=page_callback(user_id, ref)))
+    buttons.append(InlineKeyboardButton(f"{page+1}/{pages}", callback_data="tasks_page"))
+    if has_next:
+        ref = PageRef(view, False, page + 1, pages, tasks[-1].id, filter_value)
+        buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=page_callback(user_id, ref)))
+    keyboard.row(*buttons)
+    return keyboard
+
+async def load_tasks_page(page: int, pages: int = None, cursor_id: int = None, backward: bool = False,
+                          executor_filter: str = None, deadline_filter: str = None):
+    """Страница задач по курсору: (задачи, номер страницы, всего страниц, есть назад, есть вперед)"""
+    tasks, has_more, found = await tasks_repo.seek_active(cursor_id, backward, executor_filter=executor_filter,
+                                                          deadline_filter=deadline_filter)
+    if not found:
+        # Без курсора или задача-граница удалена: это первая страница, число страниц пересчитываем
+        page, pages, backward = 0, None, False
+    if pages is None:
+        # Общее число считаем один раз при открытии списка, дальше оно едет в callback_data
+        total_tasks = active_counters.count(executor_filter, deadline_filter)
+        if total_tasks is None:
+            total_tasks = await tasks_repo.count_active(executor_filter=executor_filter, deadline_filter=deadline_filter)
+        pages = max(1, (total_tasks + 9) // 10)
+    if backward:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = page > 0, has_more
+    if not has_prev:
+        page = 0
+    pages = max(pages, page + 1 + has_next)
+    return tasks, page, pages, has_prev, has_next
+
+async def send_tasks_page(chat_id: int, text: str, keyboard=None, message: types.Message = None):
+    """Страница списка: правкой сообщения message, если оно есть, иначе новым сообщением"""
+    if message is not None:
+        try:
+            return await message.edit_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        except exceptions.MessageNotModified:
+            return message
+        except exceptions.BadRequest as e:
+            # Сообщение удалено, слишком старое или не от бота - отправляем новое
+            logger.warning(f"Не удалось изменить сообщение со списком: {e}")
+    return await bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+
+async def cached_tasks_page(render, view: str, user_id: int, page: int, filter_value: str = None,
+                            pages: int = None, cursor_id: int = None, backward: bool = False):
+    """Текст и кнопки страницы из кэша; при промахе - render(...) и сохранение"""
+    key = (view, filter_value, page, pages, cursor_id, backward)
+    rendered = page_cache.get(key)
+    if rendered is None:
+        version = page_cache.version
+        text, keyboard = await render(user_id, page, filter_value, pages, cursor_id, backward)
+        rendered = RenderedPage(text, keyboard, filter_value if keyboard_uses_session(keyboard) else None)
+        page_cache.put(key, rendered, version)
+    elif rendered.session_filter is not None:
+        # Кнопки из кэша ссылаются на сессию: заводим ее и этому пользователю
+        remember_filter(user_id, view, rendered.session_filter)
+    return rendered.text, rendered.keyboard
+
+async def render_tasks_page(user_id: int, page: int, executor_filter: str = None,
+                            pages: int = None, cursor_id: int = None, backward: bool = False):
+    """Текст и кнопки страницы списка по исполнителю"""
+    tasks, page, pages, has_prev, has_next = await load_tasks_page(
+        page, pages, cursor_id, backward, executor_filter=executor_filter)
+
+    if not tasks:
+        return "📭 Нет активных задач.", None
+
+    result = []
+    for task in tasks:
+        task_id, task_text, status, deadline = task.id, task.task_text, task.status, task.deadline
+        result.append(
+            f"🔹: {task_id} 📝: {task_text}\n\n"
+            f"🔄: {status} ⏳: {format_date(deadline) if deadline else 'нет срока'}\n"
+            f"──────────"
         )
-        return sent_message
-        
-    except Exception as e:
-        logger.error(f"Ошибка при отображении страницы задач: {str(e)}")
-        await bot.send_message(message.from_user.id, "⚠ Ошибка при отображении задач.")
-        return None
+    keyboard = tasks_page_keyboard(user_id, "e", executor_filter, page, pages, tasks, has_prev, has_next)
 
-@dp.callback_query_handler(lambda c: c.data.startswith(("tasks_prev_", "tasks_next_")))
-async def process_tasks_pagination(callback_query: types.CallbackQuery):
-    """Обработка переключения страниц"""
-    try:
-        user_id = callback_query.from_user.id
-        action, page = callback_query.data.split("_")[1:3]
-        page = int(page)
-        
-        # Получаем сохраненный фильтр
-        executor_filter = current_filters.get(user_id)
-        
-        current_page[user_id] = page
-        
-        class FakeMessage:
-            def __init__(self, chat_id):
-                self.chat = type('Chat', (), {'id': chat_id})()
-                self.from_user = type('User', (), {'id': user_id})()
-        
-        fake_message = FakeMessage(callback_query.message.chat.id)
-        
-        # Передаем сохраненный фильтр
-        sent_message = await show_tasks_page(fake_message, user_id, page, executor_filter)
+    header = f"📋 Список задач (страница {page+1} из {pages})"
+    if executor_filter:
+        executor_display = 'Без исполнителя' if str(executor_filter).lower() == 'none' else executor_filter
+        header = f"📋 Задачи для 👤: <b>{executor_display}</b> (страница {page+1} из {pages})"
+    return header + ":\n\n" + "\n".join(result), keyboard
 
-        try:
-            prev_message_id = current_page.get(f"{user_id}_message_id")
-            if prev_message_id:
-                await bot.delete_message(chat_id=callback_query.message.chat.id, message_id=prev_message_id)
-        except Exception as e:
-            logger.warning(f"Не удалось удалить сообщение: {e}")
-        
-        if sent_message:
-            current_page[f"{user_id}_message_id"] = sent_message.message_id
-        
-        await bot.answer_callback_query(callback_query.id)
-        
+async def show_tasks_page(chat_id: int, user_id: int, page: int, executor_filter: str = None,
+                          pages: int = None, cursor_id: int = None, backward: bool = False,
+                          message: types.Message = None):
+    try:
+        text, keyboard = await cached_tasks_page(render_tasks_page, "e", user_id, page, executor_filter,
+                                                 pages, cursor_id, backward)
+        return await send_tasks_page(chat_id, text, keyboard, message)
     except Exception as e:
-        logger.error(f"Ошибка при переключении страниц: {str(e)}")
-        await bot.answer_callback_query(callback_query.id, "⚠ Ошибка при переключении страниц", show_alert=False)
+        logger.error(f"Ошибка при отображении страницы задач: {str(e)}")
+        await bot.send_message(user_id, "⚠ Ошибка при отображении задач.")
+        return None
 
 # ======================
 # СПИСОК ЗАДАЧ (по сроку)
 # ======================
 
-current_page_deadline = {}
-current_filters_deadline = {}
-
-def format_deadline_time(deadline_str):
-    try:
-        # Сначала пробуем распарсить срок как дату со временем
-        dt = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
-    except Exception:
-        return ""
-
-    # Если время задано (не 00:00), возвращаем только время
-    if dt.hour != 0 or dt.minute != 0:
-        return dt.strftime("%H:%M")
-    else:
-        return ""
-
 @dp.message_handler(lambda message: message.text == "📋 Список (по сроку)")
 async def list_tasks_by_deadline(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return
-
     if message.chat.type != "private":
       await bot.send_message(chat_id=message.from_user.id, text="⛔ Команда для ЛС!")
       return
 
     """Просмотр списка задач с выбором срока и пагинацией"""
     try:
-        cursor = conn.cursor()
         # Получаем уникальные сроки. Если срок отсутствует (NULL), то можно отобразить вариант "Без срока"
-        cursor.execute("""
-            SELECT DISTINCT date(deadline) deadline FROM tasks 
-            WHERE status NOT IN ('удалено', 'исполнено')
-            ORDER BY datetime(deadline) ASC
-            LIMIT 20
-        """)
-        deadlines = cursor.fetchall()
+        deadlines = await tasks_repo.deadline_dates()
         if not deadlines:
             await message.reply("❌ Нет задач для отображения")
             return
@@ -1873,9 +1696,9 @@ async def list_tasks_by_deadline(message: types.Message):
             row = deadlines[i:i+2]
             row_buttons = []
             for d in row:
-                if d[0]:
-                    btn_text = format_date(d[0])
-                    btn_data = d[0]
+                if d:
+                    btn_text = format_date(d)
+                    btn_data = d
                 else:
                     btn_text = "Без срока"
                     btn_data = "none"
@@ -1893,239 +1716,106 @@ async def list_tasks_by_deadline(message: types.Message):
 async def process_listtasks_deadline(callback_query: types.CallbackQuery):
     deadline_filter = callback_query.data.split("|")[1]
     user_id = callback_query.from_user.id
-    current_page_deadline[user_id] = 0
-    current_filters_deadline[user_id] = deadline_filter  # Сохраняем выбранный срок
-    sent_message = await show_tasks_page_by_deadline(callback_query.message, user_id, page=0, deadline_filter=deadline_filter)
-    current_page_deadline[f"{user_id}_message_id"] = sent_message.message_id
+    await show_tasks_page_by_deadline(callback_query.message.chat.id, user_id, page=0, deadline_filter=deadline_filter)
     await bot.answer_callback_query(callback_query.id)
 
-async def show_tasks_page_by_deadline(message: types.Message, user_id: int, page: int, deadline_filter: str = None):
-    try:
-        cursor = conn.cursor()
-        # Если выбран конкретный срок, считаем задачи с этим сроком.
-        # Если выбран вариант "Без срока" (deadline_filter == "none"), ищем записи с deadline IS NULL.
-        if deadline_filter and deadline_filter.lower() == "none":
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено') AND deadline IS NULL")
-        elif deadline_filter:
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено') AND date(deadline) = ?", (deadline_filter,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('удалено','исполнено')")
-        total_tasks = cursor.fetchone()[0]
-        
-        if total_tasks == 0:
-            return await bot.send_message(message.chat.id, "📭 Нет активных задач.")
-        
-        total_pages = (total_tasks - 1) // 10
-        page = max(0, min(page, total_pages))
-        
-        # Получаем задачи с применённой фильтрацией по сроку
-        if deadline_filter:
-            if deadline_filter.lower() == "none":
-                cursor.execute("""
-                    SELECT id, user_id, task_text, status, deadline 
-                    FROM tasks 
-                    WHERE status NOT IN ('удалено','исполнено') AND deadline IS NULL
-                    ORDER BY datetime(deadline) ASC, id ASC
-                    LIMIT 10 OFFSET ?
-                """, (page * 10,))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, task_text, status, deadline 
-                    FROM tasks 
-                    WHERE status NOT IN ('удалено','исполнено') AND date(deadline) = ?
-                    ORDER BY datetime(deadline) ASC, id ASC 
-                    LIMIT 10 OFFSET ?
-                """, (deadline_filter, page * 10))
-        else:
-            cursor.execute("""
-                SELECT id, user_id, task_text, status, deadline 
-                FROM tasks 
-                WHERE status NOT IN ('удалено','исполнено')
-                ORDER BY datetime(deadline) ASC, id ASC
-                LIMIT 10 OFFSET ?
-            """, (page * 10,))
-        tasks = cursor.fetchall()
-
-        result = []
-        for task in tasks:
-            task_id, task_user, task_text, status, deadline = task
-            result.append(
-                f"🔹: {task_id} 📝: {task_text}\n\n"
-                f"👤: {task_user} 🔄: {status} {'⏳: ' + format_deadline_time(deadline) if format_deadline_time(deadline).strip() else ''}\n"
-                f"──────────"
-            )
-        keyboard = InlineKeyboardMarkup(row_width=3)
-        buttons = []
-        if page > 0:
-            buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"tasks_prev_{page-1}"))
-        buttons.append(InlineKeyboardButton(f"{page+1}/{total_pages+1}", callback_data="tasks_page"))
-        if page < total_pages:
-            buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"tasks_next_{page+1}"))
-        keyboard.row(*buttons)
-        
-        header = f"📋 Список задач (страница {page+1} из {total_pages+1})"
-        if deadline_filter:
-            deadline_display = 'Без срока' if deadline_filter.lower() == 'none' else deadline_filter
-            header = f"📋 Задачи со сроком: <b>⏳: {format_date(deadline_display)}</b> (страница {page+1} из {total_pages+1})"
-        sent_message = await bot.send_message(
-            chat_id=message.chat.id,
-            text=header + ":\n\n" + "\n".join(result),
-            reply_markup=keyboard,
-            parse_mode=ParseMode.HTML
+async def render_tasks_page_by_deadline(user_id: int, page: int, deadline_filter: str = None,
+                                        pages: int = None, cursor_id: int = None, backward: bool = False):
+    """Текст и кнопки страницы списка по сроку"""
+    # Если выбран конкретный срок, берем задачи с этим сроком.
+    # Если выбран вариант "Без срока" (deadline_filter == "none"), ищем записи с deadline IS NULL.
+    tasks, page, pages, has_prev, has_next = await load_tasks_page(
+        page, pages, cursor_id, backward, deadline_filter=deadline_filter)
+
+    if not tasks:
+        return "📭 Нет активных задач.", None
+
+    result = []
+    for task in tasks:
+        task_id, task_user, task_text, status, deadline = task.id, task.user_id, task.task_text, task.status, task.deadline
+        result.append(
+            f"🔹: {task_id} 📝: {task_text}\n\n"
+            f"👤: {task_user} 🔄: {status} {'⏳: ' + format_deadline_time(deadline) if format_deadline_time(deadline).strip() else ''}\n"
+            f"──────────"
         )
-        return sent_message
-        
+    keyboard = tasks_page_keyboard(user_id, "d", deadline_filter, page, pages, tasks, has_prev, has_next)
+
+    header = f"📋 Список задач (страница {page+1} из {pages})"
+    if deadline_filter:
+        deadline_display = 'Без срока' if deadline_filter.lower() == 'none' else deadline_filter
+        header = f"📋 Задачи со сроком: <b>⏳: {format_date(deadline_display)}</b> (страница {page+1} из {pages})"
+    return header + ":\n\n" + "\n".join(result), keyboard
+
+async def show_tasks_page_by_deadline(chat_id: int, user_id: int, page: int, deadline_filter: str = None,
+                                      pages: int = None, cursor_id: int = None, backward: bool = False,
+                                      message: types.Message = None):
+    try:
+        text, keyboard = await cached_tasks_page(render_tasks_page_by_deadline, "d", user_id, page, deadline_filter,
+                                                 pages, cursor_id, backward)
+        return await send_tasks_page(chat_id, text, keyboard, message)
     except Exception as e:
         logger.error(f"Ошибка при отображении страницы задач: {str(e)}")
-        await bot.send_message(message.from_user.id, "⚠ Ошибка при отображении задач.")
+        await bot.send_message(user_id, "⚠ Ошибка при отображении задач.")
         return None
 
-@dp.callback_query_handler(lambda c: c.data.startswith(("tasks_prev_", "tasks_next_")))
-async def process_tasks_pagination_deadline(callback_query: types.CallbackQuery):
-    """Обработка переключения страниц для фильтрации по сроку"""
+# ======================
+# ЛИСТАНИЕ СПИСКОВ
+# ======================
+
+@dp.callback_query_handler(lambda c: c.data.startswith(PAGE_PREFIX + ":"))
+async def process_tasks_pagination(callback_query: types.CallbackQuery):
+    """Переключение страниц обоих списков: все нужное - в callback_data"""
     try:
         user_id = callback_query.from_user.id
-        action, page = callback_query.data.split("_")[1:3]
-        page = int(page)
-        
-        deadline_filter = current_filters_deadline.get(user_id)
-        current_page_deadline[user_id] = page
-        
-        class FakeMessage:
-            def __init__(self, chat_id):
-                self.chat = type('Chat', (), {'id': chat_id})()
-                self.from_user = type('User', (), {'id': user_id})()
-        
-        fake_message = FakeMessage(callback_query.message.chat.id)
-        sent_message = await show_tasks_page_by_deadline(fake_message, user_id, page, deadline_filter)
-        
         try:
-            prev_message_id = current_page_deadline.get(f"{user_id}_message_id")
-            if prev_message_id:
-                await bot.delete_message(chat_id=callback_query.message.chat.id, message_id=prev_message_id)
-        except Exception as e:
-            logger.warning(f"Не удалось удалить сообщение: {e}")
-        
-        if sent_message:
-            current_page_deadline[f"{user_id}_message_id"] = sent_message.message_id
-        
+            ref = decode_page(callback_query.data)
+        except ValueError:
+            await bot.answer_callback_query(callback_query.id, SESSION_EXPIRED_TEXT, show_alert=True)
+            return
+        filter_value = ref.filter
+        if ref.token is not None:
+            # Длинный фильтр хранится в сессии
+            session = view_sessions.get(user_id, f"{ref.view}~{ref.token}")
+            if session is None:
+                await bot.answer_callback_query(callback_query.id, SESSION_EXPIRED_TEXT, show_alert=True)
+                return
+            filter_value = session.filter
+
+        # Страница заменяет текст того же сообщения
+        show = show_tasks_page_by_deadline if ref.view == "d" else show_tasks_page
+        await show(callback_query.message.chat.id, user_id, ref.page, filter_value, pages=ref.pages,
+                   cursor_id=ref.cursor_id, backward=ref.backward, message=callback_query.message)
+
         await bot.answer_callback_query(callback_query.id)
-        
+
     except Exception as e:
         logger.error(f"Ошибка при переключении страниц: {str(e)}")
         await bot.answer_callback_query(callback_query.id, "⚠ Ошибка при переключении страниц", show_alert=False)
 
+@dp.callback_query_handler(lambda c: c.data.startswith(("tasks_prev_", "tasks_next_")))
+async def process_tasks_pagination_legacy(callback_query: types.CallbackQuery):
+    """Кнопки списков, отправленных до смены формата callback_data"""
+    await bot.answer_callback_query(callback_query.id, SESSION_EXPIRED_TEXT, show_alert=True)
+
 # ======================
 # ЭКСПОРТ ЗАДАЧ В CSV
 # ======================
 
-@dp.message_handler(lambda message: message.text == "📤 Экспорт задач")
-async def export_tasks_to_csv(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
-    """Экспорт всех задач в CSV файл с кодировкой win1251"""
-    try:
-        cursor = conn.cursor()
-        cursor.execute(""" SELECT t.id, 
-                              CASE WHEN u.name IS NULL 
-                                   THEN t.user_id 
-                              ELSE u.name END "Исполнитель", 
-                              t.task_text as "Задача", 
-                              t.status as "Статус", 
-                              t.deadline as "Срок"
-                        FROM tasks t
-                        LEFT JOIN users u ON t.user_id = u.username
-                        WHERE status NOT IN ('удалено', 'исполнено')
-                        ORDER BY user_id ASC, datetime(deadline) ASC, id ASC""")
-        tasks = cursor.fetchall()
-        
-        if not tasks:
+async def send_tasks_excel(message: types.Message, include_done: bool):
+    """Построить Excel в потоке выгрузок и отправить файлом"""
+    with spooled_file() as output:
+        count = await tasks_repo.export_to(partial(write_tasks_xlsx, output=output), include_done=include_done)
+        if not count:
             await bot.send_message(chat_id=message.from_user.id, text="📭 В базе нет задач для экспорта.")
             return
-
-        # Создаем книгу Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "tasks_export"
-        
-        # Задаем заголовки
-        headers = ['№', 'Исполнитель', 'Задача', 'Статус', 'Срок']
-        ws.append(headers)
-        
-        # Определяем стили
-        header_fill = PatternFill(start_color="B7DEE8", end_color="B7DEE8", fill_type="solid")
-        thin_border = Border(
-            left=Side(style="thin", color="000000"),
-            right=Side(style="thin", color="000000"),
-            top=Side(style="thin", color="000000"),
-            bottom=Side(style="thin", color="000000")
-        )
-        header_font = Font(bold=True)
-        
-        # Применяем стили к заголовкам
-        for col, cell in enumerate(ws[1], start=1):
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = thin_border
-            # Центрирование для заголовка (по желанию)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Записываем данные
-        for row_data in tasks:
-            # Преобразуем значения в строки, если нужно
-            row = [str(item) if item is not None else '' for item in row_data]
-            ws.append(row)
-        
-        # Настройка ширины столбцов
-        ws.column_dimensions['A'].width = 6
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 45
-        ws.column_dimensions['D'].width = 20
-        ws.column_dimensions['E'].width = 16
-
-        # Преобразуем значение ячеек столбца "Срок" (столбец E) к datetime,
-        # затем задаем нужный формат
-        for row in ws.iter_rows(min_row=2, min_col=5, max_col=5):
-            for cell in row:
-                if cell.value:
-                    try:
-                        # Сначала пытаемся преобразовать значение как дату со временем
-                        date_value = datetime.strptime(str(cell.value), "%Y-%m-%d %H:%M")
-                    except Exception:
-                        try:
-                            # Если не получилось, пробуем преобразовать как дату без времени
-                            date_value = datetime.strptime(str(cell.value), "%Y-%m-%d")
-                        except Exception:
-                            # Если преобразование не удалось, оставляем значение без изменений
-                            continue
-                    cell.value = date_value
-                    # Если время задано (не равно 00:00), устанавливаем формат с временем
-                    if date_value.hour != 0 or date_value.minute != 0:
-                        cell.number_format = 'DD.MM.YYYY HH:MM'
-                    else:
-                        cell.number_format = 'DD.MM.YYYY'
-
-        # Применяем границы ко всем ячейкам
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=5):
-            for cell in row:
-                cell.border = thin_border
-
-        # Устанавливаем перенос слов для третьего столбца (используем Alignment)
-        for row in ws.iter_rows(min_row=2, min_col=3, max_col=3):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-        # Сохраняем Excel в память
-        output = io.BytesIO()
-        wb.save(output)
         output.seek(0)
-        
-        # Отправляем файл в Telegram (используем InputFile)
-        from aiogram.types import InputFile
-        excel_file = InputFile(output, filename="tasks_export.xlsx")
-        await message.reply_document(document=excel_file)
-        
+        await message.reply_document(document=InputFile(spooled_stream(output), filename="tasks_export.xlsx"))
+
+@dp.message_handler(lambda message: message.text == "📤 Экспорт задач")
+async def export_tasks_to_csv(message: types.Message):
+    """Экспорт активных задач в Excel"""
+    try:
+        await send_tasks_excel(message, include_done=False)
     except Exception as e:
         logger.error(f"Ошибка при экспорте задач в Excel: {str(e)}", exc_info=True)
         await bot.send_message(chat_id=message.from_user.id, text=f"⚠ Ошибка при создании файла экспорта: {str(e)}")
@@ -2136,111 +1826,9 @@ async def export_tasks_to_csv(message: types.Message):
 
 @dp.message_handler(lambda message: message.text == "📤 Экспорт (с исполненными)")
 async def export_tasks_to_csv2(message: types.Message):
-    if message.from_user.id not in ALLOWED_USERS:
-        await bot.send_message(chat_id=message.from_user.id, text="⛔ Доступ запрещен")
-        return  
-    """Экспорт всех задач в CSV файл с кодировкой win1251"""
+    """Экспорт задач вместе с исполненными в Excel"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(""" SELECT t.id, 
-                              CASE WHEN u.name IS NULL 
-                                   THEN t.user_id 
-                              ELSE u.name END "Исполнитель", 
-                              t.task_text as "Задача", 
-                              t.status as "Статус", 
-                              t.deadline as "Срок"
-                        FROM tasks t
-                        LEFT JOIN users u ON t.user_id = u.username
-                        WHERE status NOT IN ('удалено')
-                        ORDER BY user_id ASC, datetime(deadline) ASC, id ASC""")
-        tasks = cursor.fetchall()
-        
-        if not tasks:
-            await bot.send_message(chat_id=message.from_user.id, text="📭 В базе нет задач для экспорта.")
-            return
-
-        # Создаем книгу Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "tasks_export"
-        
-        # Задаем заголовки
-        headers = ['№', 'Исполнитель', 'Задача', 'Статус', 'Срок']
-        ws.append(headers)
-        
-        # Определяем стили
-        header_fill = PatternFill(start_color="B7DEE8", end_color="B7DEE8", fill_type="solid")
-        thin_border = Border(
-            left=Side(style="thin", color="000000"),
-            right=Side(style="thin", color="000000"),
-            top=Side(style="thin", color="000000"),
-            bottom=Side(style="thin", color="000000")
-        )
-        header_font = Font(bold=True)
-        
-        # Применяем стили к заголовкам
-        for col, cell in enumerate(ws[1], start=1):
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = thin_border
-            # Центрирование для заголовка (по желанию)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Записываем данные
-        for row_data in tasks:
-            # Преобразуем значения в строки, если нужно
-            row = [str(item) if item is not None else '' for item in row_data]
-            ws.append(row)
-        
-        # Настройка ширины столбцов
-        ws.column_dimensions['A'].width = 6
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 45
-        ws.column_dimensions['D'].width = 20
-        ws.column_dimensions['E'].width = 16
-
-        # Преобразуем значение ячеек столбца "Срок" (столбец E) к datetime,
-        # затем задаем нужный формат
-        for row in ws.iter_rows(min_row=2, min_col=5, max_col=5):
-            for cell in row:
-                if cell.value:
-                    try:
-                        # Сначала пытаемся преобразовать значение как дату со временем
-                        date_value = datetime.strptime(str(cell.value), "%Y-%m-%d %H:%M")
-                    except Exception:
-                        try:
-                            # Если не получилось, пробуем преобразовать как дату без времени
-                            date_value = datetime.strptime(str(cell.value), "%Y-%m-%d")
-                        except Exception:
-                            # Если преобразование не удалось, оставляем значение без изменений
-                            continue
-                    cell.value = date_value
-                    # Если время задано (не равно 00:00), устанавливаем формат с временем
-                    if date_value.hour != 0 or date_value.minute != 0:
-                        cell.number_format = 'DD.MM.YYYY HH:MM'
-                    else:
-                        cell.number_format = 'DD.MM.YYYY'
-
-        # Применяем границы ко всем ячейкам
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=5):
-            for cell in row:
-                cell.border = thin_border
-
-        # Устанавливаем перенос слов для третьего столбца (используем Alignment)
-        for row in ws.iter_rows(min_row=2, min_col=3, max_col=3):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-        # Сохраняем Excel в память
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        # Отправляем файл в Telegram (используем InputFile)
-        from aiogram.types import InputFile
-        excel_file = InputFile(output, filename="tasks_export.xlsx")
-        await message.reply_document(document=excel_file)
-        
+        await send_tasks_excel(message, include_done=True)
     except Exception as e:
         logger.error(f"Ошибка при экспорте задач в Excel: {str(e)}", exc_info=True)
         await bot.send_message(chat_id=message.from_user.id, text=f"⚠ Ошибка при создании файла экспорта: {str(e)}")
@@ -2249,68 +1837,64 @@ async def export_tasks_to_csv2(message: types.Message):
 # ЭКСПОРТ ЗАДАЧ В CSV (с удаленными и историей изменений)
 # ======================
 
+EXPORT3_USAGE = (
+    "Формат: /export3 [date=ДД.ММ.ГГГГ-ДД.ММ.ГГГГ] [id=ОТ-ДО] [gz|zip]\n"
+    "Любую границу диапазона можно опустить, например id=100- или date=-31.12.2024"
+)
+
+def parse_export_date(value: str):
+    """ДД.ММ.ГГГГ или ГГГГ-ММ-ДД -> ГГГГ-ММ-ДД, пустая строка -> None"""
+    if not value:
+        return None
+    return parse_date(value)
+
+def parse_export_args(args: str) -> dict:
+    """Аргументы /export3 -> параметры выгрузки, ValueError при ошибке"""
+    options = {"compression": None}
+    for arg in args.split():
+        key, _, value = arg.lower().partition("=")
+        if not value and key in COMPRESSIONS:
+            options["compression"] = key
+        elif key == "id":
+            low, _, high = value.partition("-")
+            options["id_from"] = int(low) if low else None
+            options["id_to"] = int(high) if high else None
+        elif key == "date":
+            # ДД.ММ.ГГГГ-ДД.ММ.ГГГГ или ГГГГ-ММ-ДД..ГГГГ-ММ-ДД
+            low, _, high = value.partition("..") if ".." in value else value.partition("-")
+            options["date_from"] = parse_export_date(low)
+            options["date_to"] = parse_export_date(high)
+        else:
+            raise ValueError(arg)
+    return options
+
 @dp.message_handler(commands=["export3"])
 async def export_tasks_to_csv3(message: types.Message):
     if message.from_user.id != ADMIN_ID:
         await bot.send_message(chat_id=message.from_user.id, text="⛔ Только администратор может делать полный экспорт")
         return
       
-    """Экспорт всех задач в CSV файл с кодировкой win1251"""
+    """Экспорт задач с историей изменений в CSV (utf-8-sig), можно по диапазону id и сроков"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("""SELECT id, creator_id, user_id, chat_id, task_text, status, deadline, 999999 as "id_log" 
-                          FROM tasks
-                          UNION ALL SELECT id, creator_id, user_id, chat_id, task_text, status, deadline, id_log 
-                          FROM tasks_log
-                          ORDER BY id DESC, id_log DESC
-                      """)
-        tasks = cursor.fetchall()
-        
-        if not tasks:
-            await bot.send_message(chat_id=message.from_user.id, text="📭 В базе нет задач для экспорта.")
-            return
+        options = parse_export_args(message.get_args() or "")
+    except ValueError:
+        await bot.send_message(chat_id=message.from_user.id, text=EXPORT3_USAGE)
+        return
 
-        # Создаем CSV в памяти
-        output = io.BytesIO()
-        
-        # Используем TextIOWrapper с нужной кодировкой
-        text_buffer = io.TextIOWrapper(
-            output,
-            encoding='utf-8-sig',
-            errors='replace',  # заменяем некодируемые символы
-            newline=''
-        )
-        
-        writer = csv.writer(
-            text_buffer,
-            delimiter=';',  # Указываем нужный разделитель
-            quoting=csv.QUOTE_MINIMAL
-        )
-        
-        # Заголовки столбцов
+    try:
+        compression = options.pop("compression")
         headers = ['ID', 'ID создателя', 'Исполнитель', 'ID редактора', 'Задача', 'Статус', 'Срок', 'ID Log']
-        writer.writerow(headers)
-        
-        # Данные
-        for task in tasks:
-            # Преобразуем все значения в строки
-            row = [
-                str(item) if item is not None else ''
-                for item in task
-            ]
-            writer.writerow(row)
-        
-        # Важно: закрыть TextIOWrapper перед использованием буфера
-        text_buffer.flush()
-        text_buffer.detach()  # Отсоединяем TextIOWrapper от BytesIO
-        output.seek(0)
-        
-        # Создаем временный файл
-        csv_file = InputFile(output, filename="tasks_export.csv")
-        
-        await message.reply_document(
-            document=csv_file
-        )
+        write = partial(write_csv, headers=headers, compression=compression, name="tasks_export")
+        with spooled_file() as output:
+            # Курсор читается пачками в потоке выгрузок, файл пишется по мере чтения
+            count = await tasks_repo.export_full_to(partial(write, output=output), **options)
+            if not count:
+                await bot.send_message(chat_id=message.from_user.id, text="📭 В базе нет задач для экспорта.")
+                return
+            output.seek(0)
+            await message.reply_document(
+                document=InputFile(spooled_stream(output), filename=csv_filename("tasks_export", compression))
+            )
         
     except Exception as e:
         logger.error(f"Ошибка при экспорте задач: {str(e)}", exc_info=True)
@@ -2327,20 +1911,13 @@ async def delete_task_start(message: types.Message):
         return
 
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, task_text, status 
-            FROM tasks
-            ORDER BY id DESC 
-            LIMIT 0
-        """)
-        tasks = cursor.fetchall()
+        tasks = await tasks_repo.list_recent(limit=0)
 
         keyboard = InlineKeyboardMarkup(row_width=1)
-        for task_id, task_text, status in tasks:
+        for task in tasks:
             keyboard.add(InlineKeyboardButton(
-                f"{task_text[:30]}... (ID: {task_id}, статус: {status})", 
-                callback_data=f"delete_task_{task_id}"
+                f"{task.task_text[:30]}... (ID: {task.id}, статус: {task.status})", 
+                callback_data=f"delete_task_{task.id}"
             ))
         
         keyboard.add(InlineKeyboardButton("✏️ Ввести ID вручную", callback_data="enter_task_id_manually_delete"))
@@ -2362,9 +1939,7 @@ async def process_manual_task_id_delete(message: types.Message, state: FSMContex
     """Обработка ручного ввода ID задачи для удаления"""
     try:
         task_id = int(message.text)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM tasks WHERE id=?", (task_id,))
-        if not cursor.fetchone():
+        if not await tasks_repo.exists(task_id):
             await bot.send_message(chat_id=message.from_user.id, text="⚠ Задача с таким ID не найдена или не принадлежит вам!")
             await state.finish()
             return
@@ -2389,15 +1964,13 @@ async def select_task_for_deletion(callback_query: types.CallbackQuery):
 
 async def show_delete_confirmation(message_obj, task_id):
     """Показать подтверждение удаления (общая функция)"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT task_text, status, deadline FROM tasks WHERE id=?", (task_id,))
-    task_info = cursor.fetchone()
+    task = await tasks_repo.get(task_id)
     
-    if not task_info:
+    if not task:
         await bot.send_message(chat_id=message_obj.from_user.id, text="⚠ Задача не найдена!")
         return
     
-    task_text, status, deadline = task_info
+    task_text, status, deadline = task.task_text, task.status, task.deadline
     
     keyboard = InlineKeyboardMarkup()
     keyboard.row(
@@ -2421,19 +1994,15 @@ async def execute_task_deletion(callback_query: types.CallbackQuery, state: FSMC
     try:
         task_id = callback_query.data.split("_")[2]
         
-        cursor = conn.cursor()
-        cursor.execute("SELECT task_text FROM tasks WHERE id=?", (task_id,))
-        task = cursor.fetchone()
+        task = await tasks_repo.get(task_id)
         
         if not task:
             await bot.send_message(chat_id=callback_query.chat.id, text="⚠ Задача не найдена!")
             return
             
-        task_text = task[0]
+        task_text = task.task_text
         
-        cursor.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-        cursor.execute("DELETE FROM tasks_log WHERE id=?", (task_id,))
-        conn.commit()
+        await tasks_repo.delete(task_id)
         
         # Редактируем сообщение с подтверждением
         await callback_query.message.edit_text(
@@ -2492,24 +2061,20 @@ async def process_user_id(message: types.Message, state: FSMContext):
     is_moderator = None if is_moderator == 'NULL' else is_moderator
 
     # Получаем подключение к базе данных из контекста
-    cursor = conn.cursor()
     user_id = int(user_id)
 
     # Проверяем, существует ли уже пользователь
-    cursor.execute("SELECT 1 FROM users WHERE tg_user_id = ?", (user_id,))
-    if cursor.fetchone():
+    if await users_repo.exists(user_id):
         await message.reply("⚠ Пользователь с таким ID уже существует!")
         await state.finish()
         return
 
     try:
         # Вставляем в базу данных
-        cursor.execute('INSERT INTO users (tg_user_id, name, is_moderator, username) VALUES (?, ?, ?, ?)', (user_id, user_name, is_moderator, username))
-        conn.commit()
+        await users_repo.add(user_id, user_name, is_moderator, username)
         
         # Обновляем список разрешенных пользователей
-        update_allowed_users(conn)
-        update_moderator_users(conn)
+        permissions.add(user_id, is_moderator=is_moderator == 'moderator')
         
         # Отправляем подтверждение
         await message.reply("✅ Пользователь успешно добавлен!")
@@ -2545,23 +2110,19 @@ async def process_remove_user(message: types.Message, state: FSMContext):
         return
 
     user_id = int(message.text)
-    cursor = conn.cursor()
     
     # Проверяем, существует ли пользователь
-    cursor.execute("SELECT 1 FROM users WHERE tg_user_id = ?", (user_id,))
-    if not cursor.fetchone():
+    if not await users_repo.exists(user_id):
         await message.reply("⚠ Пользователь с таким ID не найден!")
         await state.finish()
         return
     
     try:
         # Удаляем пользователя из базы
-        cursor.execute("DELETE FROM users WHERE tg_user_id = ?", (user_id,))
-        conn.commit()
+        await users_repo.remove(user_id)
         
         # Обновляем список разрешенных пользователей
-        update_allowed_users(conn)
-        update_moderator_users(conn)
+        permissions.remove(user_id)
         
         await message.reply("✅ Пользователь успешно удален!")
         
@@ -2582,9 +2143,7 @@ async def export_users_to_csv3(message: types.Message):
       
     """Экспорт всех задач в CSV файл с кодировкой win1251"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT tg_user_id, name, username, is_moderator FROM users")
-        users = cursor.fetchall()
+        users = await users_repo.all()
         
         if not users:
             await bot.send_message(chat_id=message.from_user.id, text="📭 В базе нет пользователей.")
@@ -2636,11 +2195,37 @@ async def export_users_to_csv3(message: types.Message):
         logger.error(f"Ошибка при экспорте задач: {str(e)}", exc_info=True)
         await bot.send_message(chat_id=message.from_user.id,text=f"⚠ Ошибка при создании файла экспорта: {str(e)}")
 
+# ======================
+# ПЕРЕСЧЕТ СЧЕТЧИКОВ
+# ======================
+
+@dp.message_handler(commands=["recount"])
+async def recount_tasks(message: types.Message):
+    if message.from_user.id != ADMIN_ID:
+        await bot.send_message(chat_id=message.from_user.id, text="⛔ Только администратор может пересчитывать счетчики")
+        return
+
+    """Пересчет счетчиков активных задач по базе и сброс готовых страниц списков"""
+    try:
+        fixed = await active_counters.rebuild()
+        page_cache.on_task_change(None, None)
+        pages, sessions = page_cache.stats(), view_sessions.stats()
+        await bot.send_message(
+            chat_id=message.from_user.id,
+            text=f"✅ Счетчики пересчитаны: активных задач {active_counters.count()}, исправлено значений {fixed}\n"
+                 f"Кэш страниц: попаданий {pages['hits']}, промахов {pages['misses']}\n"
+                 f"Сессии списков: {sessions['size']} из {sessions['max_size']}"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при пересчете счетчиков: {str(e)}", exc_info=True)
+        await bot.send_message(chat_id=message.from_user.id, text="⚠ Ошибка при пересчете счетчиков.")
+
 # ======================
 # ID Пользователя
 # ======================
 
 @dp.message_handler(commands=["myid"])
+@public
 async def get_user_id(message: types.Message):
     await bot.send_message(chat_id=message.from_user.id,text=f"Ваш 🆔 `{message.from_user.id}`", parse_mode="Markdown")
 
@@ -2648,37 +2233,11 @@ async def get_user_id(message: types.Message):
 # ФОНОВЫЕ ЗАДАЧИ
 # ======================
 
-async def check_deadlines():
-    """Проверка дедлайнов и отправка напоминаний создателю"""
-    while True:
-        try:
-            now = datetime.now().strftime("%Y-%m-%d")
-            cursor = background_conn.cursor()
-            cursor.execute(
-                "SELECT id, chat_id, task_text, user_id, status, deadline FROM tasks "
-                "WHERE deadline<=? AND status NOT IN ('исполнено','удалено')", 
-                (now,)
-            )
-            tasks = cursor.fetchall()
-
-            for task_id, chat_id, task_text, user_id, status, deadline in tasks:
-                try:
-                    # Отправляем в ЛС создателя (chat_id == user_id)
-                    await bot.send_message(
-                        chat_id=chat_id,
-                        text=f"⏳ Напоминание о задаче 🔹{task_id}:\n📝: {task_text}\n\n👤: {user_id}\n🔄: {status} ⏳: {format_date(deadline)}"
-                    )
-                except exceptions.BotBlocked:
-                    logger.error(f"Пользователь {chat_id} заблокировал бота")
-                except exceptions.ChatNotFound:
-                    logger.error(f"Чат {chat_id} не найден")
-                except Exception as e:
-                    logger.error(f"Ошибка: {e}")
-
-            await asyncio.sleep(21600)
-        except Exception as e:
-            logger.error(f"Ошибка в фоновой задаче: {e}")
-            await asyncio.sleep(60)
+# Напоминания срабатывают точно в срок; планировщик следит за изменениями задач
+send_reminders = ReminderSender(tasks_repo, reminders_repo, notifier, mode=REMINDER_MODE)
+reminder_scheduler = DeadlineScheduler(send_reminders, day_start=REMINDER_DAY_START, steps=REMINDER_STEPS,
+                                       repeat_interval=REMINDER_REPEAT)
+tasks_repo.subscribe(reminder_scheduler.on_task_change)
 
 # ======================
 # HEALTH CHECK
@@ -2688,10 +2247,27 @@ async def health_check(request):
     """Endpoint для health check"""
     return web.Response(text="OK")
 
+# ======================
+# WEBHOOK
+# ======================
+
+class LimitedWebhookRequestHandler(WebhookRequestHandler):
+    """Прием обновлений через webhook с ограничением одновременной обработки"""
+
+    async def post(self):
+        if WEBHOOK_SECRET and self.request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            raise web.HTTPForbidden()
+        async with self.request.app['webhook_semaphore']:
+            return await super().post()
+
 async def start_web_server():
-    """Запуск HTTP сервера для health check"""
+    """Запуск HTTP сервера для health check (и webhook, если он включен)"""
     app = web.Application()
     app.router.add_get('/health', health_check)
+    if WEBHOOK_HOST:
+        app.router.add_route('*', WEBHOOK_PATH, LimitedWebhookRequestHandler, name='webhook_handler')
+        app[BOT_DISPATCHER_KEY] = dp
+        app['webhook_semaphore'] = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', 8000)
@@ -2703,12 +2279,33 @@ async def start_web_server():
 
 async def main():
     """Основная функция запуска"""
+    permissions.load(await users_repo.all())
     await set_bot_commands(bot)  # Регистрация команд в интерфейсе Telegram
-    asyncio.create_task(check_deadlines())
-    await asyncio.gather(
-        start_web_server(),
-        dp.start_polling()
-    )
+    reminder_scheduler.load(await reminders_repo.pending())
+    await active_counters.rebuild()
+    asyncio.create_task(reminder_scheduler.run())
+    asyncio.create_task(outbox.run())
+    try:
+        if WEBHOOK_HOST:
+            # Обновления приходят на тот же HTTP сервер, что и health check
+            await start_web_server()
+            await bot.set_webhook(
+                WEBHOOK_HOST.rstrip('/') + WEBHOOK_PATH,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                secret_token=WEBHOOK_SECRET or None
+            )
+            logger.info(f"Webhook установлен: {WEBHOOK_PATH}")
+            await asyncio.Event().wait()
+        else:
+            await bot.delete_webhook()
+            await asyncio.gather(
+                start_web_server(),
+                dp.start_polling()
+            )
+    finally:
+        # Сохраняем незаписанные состояния диалогов
+        await dp.storage.close()
+        await dp.storage.wait_closed()
 
 if __name__ == "__main__":
     try:
@@ -2716,4 +2313,4 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
-        conn.close()
+        db.close()
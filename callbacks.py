@@ -0,0 +1,59 @@
+import zlib
+from typing import NamedTuple, Optional
+
+# Ограничение Telegram на callback_data, в байтах
+CALLBACK_LIMIT = 64
+
+# Версия формата кнопок листания; старые кнопки с другой версией не разбираются
+PAGE_PREFIX = "p1"
+
+# Маркеры поля фильтра: значение в самой кнопке или ссылка на сессию
+_INLINE = "="
+_SESSION = "~"
+
+
+class PageRef(NamedTuple):
+    """Кнопка листания списка задач"""
+    view: str                       # "e" - по исполнителю, "d" - по сроку
+    backward: bool
+    page: int
+    pages: int
+    cursor_id: int
+    filter: Optional[str] = None    # значение фильтра, если оно уместилось в кнопку
+    token: Optional[str] = None     # иначе - ключ сессии, где лежит фильтр
+
+
+def filter_token(filter_value: str) -> str:
+    """Короткий ключ длинного фильтра для хранения в сессии"""
+    return format(zlib.crc32(filter_value.encode("utf-8")), "08x")
+
+
+def encode_page(ref: PageRef) -> Optional[str]:
+    """PageRef -> callback_data: p1:<вид>:<p|n>:<страница>:<страниц>:<id>:<фильтр>.
+
+    Фильтр идет последним и может содержать ":". None, если фильтр
+    не умещается в 64 байта - тогда его нужно передать через ref.token.
+    """
+    if ref.token is not None:
+        tail = _SESSION + ref.token
+    else:
+        tail = _INLINE + (ref.filter or "")
+    data = ":".join((PAGE_PREFIX, ref.view, "p" if ref.backward else "n",
+                     str(ref.page), str(ref.pages), str(ref.cursor_id), tail))
+    if len(data.encode("utf-8")) > CALLBACK_LIMIT:
+        return None
+    return data
+
+
+def decode_page(data: str) -> PageRef:
+    """callback_data -> PageRef, ValueError для чужого или устаревшего формата"""
+    parts = data.split(":", 6)
+    if len(parts) != 7 or parts[0] != PAGE_PREFIX or parts[2] not in ("p", "n"):
+        raise ValueError(data)
+    _, view, direction, page, pages, cursor_id, tail = parts
+    marker, value = tail[:1], tail[1:]
+    if marker == _INLINE:
+        return PageRef(view, direction == "p", int(page), int(pages), int(cursor_id), filter=value or None)
+    if marker == _SESSION:
+        return PageRef(view, direction == "p", int(page), int(pages), int(cursor_id), token=value)
+    raise ValueError(data)
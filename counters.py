@@ -0,0 +1,105 @@
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from repository import TaskRepository, TaskRow, deadline_ts
+
+DAY = 86400
+
+# Ключ счетчика: (исполнитель, номер дня срока); None - без исполнителя / без срока
+CounterKey = Tuple[Optional[str], Optional[int]]
+
+
+def _deadline_day(deadline: Optional[str]) -> Optional[int]:
+    """Номер дня срока, как deadline_ts / 86400 в базе"""
+    if not deadline:
+        return None
+    try:
+        return deadline_ts(deadline) // DAY
+    except ValueError:
+        return None
+
+
+def _key(task: Optional[TaskRow]) -> Optional[CounterKey]:
+    """Ключ активной задачи, None для закрытой и удаленной (как is_active в базе)"""
+    if task is None or task.status is None or not task.is_active:
+        return None
+    return task.user_id, _deadline_day(task.deadline)
+
+
+class ActiveCounters:
+    """Число активных задач по исполнителю, по дню срока и всего.
+
+    Загружается из базы один раз (rebuild), дальше обновляется подписчиком
+    изменений TaskRepository, поэтому число страниц списка считается без
+    запроса COUNT(*). До загрузки count() возвращает None.
+    """
+
+    def __init__(self, repo: TaskRepository):
+        self.repo = repo
+        self.loaded = False
+        self._pairs: Counter = Counter()
+        self._executors: Counter = Counter()
+        self._days: Counter = Counter()
+        self._total = 0
+
+    def _add(self, key: CounterKey, count: int):
+        executor, day = key
+        for counter, counter_key in ((self._pairs, key), (self._executors, executor), (self._days, day)):
+            counter[counter_key] += count
+            if counter[counter_key] <= 0:
+                del counter[counter_key]
+        self._total += count
+
+    def on_task_change(self, old: Optional[TaskRow], new: Optional[TaskRow]):
+        """Подписчик изменений TaskRepository"""
+        if not self.loaded:
+            return
+        old_key, new_key = _key(old), _key(new)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self._add(old_key, -1)
+        if new_key is not None:
+            self._add(new_key, 1)
+
+    def _load(self, rows: Iterable[Tuple[Optional[str], Optional[int], int]]):
+        self._pairs.clear()
+        self._executors.clear()
+        self._days.clear()
+        self._total = 0
+        for executor, day, count in rows:
+            self._add((executor, day), count)
+        self.loaded = True
+
+    async def rebuild(self) -> int:
+        """Пересчитать счетчики по базе; вернуть число расходившихся значений.
+
+        Снимок читается в потоке записи (см. TaskRepository.active_counts):
+        изменения, вошедшие в снимок, уже прошли через on_task_change до
+        загрузки, а более поздние применятся к новым значениям, поэтому
+        ни одно изменение не учитывается дважды.
+        """
+        rows = await self.repo.active_counts()
+        before = self._pairs.copy() if self.loaded else None
+        self._load(rows)
+        if before is None:
+            return 0
+        return sum(1 for key in before.keys() | self._pairs.keys() if before[key] != self._pairs[key])
+
+    def count(self, executor_filter: Optional[str] = None, deadline_filter: Optional[str] = None) -> Optional[int]:
+        """Как TaskRepository.count_active, но из памяти; None, если счетчики не загружены"""
+        if not self.loaded:
+            return None
+        executor = executor_filter
+        if executor_filter is not None and executor_filter.lower() == "none":
+            executor = None
+        day = None
+        if deadline_filter is not None and deadline_filter.lower() != "none":
+            day = deadline_ts(deadline_filter) // DAY
+        if executor_filter is None and deadline_filter is None:
+            return self._total
+        if deadline_filter is None:
+            return self._executors[executor]
+        if executor_filter is None:
+            return self._days[day]
+        return self._pairs[(executor, day)]
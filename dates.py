@@ -0,0 +1,164 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Сроки хранятся в базе как "ГГГГ-ММ-ДД" или "ГГГГ-ММ-ДД ЧЧ:ММ"
+STORED_DATE = "%Y-%m-%d"
+STORED_DATETIME = "%Y-%m-%d %H:%M"
+
+CACHE_SIZE = 4096
+
+# ======================
+# РАЗБОР
+# ======================
+
+_TIME = r"(?:\s+(\d{1,2}):(\d{2}))?"
+_STORED_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2}))?")
+_ISO_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})" + _TIME)
+_DOTTED_RE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4}|\d{2})" + _TIME)
+_WORD_RE = re.compile(r"([а-яё]+)" + _TIME)
+_RELATIVE_RE = re.compile(r"через\s+(?:(\d+)\s+)?(минут[ауы]?|час[аов]*|день|дня|дней|недел[юиь]|недель)" + _TIME)
+
+_WEEKDAYS = {
+    'пн': 0, 'пон': 0, 'понедельник': 0,
+    'вт': 1, 'вто': 1, 'вторник': 1,
+    'ср': 2, 'сре': 2, 'среда': 2, 'среду': 2,
+    'чт': 3, 'чет': 3, 'четверг': 3,
+    'пт': 4, 'пят': 4, 'пятница': 4, 'пятницу': 4,
+    'сб': 5, 'суб': 5, 'суббота': 5, 'субботу': 5,
+    'вс': 6, 'вос': 6, 'воскресенье': 6,
+}
+_DAY_WORDS = {'сегодня': 0, 'завтра': 1, 'послезавтра': 2}
+
+
+def _time(hour, minute) -> Optional[Tuple[int, int]]:
+    if hour is None:
+        return None
+    hour, minute = int(hour), int(minute)
+    if hour > 23 or minute > 59:
+        raise ValueError("Неверное время")
+    return hour, minute
+
+
+def _year(value: str) -> int:
+    year = int(value)
+    if len(value) == 2:
+        # Как %y в strptime: 69-99 -> 19xx, 00-68 -> 20xx
+        year += 1900 if year >= 69 else 2000
+    return year
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_input(text: str) -> tuple:
+    """Разбор ввода без привязки к текущей дате.
+
+    Результат - описание срока: ("date", год, месяц, день, время),
+    ("days", смещение, время), ("weekday", день недели, время)
+    или ("delta", секунды). Время - (час, минута) или None.
+    """
+    match = _ISO_RE.fullmatch(text)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        return "date", int(year), int(month), int(day), _time(hour, minute)
+    match = _DOTTED_RE.fullmatch(text)
+    if match:
+        day, month, year, hour, minute = match.groups()
+        return "date", _year(year), int(month), int(day), _time(hour, minute)
+    match = _WORD_RE.fullmatch(text)
+    if match:
+        word, hour, minute = match.groups()
+        if word in _DAY_WORDS:
+            return "days", _DAY_WORDS[word], _time(hour, minute)
+        if word in _WEEKDAYS:
+            return "weekday", _WEEKDAYS[word], _time(hour, minute)
+    match = _RELATIVE_RE.fullmatch(text)
+    if match:
+        count, unit, hour, minute = match.groups()
+        count = int(count) if count else 1
+        if unit.startswith("минут"):
+            return "delta", count * 60
+        if unit.startswith("час"):
+            return "delta", count * 3600
+        days = count * 7 if unit.startswith("недел") else count
+        return "days", days, _time(hour, minute)
+    raise ValueError("Неверный формат даты. Используйте DD.MM.YYYY")
+
+
+def _stored(day: date, at: Optional[Tuple[int, int]]) -> str:
+    if at is None:
+        return day.strftime(STORED_DATE)
+    return datetime(day.year, day.month, day.day, *at).strftime(STORED_DATETIME)
+
+
+def parse_deadline(text: str, now: Optional[datetime] = None) -> str:
+    """Срок, введенный пользователем, -> формат базы.
+
+    Понимает ДД.ММ.ГГГГ, ДД.ММ.ГГ, ГГГГ-ММ-ДД (везде можно добавить ЧЧ:ММ),
+    "сегодня", "завтра", "послезавтра", дни недели ("пт 15:00")
+    и "через N минут/часов/дней/недель". ValueError при ошибке.
+    """
+    spec = _parse_input(" ".join(text.lower().split()))
+    now = now or datetime.now()
+    kind = spec[0]
+    if kind == "date":
+        _, year, month, day, at = spec
+        try:
+            return _stored(date(year, month, day), at)
+        except ValueError:
+            raise ValueError("Такой даты нет") from None
+    if kind == "days":
+        return _stored(now.date() + timedelta(days=spec[1]), spec[2])
+    if kind == "weekday":
+        days_ahead = spec[1] - now.weekday()
+        if days_ahead <= 0:
+            days_ahead += 7
+        return _stored(now.date() + timedelta(days=days_ahead), spec[2])
+    return (now + timedelta(seconds=spec[1])).strftime(STORED_DATETIME)
+
+
+def parse_date(text: str) -> str:
+    """ДД.ММ.ГГГГ или ГГГГ-ММ-ДД -> ГГГГ-ММ-ДД (без времени и относительных форм)"""
+    spec = _parse_input(text.strip())
+    if spec[0] != "date" or spec[4] is not None:
+        raise ValueError(text)
+    return date(*spec[1:4]).strftime(STORED_DATE)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_stored(value: Optional[str]) -> Optional[datetime]:
+    """Срок из базы -> datetime, None если срока нет или формат не распознан"""
+    if not value:
+        return None
+    match = _STORED_RE.fullmatch(value)
+    if not match:
+        return None
+    year, month, day, hour, minute = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+    except ValueError:
+        return None
+
+
+# ======================
+# ФОРМАТИРОВАНИЕ
+# ======================
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_date(value: Optional[str]) -> Optional[str]:
+    """Срок для вывода: 10.05.2025 или 10.05.2025 (12:30); нераспознанное значение возвращается как есть"""
+    dt = parse_stored(value)
+    if dt is None:
+        return value
+    if dt.hour == 0 and dt.minute == 0:
+        return dt.strftime("%d.%m.%Y")
+    return f"{dt.strftime('%d.%m.%Y')} ({dt.strftime('%H:%M')})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_deadline_time(value: Optional[str]) -> str:
+    """Время срока "ЧЧ:ММ" или пустая строка, если время не задано"""
+    dt = parse_stored(value)
+    if dt is None or (dt.hour == 0 and dt.minute == 0):
+        return ""
+    return dt.strftime("%H:%M")
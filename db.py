@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Значения PRAGMA по умолчанию, переопределяются через init_db / переменные окружения
+DEFAULT_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,   # 256 МБ
+    "cache_size": -16000,     # отрицательное значение - размер в КиБ
+    "busy_timeout": 5000,     # мс
+    "temp_store": "MEMORY",
+}
+
+
+class Database:
+    """Асинхронный доступ к SQLite.
+
+    Запись идет через одно соединение в выделенном потоке, чтение - через
+    небольшой пул потоков со своими соединениями. База работает в режиме
+    WAL, поэтому читатели (списки, экспорт, напоминания) не блокируют
+    создание задач, а обработчики не блокируют цикл событий.
+
+    Долгие чтения (экспорт) идут через отдельный пул потоков со своими
+    соединениями, чтобы не занимать пул чтения, через который работают
+    состояния диалогов и списки задач.
+    """
+
+    def __init__(self, path: str, readers: int = 2, pragmas: dict = None, exporters: int = 1):
+        self.path = path
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-reader")
+        self._exporters = ThreadPoolExecutor(max_workers=max(1, exporters), thread_name_prefix="db-export")
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                logger.warning(f"Не удалось включить WAL, режим журнала: {mode}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _connection(self, readonly: bool) -> sqlite3.Connection:
+        # У каждого потока свое соединение, создается лениво
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(readonly)
+            self._local.conn = conn
+        return conn
+
+    def _call_write(self, fn, *args):
+        conn = self._connection(readonly=False)
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _call_read(self, fn, *args):
+        conn = self._connection(readonly=True)
+        try:
+            return fn(conn, *args)
+        finally:
+            # Завершаем неявную транзакцию чтения, чтобы не держать снимок WAL
+            if conn.in_transaction:
+                conn.rollback()
+
+    def run_sync(self, fn, *args):
+        """Выполнить fn(conn, *args) на соединении записи (для старта до запуска цикла событий)"""
+        return self._writer.submit(self._call_write, fn, *args).result()
+
+    async def run(self, fn, *args):
+        """Выполнить fn(conn, *args) на соединении записи одной транзакцией"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._call_write, fn, *args)
+
+    async def read(self, fn, *args):
+        """Выполнить fn(conn, *args) на одном из соединений чтения"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._call_read, fn, *args)
+
+    async def read_bulk(self, fn, *args):
+        """Как read, но в пуле долгих чтений: одновременных выгрузок не больше exporters"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._exporters, self._call_read, fn, *args)
+
+    async def fetchone(self, sql: str, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql: str, params=()):
+        """Выполнить изменяющий запрос, вернуть lastrowid"""
+        return await self.run(lambda conn: conn.execute(sql, params).lastrowid)
+
+    def close(self):
+        self._readers.shutdown(wait=True)
+        self._exporters.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
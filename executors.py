@@ -0,0 +1,81 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from repository import TaskRepository, TaskRow
+
+
+class ExecutorPicker(NamedTuple):
+    """Вид клавиатуры выбора исполнителя"""
+    prefix: str                                 # callback_data кнопки: "<prefix>|<исполнитель>"
+    manual: Optional[Tuple[str, str]] = None    # кнопка ручного ввода: (текст, callback_data)
+    include_done: bool = False                  # учитывать исполненные задачи
+    none_data: Optional[str] = "None"           # callback_data для задач без исполнителя, None - не показывать
+    icon: bool = True                           # "👤" перед именем
+
+
+def build_executor_keyboard(picker: ExecutorPicker, executors: List[Optional[str]]) -> InlineKeyboardMarkup:
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    buttons = []
+    for executor in executors:
+        if executor:
+            label, data = (f"👤 {executor}" if picker.icon else executor), executor
+        elif picker.none_data is not None:
+            label, data = "👤 Без исполнителя", picker.none_data
+        else:
+            continue
+        buttons.append(InlineKeyboardButton(label, callback_data=f"{picker.prefix}|{data}"))
+    keyboard.add(*buttons)
+    if picker.manual:
+        keyboard.row(InlineKeyboardButton(picker.manual[0], callback_data=picker.manual[1]))
+    return keyboard
+
+
+class ExecutorCache:
+    """Списки исполнителей и готовые клавиатуры выбора.
+
+    Набор исполнителей меняется только при создании и удалении задачи,
+    смене исполнителя и переходе между активными и закрытыми статусами,
+    поэтому кэш сбрасывается подписчиком изменений TaskRepository, а не
+    по времени. Номер версии не дает сохранить список, прочитанный до сброса.
+    """
+
+    def __init__(self, repo: TaskRepository):
+        self.repo = repo
+        self.version = 0
+        self._lists: Dict[Tuple[bool, Optional[str]], List[Optional[str]]] = {}
+        self._keyboards: Dict[Tuple[ExecutorPicker, Optional[str]], InlineKeyboardMarkup] = {}
+
+    def invalidate(self):
+        self.version += 1
+        self._lists.clear()
+        self._keyboards.clear()
+
+    def on_task_change(self, old: Optional[TaskRow], new: Optional[TaskRow]):
+        """Подписчик изменений TaskRepository"""
+        if (old is None or new is None or old.user_id != new.user_id
+                or old.is_active != new.is_active or (old.status == 'удалено') != (new.status == 'удалено')):
+            self.invalidate()
+
+    async def executors(self, include_done: bool = False, creator_id=None) -> List[Optional[str]]:
+        """Исполнители, недавно получавшие задачи - первыми"""
+        key = (include_done, None if creator_id is None else str(creator_id))
+        executors = self._lists.get(key)
+        if executors is None:
+            version = self.version
+            executors = await self.repo.list_executors(include_done=include_done, creator_id=creator_id)
+            if version == self.version:
+                self._lists[key] = executors
+        return executors
+
+    async def keyboard(self, picker: ExecutorPicker, creator_id=None) -> Tuple[List[Optional[str]], InlineKeyboardMarkup]:
+        """Исполнители и клавиатура выбора; клавиатура общая, изменять ее нельзя"""
+        key = (picker, None if creator_id is None else str(creator_id))
+        version = self.version
+        executors = await self.executors(picker.include_done, creator_id)
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            keyboard = build_executor_keyboard(picker, executors)
+            if version == self.version:
+                self._keyboards[key] = keyboard
+        return executors, keyboard
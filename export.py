@@ -0,0 +1,163 @@
+import codecs
+import csv
+import gzip
+import io
+import tempfile
+import zipfile
+from typing import Iterable
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+from dates import parse_stored
+
+# Файлы больше этого размера уходят из памяти во временный файл на диске
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# ======================
+# EXCEL
+# ======================
+
+TASK_HEADERS = ['№', 'Исполнитель', 'Задача', 'Статус', 'Срок']
+TASK_WIDTHS = {'A': 6, 'B': 25, 'C': 45, 'D': 20, 'E': 16}
+TASK_WRAP_COLUMN = 2    # "Задача"
+TASK_DEADLINE_COLUMN = 4    # "Срок"
+
+_thin = Side(style="thin", color="000000")
+_border = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+
+
+def _named_styles():
+    """Стили создаются один раз на книгу, ячейки ссылаются на них по имени"""
+    return [
+        NamedStyle(name="export_header", border=_border, font=Font(bold=True),
+                   fill=PatternFill(start_color="B7DEE8", end_color="B7DEE8", fill_type="solid"),
+                   alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle(name="export_cell", border=_border),
+        NamedStyle(name="export_wrap", border=_border, alignment=Alignment(wrap_text=True, vertical="top")),
+        NamedStyle(name="export_date", border=_border, number_format='DD.MM.YYYY'),
+        NamedStyle(name="export_datetime", border=_border, number_format='DD.MM.YYYY HH:MM'),
+    ]
+
+
+def _deadline_value(value):
+    """Срок из базы -> (значение ячейки, стиль)"""
+    date_value = parse_stored(value)
+    if date_value is None:
+        return value, "export_cell"
+    if date_value.hour != 0 or date_value.minute != 0:
+        return date_value, "export_datetime"
+    return date_value, "export_date"
+
+
+def write_tasks_xlsx(rows: Iterable, output) -> int:
+    """Записать строки экспорта задач в книгу Excel в потоковом режиме.
+
+    Книга открывается в режиме write-only: строки уходят в файл по мере
+    чтения курсора и не держатся в памяти. Возвращает число строк.
+    """
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet("tasks_export")
+    for column, width in TASK_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+
+    def cell(value, style):
+        c = WriteOnlyCell(ws, value=value)
+        c.style = style
+        return c
+
+    ws.append([cell(header, "export_header") for header in TASK_HEADERS])
+
+    count = 0
+    for row_data in rows:
+        row = []
+        for index, item in enumerate(row_data):
+            if index == TASK_DEADLINE_COLUMN and item:
+                row.append(cell(*_deadline_value(item)))
+            else:
+                value = str(item) if item is not None else ''
+                row.append(cell(value, "export_wrap" if index == TASK_WRAP_COLUMN else "export_cell"))
+        ws.append(row)
+        count += 1
+
+    wb.save(output)
+    return count
+
+
+# ======================
+# CSV
+# ======================
+
+CSV_BATCH_SIZE = 500
+COMPRESSIONS = ("gz", "zip")
+
+
+def csv_filename(name: str, compression: str = None) -> str:
+    if compression == "gz":
+        return f"{name}.csv.gz"
+    if compression == "zip":
+        return f"{name}.zip"
+    return f"{name}.csv"
+
+
+def write_csv(cursor, output, headers, compression: str = None, name: str = "export",
+              batch_size: int = CSV_BATCH_SIZE) -> int:
+    """Записать строки курсора в CSV (utf-8-sig, разделитель ;) по частям.
+
+    Строки читаются fetchmany, каждая пачка кодируется инкрементальным
+    кодировщиком и сразу уходит в output (при необходимости через gzip
+    или zip), поэтому в памяти одновременно только одна пачка.
+    Возвращает число строк без заголовка.
+    """
+    if compression == "gz":
+        target = gzip.GzipFile(fileobj=output, mode="wb")
+    elif compression == "zip":
+        archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+        target = archive.open(csv_filename(name), "w", force_zip64=True)
+    else:
+        target = output
+
+    encoder = codecs.getincrementalencoder("utf-8-sig")(errors="replace")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+
+    def flush():
+        target.write(encoder.encode(buffer.getvalue()))
+        buffer.seek(0)
+        buffer.truncate()
+
+    writer.writerow(headers)
+    count = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        writer.writerows(rows)
+        count += len(rows)
+        flush()
+    flush()
+    target.write(encoder.encode("", final=True))
+
+    if compression == "gz":
+        target.close()
+    elif compression == "zip":
+        target.close()
+        archive.close()
+    return count
+
+
+def spooled_file():
+    """Буфер для файла экспорта: в памяти, пока небольшой, дальше на диске"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+
+def spooled_stream(spooled) -> io.IOBase:
+    """Файл под буфером spooled_file: BytesIO или временный файл на диске.
+
+    До Python 3.11 SpooledTemporaryFile не наследует io.IOBase, и
+    InputFile aiogram его не принимает, поэтому отправляется сам файл.
+    """
+    return spooled._file
@@ -0,0 +1,266 @@
+import asyncio
+import contextlib
+import copy
+import importlib.util
+import json
+import logging
+import os
+import time
+import typing
+
+from aiogram.dispatcher.storage import BaseStorage
+
+from db import Database
+
+logger = logging.getLogger(__name__)
+
+# ======================
+# SQLITE
+# ======================
+
+SQL_FSM_CREATE = """
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        chat TEXT NOT NULL,
+        user TEXT NOT NULL,
+        state TEXT,
+        data TEXT,
+        bucket TEXT,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (chat, user))
+"""
+SQL_FSM_INDEX = "CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated_at ON fsm_storage(updated_at)"
+SQL_FSM_GET = "SELECT state, data, bucket, updated_at FROM fsm_storage WHERE chat=? AND user=?"
+SQL_FSM_UPSERT = "INSERT OR REPLACE INTO fsm_storage (chat, user, state, data, bucket, updated_at) VALUES (?, ?, ?, ?, ?, ?)"
+SQL_FSM_DELETE = "DELETE FROM fsm_storage WHERE chat=? AND user=?"
+SQL_FSM_EXPIRE = "DELETE FROM fsm_storage WHERE updated_at < ?"
+
+
+class _Record:
+    __slots__ = ("state", "data", "bucket", "updated_at")
+
+    def __init__(self, state=None, data=None, bucket=None, updated_at=0.0):
+        self.state = state
+        self.data = data or {}
+        self.bucket = bucket or {}
+        self.updated_at = updated_at
+
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data and not self.bucket
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище состояний FSM в таблице fsm_storage той же базы.
+
+    Изменения копятся в памяти и записываются одной транзакцией раз в
+    flush_interval секунд (и при закрытии), чтение сначала смотрит в
+    несохраненные изменения. Записи старше ttl секунд считаются пустыми
+    и периодически удаляются. Изменения одного ключа (чат, пользователь)
+    выполняются по очереди, чтобы чтение из базы не затерло более новую
+    несохраненную запись.
+    """
+
+    def __init__(self, db: Database, ttl: int = 86400, flush_interval: float = 1.0):
+        self.db = db
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._pending: typing.Dict[typing.Tuple[str, str], _Record] = {}
+        self._flushing: typing.Dict[typing.Tuple[str, str], _Record] = {}
+        # Блокировка ключа и число ожидающих ее изменений
+        self._locks: typing.Dict[typing.Tuple[str, str], list] = {}
+        self._flusher: typing.Optional[asyncio.Task] = None
+        self._last_expire = 0.0
+        self.db.run_sync(self._create_table)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute(SQL_FSM_CREATE)
+        conn.execute(SQL_FSM_INDEX)
+
+    def _key(self, chat, user) -> typing.Tuple[str, str]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return str(chat), str(user)
+
+    def _expired(self, updated_at: float) -> bool:
+        return bool(self.ttl) and updated_at < time.time() - self.ttl
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, key):
+        """Чтение, изменение и сохранение записи ключа без параллельных изменений"""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def _buffered(self, key) -> typing.Optional[_Record]:
+        # Несохраненные изменения и те, что сейчас пишутся, новее данных в базе
+        return self._pending.get(key) or self._flushing.get(key)
+
+    async def _load(self, key) -> _Record:
+        pending = self._buffered(key)
+        if pending is not None:
+            return pending
+        row = await self.db.fetchone(SQL_FSM_GET, key)
+        # Пока шло чтение, запись могла измениться
+        pending = self._buffered(key)
+        if pending is not None:
+            return pending
+        if row is None or self._expired(row[3]):
+            return _Record()
+        state, data, bucket, updated_at = row
+        return _Record(state, json.loads(data or "{}"), json.loads(bucket or "{}"), updated_at)
+
+    async def _store(self, key, record: _Record):
+        record.updated_at = time.time()
+        self._pending[key] = record
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Работает, пока есть что записывать, затем завершается до следующего изменения
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении состояний FSM: {e}")
+
+    async def flush(self):
+        """Записать накопленные изменения одной транзакцией"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._flushing = pending
+        upserts, deletes = [], []
+        for (chat, user), record in pending.items():
+            if record.is_empty():
+                deletes.append((chat, user))
+            else:
+                upserts.append((chat, user, record.state, json.dumps(record.data, ensure_ascii=False),
+                                json.dumps(record.bucket, ensure_ascii=False), int(record.updated_at)))
+        now = time.time()
+        expire_before = None
+        if self.ttl and now - self._last_expire > self.ttl / 24:
+            expire_before = int(now - self.ttl)
+            self._last_expire = now
+
+        def _write(conn):
+            conn.executemany(SQL_FSM_UPSERT, upserts)
+            conn.executemany(SQL_FSM_DELETE, deletes)
+            if expire_before is not None:
+                conn.execute(SQL_FSM_EXPIRE, (expire_before,))
+
+        try:
+            await self.db.run(_write)
+        except Exception:
+            # Возвращаем изменения, которые не успели перезаписать новыми
+            for key, record in pending.items():
+                self._pending.setdefault(key, record)
+            raise
+        finally:
+            self._flushing = {}
+
+    async def close(self):
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+        await self.flush()
+
+    async def wait_closed(self):
+        pass
+
+    async def get_state(self, *, chat=None, user=None, default: typing.Optional[str] = None) -> typing.Optional[str]:
+        record = await self._load(self._key(chat, user))
+        return record.state if record.state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default: typing.Optional[typing.Dict] = None) -> typing.Dict:
+        record = await self._load(self._key(chat, user))
+        return copy.deepcopy(record.data or default or {})
+
+    async def set_state(self, *, chat=None, user=None, state: typing.Optional[typing.AnyStr] = None):
+        key = self._key(chat, user)
+        async with self._locked(key):
+            record = await self._load(key)
+            record.state = self.resolve_state(state)
+            await self._store(key, record)
+
+    async def set_data(self, *, chat=None, user=None, data: typing.Dict = None):
+        key = self._key(chat, user)
+        async with self._locked(key):
+            record = await self._load(key)
+            record.data = copy.deepcopy(data or {})
+            await self._store(key, record)
+
+    async def update_data(self, *, chat=None, user=None, data: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        async with self._locked(key):
+            record = await self._load(key)
+            record.data.update(data or {}, **kwargs)
+            await self._store(key, record)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default: typing.Optional[dict] = None) -> typing.Dict:
+        record = await self._load(self._key(chat, user))
+        return copy.deepcopy(record.bucket or default or {})
+
+    async def set_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None):
+        key = self._key(chat, user)
+        async with self._locked(key):
+            record = await self._load(key)
+            record.bucket = copy.deepcopy(bucket or {})
+            await self._store(key, record)
+
+    async def update_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        async with self._locked(key):
+            record = await self._load(key)
+            record.bucket.update(bucket or {}, **kwargs)
+            await self._store(key, record)
+
+
+# ======================
+# ВЫБОР ХРАНИЛИЩА
+# ======================
+
+def create_storage(kind: str, db: Database) -> BaseStorage:
+    """Хранилище FSM по имени: memory, sqlite или redis.
+
+    Настройки берутся из переменных окружения FSM_TTL, FSM_FLUSH_INTERVAL
+    и REDIS_HOST / REDIS_PORT / REDIS_DB / REDIS_PASSWORD / REDIS_PREFIX.
+    """
+    kind = (kind or "sqlite").lower()
+    ttl = int(os.getenv('FSM_TTL', '86400'))
+
+    if kind == "memory":
+        from aiogram.contrib.fsm_storage.memory import MemoryStorage
+        return MemoryStorage()
+
+    if kind == "sqlite":
+        return SQLiteStorage(db, ttl=ttl, flush_interval=float(os.getenv('FSM_FLUSH_INTERVAL', '1')))
+
+    if kind == "redis":
+        # RedisStorage2 из aiogram 2.25 работает через redis.asyncio (пакет redis>=4.2,
+        # см. requirements.txt); подойдет любой совместимый сервер
+        if importlib.util.find_spec("redis") is None:
+            raise RuntimeError("Для FSM_STORAGE=redis нужен пакет redis>=4.2: pip install 'redis>=4.2'")
+        from aiogram.contrib.fsm_storage.redis import RedisStorage2
+        redis_db = os.getenv('REDIS_DB')
+        return RedisStorage2(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            db=int(redis_db) if redis_db else None,
+            password=os.getenv('REDIS_PASSWORD') or None,
+            prefix=os.getenv('REDIS_PREFIX', 'fsm'),
+            state_ttl=ttl or None,
+            data_ttl=ttl or None,
+            bucket_ttl=ttl or None,
+        )
+
+    raise ValueError(f"Неизвестное хранилище FSM: {kind}")
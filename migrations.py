@@ -0,0 +1,115 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ======================
+# МИГРАЦИИ СХЕМЫ
+# ======================
+
+# Номер примененной миграции хранится в PRAGMA user_version.
+# Каждая миграция выполняется одной транзакцией вместе с обновлением номера.
+
+ACTIVE_EXPR = "IFNULL({row}.status NOT IN ('удалено','исполнено'), 0)"
+DEADLINE_TS_EXPR = "CAST(strftime('%s', {row}.deadline) AS INTEGER)"
+
+
+def _normalized_deadline(conn):
+    """deadline_ts и is_active для индексных выборок активных задач.
+
+    deadline_ts - срок в секундах (местное время, посчитанное как UTC),
+    поэтому сортировка и сравнение по нему совпадают с порядком дат.
+    Значения поддерживаются триггерами при любых изменениях срока и статуса.
+    """
+    conn.execute("ALTER TABLE tasks ADD COLUMN deadline_ts INTEGER")
+    conn.execute("ALTER TABLE tasks ADD COLUMN is_active INTEGER NOT NULL DEFAULT 1")
+
+    # Заполнение существующих строк
+    conn.execute(f"""
+        UPDATE tasks SET deadline_ts = {DEADLINE_TS_EXPR.format(row='tasks')},
+                         is_active = {ACTIVE_EXPR.format(row='tasks')}
+    """)
+
+    normalize = f"""
+        UPDATE tasks SET deadline_ts = {DEADLINE_TS_EXPR.format(row='NEW')},
+                         is_active = {ACTIVE_EXPR.format(row='NEW')}
+        WHERE id = NEW.id;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_tasks_normalize_insert AFTER INSERT ON tasks BEGIN {normalize} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_tasks_normalize_update AFTER UPDATE OF deadline, status ON tasks BEGIN {normalize} END")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_active_user ON tasks(is_active, user_id, deadline_ts, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_active_deadline ON tasks(is_active, deadline_ts, id)")
+    # Поиск tg id по @username и соединение users в экспорте
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    # Заменены составными индексами
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_status")
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_deadline")
+
+
+def _reminders_sent(conn):
+    """Журнал напоминаний: сколько шагов по задаче уже отправлено.
+
+    Запись удаляется триггерами при смене срока и удалении задачи,
+    чтобы напоминания по новому сроку начинались с первого шага.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reminders_sent (
+            task_id INTEGER PRIMARY KEY,
+            step INTEGER NOT NULL,
+            sent_at INTEGER NOT NULL)
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reminders_deadline AFTER UPDATE OF deadline ON tasks
+        WHEN OLD.deadline IS NOT NEW.deadline
+        BEGIN DELETE FROM reminders_sent WHERE task_id = OLD.id; END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reminders_delete AFTER DELETE ON tasks
+        BEGIN DELETE FROM reminders_sent WHERE task_id = OLD.id; END
+    """)
+
+
+def _outbox(conn):
+    """Исходящие уведомления, записываемые в одной транзакции с задачей.
+
+    dedup_key уникален среди неотправленных: повторная постановка того же
+    уведомления (например, двойное нажатие кнопки) игнорируется.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            parse_mode TEXT,
+            dedup_key TEXT UNIQUE,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            created_at INTEGER NOT NULL)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox(next_attempt_at)")
+
+
+def _task_priority(conn):
+    """Приоритет задачи (в tasks_log колонка была с самого начала)"""
+    conn.execute("ALTER TABLE tasks ADD COLUMN priority TEXT")
+
+
+MIGRATIONS = [
+    (1, _normalized_deadline),
+    (2, _reminders_sent),
+    (3, _outbox),
+    (4, _task_priority),
+]
+
+
+def migrate(conn):
+    """Применить миграции новее текущей версии схемы"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info(f"Миграция схемы {number}: {migration.__name__}")
+        conn.execute("BEGIN")
+        migration(conn)
+        conn.execute(f"PRAGMA user_version={number}")
+        conn.commit()
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from aiogram import Bot
+from aiogram.utils import exceptions
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста сообщения в Telegram
+MESSAGE_LIMIT = 4096
+
+
+def split_message_indexed(entries: Iterable[str], separator: str = "\n\n",
+                          limit: int = MESSAGE_LIMIT) -> List[Tuple[str, range]]:
+    """Как split_message, но вместе с каждым сообщением - номера вошедших в него записей"""
+    parts, current, size, start = [], [], 0, 0
+    for index, entry in enumerate(entries):
+        if len(entry) > limit:
+            entry = entry[:limit - 1] + "…"
+        added = len(entry) + (len(separator) if current else 0)
+        if current and size + added > limit:
+            parts.append((separator.join(current), range(start, index)))
+            current, size, start = [], 0, index
+            added = len(entry)
+        current.append(entry)
+        size += added
+    if current:
+        parts.append((separator.join(current), range(start, start + len(current))))
+    return parts
+
+
+def split_message(entries: Iterable[str], separator: str = "\n\n", limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Собрать записи в сообщения не длиннее limit, не разрывая записи.
+
+    Запись длиннее limit обрезается.
+    """
+    return [part for part, _ in split_message_indexed(entries, separator, limit)]
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: токены могут уйти в минус,
+    а вызывающий ждет время, за которое долг восстановится"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Занять токен, вернуть сколько секунд подождать перед отправкой"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class MessageDispatcher:
+    """Отправка сообщений с учетом ограничений Telegram.
+
+    Общий лимит на бота и отдельный на каждый чат (для групп он ниже),
+    не больше concurrency одновременных запросов, а при RetryAfter все
+    отправки ждут указанное время и запрос повторяется.
+    """
+
+    # Сколько корзин чатов держать, прежде чем чистить неиспользуемые
+    MAX_IDLE_BUCKETS = 10000
+
+    def __init__(self, bot: Bot, global_rate: float = 25, chat_rate: float = 1, group_rate: float = 20 / 60,
+                 concurrency: int = 8, max_retries: int = 3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        chat_id = int(chat_id)
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_IDLE_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_idle()}
+            # У групп и каналов отрицательные id и лимит около 20 сообщений в минуту
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, max(1.0, rate))
+        return bucket
+
+    async def _wait_turn(self, chat_id):
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        delay = self._global.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    async def send(self, chat_id, text: str, **kwargs):
+        """Отправить сообщение, повторяя его после RetryAfter.
+
+        Остальные ошибки Telegram пробрасываются вызывающему.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn(chat_id)
+            try:
+                async with self._semaphore:
+                    return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            except exceptions.RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Flood control, пауза {e.timeout} с (чат {chat_id})")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.timeout)
+
+    async def send_quiet(self, chat_id, text: str, **kwargs):
+        """Отправить сообщение, ошибки только записываются в лог"""
+        try:
+            return await self.send(chat_id, text, **kwargs)
+        except exceptions.BotBlocked:
+            logger.error(f"Пользователь {chat_id} заблокировал бота")
+        except exceptions.ChatNotFound:
+            logger.error(f"Чат {chat_id} не найден")
+        except Exception as e:
+            logger.error(f"Ошибка при отправке сообщения в {chat_id}: {e}")
+        return None
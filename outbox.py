@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+
+from aiogram.utils import exceptions
+
+from notify import MessageDispatcher
+from repository import OutboxRepository, OutboxRow
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """Фоновая отправка уведомлений из таблицы outbox.
+
+    Обработчики только записывают уведомление вместе с задачей, а отправка,
+    повторы с нарастающей паузой и отказ после max_attempts идут здесь,
+    через общий ограничитель скорости.
+    """
+
+    # Сколько секунд запись считается взятой в работу
+    LEASE = 300
+
+    def __init__(self, repo: OutboxRepository, notifier: MessageDispatcher, workers: int = 4,
+                 poll_interval: float = 30, max_attempts: int = 5):
+        self.repo = repo
+        self.notifier = notifier
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        self._wakeup = asyncio.Event()
+
+    def wake(self, *_):
+        """Проверить очередь сейчас, не дожидаясь poll_interval"""
+        self._wakeup.set()
+
+    async def run(self):
+        for _ in range(self.workers):
+            asyncio.create_task(self._work())
+        while True:
+            self._wakeup.clear()
+            free = self._queue.maxsize - self._queue.qsize()
+            rows = []
+            if free > 0:
+                try:
+                    rows = await self.repo.claim(int(time.time()), self.LEASE, free)
+                except Exception as e:
+                    logger.error(f"Ошибка при чтении outbox: {e}")
+            for row in rows:
+                await self._queue.put(row)
+            if rows and len(rows) == free:
+                await self._queue.join()  # Ждем свободных мест, дальше есть еще записи
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self):
+        while True:
+            row = await self._queue.get()
+            try:
+                await self._deliver(row)
+            except Exception as e:
+                logger.error(f"Ошибка outbox {row.id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, row: OutboxRow):
+        try:
+            await self.notifier.send(row.chat_id, row.text, parse_mode=row.parse_mode)
+        except (exceptions.Unauthorized, exceptions.BadRequest) as e:
+            # Пользователь не начинал диалог, заблокировал бота и т.п. - повтор не поможет
+            logger.warning(f"Уведомление {row.id} для {row.chat_id} не доставлено: {e}")
+            await self.repo.done(row.id)
+            return
+        except Exception as e:
+            attempts = row.attempts + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Уведомление {row.id} для {row.chat_id} отброшено после {attempts} попыток: {e}")
+                await self.repo.done(row.id)
+            else:
+                delay = min(3600, 30 * 2 ** attempts)
+                logger.warning(f"Уведомление {row.id}: попытка {attempts} не удалась ({e}), повтор через {delay} с")
+                await self.repo.retry(row.id, attempts, int(time.time()) + delay)
+            return
+        await self.repo.done(row.id)
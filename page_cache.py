@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+
+from repository import TaskRow
+
+
+class RenderedPage(NamedTuple):
+    text: str
+    keyboard: Optional[InlineKeyboardMarkup]    # общая для всех, изменять нельзя
+    session_filter: Optional[str] = None        # фильтр, который кнопки берут из сессии пользователя
+
+
+class PageCache:
+    """Готовые страницы списков задач: (вид, фильтр, курсор...) -> текст и кнопки.
+
+    Любое изменение задачи увеличивает номер версии и сбрасывает кэш
+    (подписчик TaskRepository), поэтому повторный показ той же страницы
+    не обращается к базе, а устаревшая страница не показывается.
+    Номер версии не дает сохранить страницу, прочитанную до сброса.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self.version = 0
+        self._pages: "OrderedDict[Hashable, RenderedPage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def on_task_change(self, old: Optional[TaskRow], new: Optional[TaskRow]):
+        """Подписчик изменений TaskRepository"""
+        self.version += 1
+        self._pages.clear()
+
+    def get(self, key: Hashable) -> Optional[RenderedPage]:
+        page = self._pages.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pages.move_to_end(key)
+        return page
+
+    def put(self, key: Hashable, page: RenderedPage, version: int):
+        """Сохранить страницу, если с начала ее построения (version) задачи не менялись"""
+        if version != self.version:
+            return
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._pages),
+            "max_size": self.max_size,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
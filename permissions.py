@@ -0,0 +1,89 @@
+from typing import Dict, Iterable
+
+from aiogram import types
+from aiogram.utils import exceptions
+from aiogram.dispatcher.handler import CancelHandler, current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from repository import UserRow
+
+# Флаги ролей
+ROLE_USER = 1
+ROLE_MODERATOR = 2
+
+DENIED_TEXT = "⛔ Доступ запрещен"
+
+
+def public(handler):
+    """Пометить обработчик как доступный без проверки прав"""
+    handler.access_public = True
+    return handler
+
+
+class PermissionCache:
+    """Права пользователей: tg id -> флаги ролей.
+
+    Проверка - поиск в словаре, список обновляется точечно при
+    добавлении и удалении пользователя без перечитывания таблицы.
+    """
+
+    def __init__(self, admin_id: int):
+        self.admin_id = admin_id
+        self._roles: Dict[int, int] = {}
+
+    def load(self, users: Iterable[UserRow]):
+        roles = {}
+        for user in users:
+            try:
+                user_id = int(user.tg_user_id)
+            except (TypeError, ValueError):
+                continue
+            roles[user_id] = ROLE_USER | (ROLE_MODERATOR if user.is_moderator == 'moderator' else 0)
+        self._roles = roles
+
+    def add(self, user_id: int, is_moderator: bool = False):
+        self._roles[int(user_id)] = ROLE_USER | (ROLE_MODERATOR if is_moderator else 0)
+
+    def remove(self, user_id: int):
+        self._roles.pop(int(user_id), None)
+
+    def is_allowed(self, user_id: int) -> bool:
+        return user_id == self.admin_id or user_id in self._roles
+
+    def is_moderator(self, user_id: int) -> bool:
+        return bool(self._roles.get(user_id, 0) & ROLE_MODERATOR)
+
+    def __len__(self):
+        return len(self._roles)
+
+
+class AccessMiddleware(BaseMiddleware):
+    """Единая проверка доступа для сообщений и callback-запросов.
+
+    Срабатывает только для обновлений, у которых нашелся обработчик,
+    поэтому посторонние сообщения в группах не вызывают ответов.
+    """
+
+    def __init__(self, permissions: PermissionCache):
+        super().__init__()
+        self.permissions = permissions
+
+    @staticmethod
+    def _is_public() -> bool:
+        handler = current_handler.get(None)
+        return getattr(handler, "access_public", False)
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        if self._is_public() or self.permissions.is_allowed(message.from_user.id):
+            return
+        try:
+            await message.bot.send_message(chat_id=message.from_user.id, text=DENIED_TEXT)
+        except exceptions.TelegramAPIError:
+            pass  # Пользователь не начинал диалог с ботом
+        raise CancelHandler()
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
+        if self._is_public() or self.permissions.is_allowed(callback_query.from_user.id):
+            return
+        await callback_query.answer(DENIED_TEXT, show_alert=True)
+        raise CancelHandler()
@@ -0,0 +1,84 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+# Значения priority в tasks и tasks_log
+PRIORITY_HIGH = "высокий"
+PRIORITY_MEDIUM = "средний"
+PRIORITY_LOW = "низкий"
+
+_PRIORITY_ALIASES = {
+    "!": PRIORITY_HIGH, "1": PRIORITY_HIGH, PRIORITY_HIGH: PRIORITY_HIGH,
+    "2": PRIORITY_MEDIUM, PRIORITY_MEDIUM: PRIORITY_MEDIUM,
+    "3": PRIORITY_LOW, PRIORITY_LOW: PRIORITY_LOW,
+}
+
+# Служебные части сообщения. Часть начинается с новой строки, после пробела
+# или вплотную за предыдущей частью ("@ivan//завтра"), поэтому адреса вида
+# https://... и e-mail не задеваются; границу проверяет parse_quick_task.
+# Опережающая проверка первого символа отсекает обычный текст без ретроспективы
+_TOKEN_RE = re.compile(r"""
+    (?=[/@\#!])(?:
+        //(?P<deadline>.*)                                              # срок - до конца сообщения
+      | @(?P<executor>\w+)[,;]?                                         # исполнитель
+      | \#(?P<tag>\w+)                                                  # тег
+      | !(?P<priority>!|[123]|высокий|средний|низкий)(?=\s|//|[@\#]|\Z) # приоритет
+    )
+""", re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+_SPACES_RE = re.compile(r"[ \t]+")
+
+
+class QuickTask(NamedTuple):
+    text: str
+    executors: Tuple[str, ...]      # "@username" в порядке упоминания, без повторов
+    deadline: Optional[str]         # срок как введен, разбирается dates.parse_deadline
+    tags: Tuple[str, ...]           # "#тег"; теги остаются и в тексте задачи
+    priority: Optional[str]
+
+
+def parse_quick_task(message: str) -> QuickTask:
+    """Разбор сообщения "текст задачи @исполнитель #тег !приоритет //срок".
+
+    Исполнителей может быть несколько, срок - все после "//". Приоритет:
+    !!, !1, !высокий / !2, !средний / !3, !низкий.
+    ValueError, если после разбора не остался текст задачи.
+    """
+    executors, tags = [], []
+    deadline = priority = None
+    parts, position = [], 0
+    search_from = token_end = 0
+    while True:
+        match = _TOKEN_RE.search(message, search_from)
+        if match is None:
+            break
+        start = match.start()
+        if start and start != token_end and not message[start - 1].isspace():
+            search_from = start + 1  # Часть слова: адрес, e-mail, "Срочно!!"
+            continue
+        search_from = token_end = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "tag":
+            tags.append(f"#{value}")
+            continue  # Тег остается в тексте
+        parts.append(message[position:match.start()])
+        position = match.end()
+        if kind == "executor":
+            executor = f"@{value}"
+            if executor not in executors:
+                executors.append(executor)
+        elif kind == "priority":
+            priority = _PRIORITY_ALIASES[value.lower()]
+        else:
+            deadline = value.strip() or None
+    parts.append(message[position:])
+
+    text = "".join(parts)
+    if "\n" in text or "\r" in text:
+        lines = (_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+        text = "\n".join(line for line in lines if line)
+    else:
+        text = _SPACES_RE.sub(" ", text).strip()
+    if not text:
+        raise ValueError("Не указан текст задачи")
+    return QuickTask(text, tuple(executors), deadline, tuple(tags), priority)
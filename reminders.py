@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Iterable, List, Sequence, Tuple
+
+from dates import format_date
+from notify import MESSAGE_LIMIT, MessageDispatcher, split_message_indexed
+from repository import ReminderRepository, TaskRepository, TaskRow
+
+# Запас под заголовок части дайджеста
+DIGEST_HEADER_RESERVE = 64
+
+# Сообщение напоминания: (chat_id, текст, id задач в нем)
+Reminder = Tuple[int, str, List[int]]
+
+
+def reminder_digests(tasks: Iterable[TaskRow]) -> List[Reminder]:
+    """Напоминания, сгруппированные по чату, части не длиннее лимита Telegram"""
+    by_chat = {}
+    for task in tasks:
+        by_chat.setdefault(task.chat_id, []).append(task)
+    messages = []
+    for chat_id, chat_tasks in by_chat.items():
+        entries = [
+            f"🔹{task.id} 📝: {task.task_text}\n👤: {task.user_id} 🔄: {task.status} ⏳: {format_date(task.deadline)}"
+            for task in chat_tasks
+        ]
+        parts = split_message_indexed(entries, separator="\n──────────\n", limit=MESSAGE_LIMIT - DIGEST_HEADER_RESERVE)
+        for number, (part, indexes) in enumerate(parts, start=1):
+            header = f"⏳ Напоминание о задачах ({len(entries)})"
+            if len(parts) > 1:
+                header += f", часть {number}/{len(parts)}"
+            messages.append((chat_id, f"{header}:\n\n{part}", [chat_tasks[index].id for index in indexes]))
+    return messages
+
+
+def reminder_singles(tasks: Iterable[TaskRow]) -> List[Reminder]:
+    """По отдельному сообщению на задачу"""
+    return [
+        (task.chat_id, f"⏳ Напоминание о задаче 🔹{task.id}:\n📝: {task.task_text}\n\n👤: {task.user_id}\n"
+                       f"🔄: {task.status} ⏳: {format_date(task.deadline)}", [task.id])
+        for task in tasks
+    ]
+
+
+class ReminderSender:
+    """Отправка напоминаний создателям по сработавшим задачам.
+
+    В журнал reminders_sent попадают только доставленные задачи; id
+    недоставленных возвращаются планировщику для повтора.
+    """
+
+    def __init__(self, tasks: TaskRepository, reminders: ReminderRepository, notifier: MessageDispatcher,
+                 mode: str = 'digest'):
+        self.tasks = tasks
+        self.reminders = reminders
+        self.notifier = notifier
+        self.mode = mode
+
+    async def __call__(self, fired: Sequence[Tuple[int, int]]) -> List[int]:
+        """fired: [(id, шаг)]; вернуть id задач, напоминание по которым не доставлено"""
+        steps = dict(fired)
+        tasks = await self.tasks.get_active_many(steps)
+
+        # Отправляем в ЛС создателя (chat_id == user_id), скорость ограничивает notifier
+        messages = reminder_singles(tasks) if self.mode == 'single' else reminder_digests(tasks)
+        results = await asyncio.gather(*(self.notifier.send_quiet(chat_id, text) for chat_id, text, _ in messages))
+        delivered, failed = [], []
+        for (_, _, task_ids), result in zip(messages, results):
+            (failed if result is None else delivered).extend(task_ids)
+        sent_at = int(time.time())
+        await self.reminders.mark_sent((task_id, steps[task_id] + 1, sent_at) for task_id in delivered)
+        return failed
@@ -0,0 +1,582 @@
+import calendar
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from db import Database
+
+logger = logging.getLogger(__name__)
+
+# ======================
+# СТРОКИ ТАБЛИЦ
+# ======================
+
+# Статусы завершенных задач (is_active = 0)
+INACTIVE_STATUSES = ('удалено', 'исполнено')
+
+
+class TaskRow(NamedTuple):
+    id: int
+    creator_id: Optional[str]
+    user_id: Optional[str]
+    chat_id: Optional[int]
+    task_text: str
+    status: str
+    deadline: Optional[str]
+    priority: Optional[str] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status not in INACTIVE_STATUSES
+
+
+class NewTask(NamedTuple):
+    """Задача для массового создания (TaskRepository.create_many)"""
+    executor: Optional[str]
+    task_text: str
+    deadline: Optional[str] = None
+    priority: Optional[str] = None
+
+
+class Notification(NamedTuple):
+    """Уведомление для outbox; в key подставляется {task_id} записанной задачи"""
+    chat_id: str
+    text: str
+    key: str
+    parse_mode: Optional[str] = None
+
+
+class OutboxRow(NamedTuple):
+    id: int
+    chat_id: str
+    text: str
+    parse_mode: Optional[str]
+    attempts: int
+
+
+class UserRow(NamedTuple):
+    tg_user_id: str
+    name: Optional[str]
+    username: Optional[str]
+    is_moderator: Optional[str]
+
+
+# ======================
+# ЗАПРОСЫ
+# ======================
+
+# Строки запросов неизменны, поэтому sqlite3 переиспользует подготовленные
+# выражения из кэша соединения
+TASK_COLUMNS = "id, creator_id, user_id, chat_id, task_text, status, deadline, priority"
+# is_active и deadline_ts поддерживаются триггерами (см. migrations.py)
+ACTIVE = "is_active = 1"
+
+SQL_TASK_INSERT = "INSERT INTO tasks (user_id, chat_id, task_text, deadline, creator_id, priority) VALUES (?, ?, ?, ?, ?, ?)"
+SQL_TASK_GET = f"SELECT {TASK_COLUMNS} FROM tasks WHERE id=?"
+SQL_TASK_DEADLINE = "SELECT deadline_ts FROM tasks WHERE id=?"
+SQL_TASK_RECENT = f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY id DESC LIMIT ?"
+SQL_TASK_RANGE = f"SELECT {TASK_COLUMNS} FROM tasks WHERE id BETWEEN ? AND ? ORDER BY id"
+SQL_TASK_LOG_COPY = """
+    INSERT INTO tasks_log (id, user_id, chat_id, task_text, status, deadline, creator_id, priority)
+    SELECT id, user_id, chat_id, task_text, status, deadline, creator_id, priority
+    FROM tasks
+"""
+SQL_TASK_LOG = f"{SQL_TASK_LOG_COPY} WHERE id=?"
+SQL_TASK_SET_STATUS = "UPDATE tasks SET status=?, chat_id=? WHERE id=?"
+SQL_TASK_SET_TEXT = "UPDATE tasks SET task_text=?, chat_id=? WHERE id=?"
+SQL_TASK_SET_EXECUTOR = "UPDATE tasks SET user_id=?, chat_id=? WHERE id=?"
+SQL_TASK_SET_DEADLINE = "UPDATE tasks SET deadline=?, chat_id=? WHERE id=?"
+SQL_TASK_DELETE = "DELETE FROM tasks WHERE id=?"
+SQL_TASK_LOG_DELETE = "DELETE FROM tasks_log WHERE id=?"
+
+# Исполнители в порядке последнего назначения задачи
+SQL_EXECUTORS_ACTIVE = f"SELECT user_id FROM tasks WHERE {ACTIVE} GROUP BY user_id ORDER BY MAX(id) DESC LIMIT 20"
+SQL_EXECUTORS_NOT_DELETED = "SELECT user_id FROM tasks WHERE status <> 'удалено' GROUP BY user_id ORDER BY MAX(id) DESC LIMIT 20"
+SQL_EXECUTORS_BY_CREATOR = f"""
+    SELECT user_id FROM tasks WHERE creator_id=? AND {ACTIVE}
+    GROUP BY user_id ORDER BY MAX(id) DESC LIMIT 20
+"""
+SQL_DEADLINE_DATES = f"""
+    SELECT date(deadline_ts, 'unixepoch') day FROM tasks
+    WHERE {ACTIVE}
+    GROUP BY day
+    ORDER BY MIN(deadline_ts) ASC
+    LIMIT 20
+"""
+
+# Число активных задач по исполнителю и дню срока (для ActiveCounters)
+SQL_ACTIVE_COUNTS = f"""
+    SELECT user_id, deadline_ts / 86400 day, COUNT(*) FROM tasks
+    WHERE {ACTIVE}
+    GROUP BY user_id, day
+"""
+
+SQL_REMINDERS_PENDING = f"""
+    SELECT t.id, t.deadline, r.step, r.sent_at
+    FROM tasks t
+    LEFT JOIN reminders_sent r ON r.task_id = t.id
+    WHERE t.{ACTIVE} AND t.deadline_ts IS NOT NULL
+"""
+SQL_REMINDER_SENT = "INSERT OR REPLACE INTO reminders_sent (task_id, step, sent_at) VALUES (?, ?, ?)"
+
+SQL_EXPORT = """
+    SELECT t.id,
+           CASE WHEN u.name IS NULL
+                THEN t.user_id
+           ELSE u.name END "Исполнитель",
+           t.task_text as "Задача",
+           t.status as "Статус",
+           t.deadline as "Срок"
+    FROM tasks t
+    LEFT JOIN users u ON t.user_id = u.username
+    WHERE {condition}
+    ORDER BY user_id ASC, deadline_ts ASC, id ASC
+"""
+SQL_EXPORT_ACTIVE = SQL_EXPORT.format(condition="t.is_active = 1")
+SQL_EXPORT_WITH_DONE = SQL_EXPORT.format(condition="t.status <> 'удалено'")
+SQL_EXPORT_FULL = """
+    SELECT id, creator_id, user_id, chat_id, task_text, status, deadline, 999999 as "id_log"
+    FROM tasks WHERE 1{condition}
+    UNION ALL SELECT id, creator_id, user_id, chat_id, task_text, status, deadline, id_log
+    FROM tasks_log WHERE 1{condition}
+    ORDER BY id DESC, id_log DESC
+"""
+
+SQL_OUTBOX_INSERT = """
+    INSERT OR IGNORE INTO outbox (chat_id, text, parse_mode, dedup_key, next_attempt_at, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_OUTBOX_DUE = "SELECT id, chat_id, text, parse_mode, attempts FROM outbox WHERE next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?"
+SQL_OUTBOX_LEASE = "UPDATE outbox SET next_attempt_at = ? WHERE id = ?"
+SQL_OUTBOX_DELETE = "DELETE FROM outbox WHERE id = ?"
+SQL_OUTBOX_RETRY = "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?"
+
+SQL_USER_COLUMNS = "tg_user_id, name, username, is_moderator"
+SQL_USER_ALL = f"SELECT {SQL_USER_COLUMNS} FROM users"
+SQL_USER_EXISTS = "SELECT 1 FROM users WHERE tg_user_id = ?"
+SQL_USER_INSERT = "INSERT INTO users (tg_user_id, name, is_moderator, username) VALUES (?, ?, ?, ?)"
+SQL_USER_DELETE = "DELETE FROM users WHERE tg_user_id = ?"
+SQL_USER_TG_ID = "SELECT tg_user_id FROM users WHERE username=?"
+SQL_USER_USERNAME = "SELECT username FROM users WHERE tg_user_id=?"
+
+
+def _executor_condition(executor_filter: Optional[str]):
+    """Условие по исполнителю: None - все, "none" - без исполнителя"""
+    if executor_filter is None:
+        return "", ()
+    if executor_filter.lower() == "none":
+        return " AND user_id IS NULL", ()
+    return " AND user_id = ?", (executor_filter,)
+
+
+def _deadline_condition(deadline_filter: Optional[str]):
+    """Условие по сроку: None - все, "none" - без срока, иначе дата YYYY-MM-DD"""
+    if deadline_filter is None:
+        return "", ()
+    if deadline_filter.lower() == "none":
+        return " AND deadline_ts IS NULL", ()
+    day_start = deadline_ts(deadline_filter)
+    return " AND deadline_ts >= ? AND deadline_ts < ?", (day_start, day_start + 86400)
+
+
+def deadline_ts(deadline: str) -> int:
+    """Срок YYYY-MM-DD[ HH:MM] в секундах так же, как strftime('%s', deadline) в SQLite"""
+    return calendar.timegm(datetime.fromisoformat(deadline).timetuple())
+
+
+def _seek_segments(cursor_ts: Optional[int], task_id: int, backward: bool):
+    """Условия для строк после (или до) задачи-границы в порядке deadline_ts, id.
+
+    NULL идет первым, а сравнение кортежей с NULL не работает, поэтому на
+    переходе между задачами без срока и со сроком выборка делится на два
+    диапазона индекса. Условия возвращаются в порядке чтения.
+    """
+    if cursor_ts is None:
+        if backward:
+            return [(" AND deadline_ts IS NULL AND id < ?", (task_id,))]
+        return [(" AND deadline_ts IS NULL AND id > ?", (task_id,)),
+                (" AND deadline_ts IS NOT NULL", ())]
+    if backward:
+        return [(" AND (deadline_ts, id) < (?, ?)", (cursor_ts, task_id)),
+                (" AND deadline_ts IS NULL", ())]
+    return [(" AND (deadline_ts, id) > (?, ?)", (cursor_ts, task_id))]
+
+
+# ======================
+# ЗАДАЧИ
+# ======================
+
+def _fetch_task(conn, task_id) -> Optional[TaskRow]:
+    row = conn.execute(SQL_TASK_GET, (task_id,)).fetchone()
+    return TaskRow._make(row) if row else None
+
+
+def _enqueue(conn, task_id, notifications: Sequence[Notification]):
+    """Поставить уведомления в outbox в текущей транзакции"""
+    if notifications:
+        now = int(time.time())
+        conn.executemany(SQL_OUTBOX_INSERT, [
+            (str(n.chat_id), n.text, n.parse_mode, n.key.format(task_id=task_id), now, now) for n in notifications
+        ])
+
+
+class TaskRepository:
+    """Доступ к таблицам tasks и tasks_log.
+
+    После каждого изменения задачи подписчики получают ее версии до и
+    после изменения (None для новой и удаленной задачи).
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._listeners: List[Callable[[Optional[TaskRow], Optional[TaskRow]], None]] = []
+
+    def subscribe(self, listener: Callable[[Optional[TaskRow], Optional[TaskRow]], None]):
+        """Подписаться на изменения задач: listener(old, new)"""
+        self._listeners.append(listener)
+
+    def _changed(self, old: Optional[TaskRow], new: Optional[TaskRow]):
+        if old is None and new is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике изменения задачи: {e}", exc_info=True)
+
+    async def create(self, executor: Optional[str], chat_id: int, task_text: str,
+                     deadline: Optional[str], creator_id: int, notifications: Sequence[Notification] = (),
+                     priority: Optional[str] = None) -> int:
+        def _create(conn):
+            task_id = conn.execute(SQL_TASK_INSERT, (executor, chat_id, task_text, deadline, creator_id, priority)).lastrowid
+            _enqueue(conn, task_id, notifications)
+            return _fetch_task(conn, task_id)
+        task = await self.db.run(_create)
+        self._changed(None, task)
+        return task.id
+
+    async def create_many(self, tasks: Sequence[NewTask], chat_id: int, creator_id: int,
+                          notifications: Sequence[Notification] = ()) -> List[TaskRow]:
+        """Создать задачи одной транзакцией (executemany).
+
+        Единственное соединение записи выдает id подряд, поэтому созданные
+        строки читаются диапазоном. В key уведомлений подставляется id первой задачи.
+        """
+        def _create(conn):
+            conn.executemany(SQL_TASK_INSERT, [
+                (task.executor, chat_id, task.task_text, task.deadline, creator_id, task.priority) for task in tasks
+            ])
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(tasks) + 1
+            _enqueue(conn, first_id, notifications)
+            return [TaskRow._make(row) for row in conn.execute(SQL_TASK_RANGE, (first_id, last_id))]
+        if not tasks:
+            return []
+        created = await self.db.run(_create)
+        for task in created:
+            self._changed(None, task)
+        return created
+
+    async def get(self, task_id) -> Optional[TaskRow]:
+        row = await self.db.fetchone(SQL_TASK_GET, (task_id,))
+        return TaskRow._make(row) if row else None
+
+    async def exists(self, task_id) -> bool:
+        return await self.get(task_id) is not None
+
+    async def list_executors(self, include_done: bool = False, creator_id=None) -> List[Optional[str]]:
+        """Исполнители задач (не более 20), недавно назначенные - первыми"""
+        if creator_id is not None:
+            rows = await self.db.fetchall(SQL_EXECUTORS_BY_CREATOR, (creator_id,))
+        elif include_done:
+            rows = await self.db.fetchall(SQL_EXECUTORS_NOT_DELETED)
+        else:
+            rows = await self.db.fetchall(SQL_EXECUTORS_ACTIVE)
+        return [row[0] for row in rows]
+
+    async def list_recent(self, limit: int = 20) -> List[TaskRow]:
+        rows = await self.db.fetchall(SQL_TASK_RECENT, (limit,))
+        return [TaskRow._make(row) for row in rows]
+
+    async def list_for_executor(self, executor_filter: str, creator_id=None, limit: int = 20) -> List[TaskRow]:
+        """Активные задачи исполнителя, новые первыми"""
+        condition, params = _executor_condition(executor_filter)
+        if creator_id is not None:
+            condition += " AND creator_id=?"
+            params += (str(creator_id),)
+        rows = await self.db.fetchall(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE {ACTIVE}{condition} ORDER BY id DESC LIMIT ?",
+            params + (limit,)
+        )
+        return [TaskRow._make(row) for row in rows]
+
+    async def count_active(self, executor_filter: Optional[str] = None, deadline_filter: Optional[str] = None) -> int:
+        executor_sql, executor_params = _executor_condition(executor_filter)
+        deadline_sql, deadline_params = _deadline_condition(deadline_filter)
+        row = await self.db.fetchone(
+            f"SELECT COUNT(*) FROM tasks WHERE {ACTIVE}{executor_sql}{deadline_sql}",
+            executor_params + deadline_params
+        )
+        return row[0]
+
+    async def active_counts(self) -> List[Tuple[Optional[str], Optional[int], int]]:
+        """(исполнитель, номер дня срока, число) по всем активным задачам.
+
+        Читается на соединении записи: снимок упорядочен с изменениями, и
+        подписчики каждого изменения, вошедшего в снимок, вызываются раньше,
+        чем этот метод вернет результат.
+        """
+        return await self.db.run(lambda conn: [tuple(row) for row in conn.execute(SQL_ACTIVE_COUNTS)])
+
+    async def seek_active(self, cursor_id: Optional[int] = None, backward: bool = False, limit: int = 10,
+                          executor_filter: Optional[str] = None,
+                          deadline_filter: Optional[str] = None) -> Tuple[List[TaskRow], bool, bool]:
+        """Страница активных задач в порядке срока, начиная от задачи cursor_id.
+
+        Вперед - задачи после cursor_id, назад - задачи перед ним. Без курсора
+        (или если задача-граница удалена) возвращается первая страница.
+        Результат всегда по возрастанию срока, признак того, что в направлении
+        листания есть еще задачи, и признак того, что задача-граница найдена
+        (иначе это первая страница и "еще" означает вперед).
+        """
+        executor_sql, executor_params = _executor_condition(executor_filter)
+        deadline_sql, deadline_params = _deadline_condition(deadline_filter)
+
+        def _seek(conn):
+            segments = [("", ())]
+            direction = "ASC"
+            row = conn.execute(SQL_TASK_DEADLINE, (cursor_id,)).fetchone() if cursor_id is not None else None
+            found = row is not None
+            if found:
+                segments = _seek_segments(row[0], cursor_id, backward)
+                direction = "DESC" if backward else "ASC"
+            rows = []
+            for seek_sql, seek_params in segments:
+                rows += conn.execute(
+                    f"""SELECT {TASK_COLUMNS} FROM tasks WHERE {ACTIVE}{executor_sql}{deadline_sql}{seek_sql}
+                        ORDER BY deadline_ts {direction}, id {direction}
+                        LIMIT ?""",
+                    executor_params + deadline_params + seek_params + (limit + 1 - len(rows),)
+                ).fetchall()
+                if len(rows) > limit:
+                    break
+            return rows, direction == "DESC", found
+
+        rows, reverse, found = await self.db.read(_seek)
+        has_more = len(rows) > limit
+        tasks = [TaskRow._make(row) for row in rows[:limit]]
+        if reverse:
+            tasks.reverse()
+        return tasks, has_more, found
+
+    async def deadline_dates(self) -> List[Optional[str]]:
+        """Уникальные даты сроков активных задач (не более 20)"""
+        return [row[0] for row in await self.db.fetchall(SQL_DEADLINE_DATES)]
+
+    async def get_active_many(self, task_ids) -> List[TaskRow]:
+        """Активные задачи из списка id, в порядке id"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        rows = await self.db.fetchall(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE id IN ({','.join('?' * len(task_ids))}) AND {ACTIVE} ORDER BY id",
+            task_ids
+        )
+        return [TaskRow._make(row) for row in rows]
+
+    async def _update_logged(self, sql: str, value, editor_id, task_id, notifications: Sequence[Notification] = ()):
+        """Сохранить текущую версию задачи в tasks_log и применить изменение"""
+        def _update(conn):
+            old = _fetch_task(conn, task_id)
+            conn.execute(SQL_TASK_LOG, (task_id,))
+            conn.execute(sql, (value, editor_id, task_id))
+            _enqueue(conn, task_id, notifications)
+            return old, _fetch_task(conn, task_id)
+        self._changed(*await self.db.run(_update))
+
+    async def _update_many_logged(self, sql: str, value, editor_id, task_ids,
+                                  notifications: Sequence[Notification] = ()) -> List[TaskRow]:
+        """Групповое изменение одной транзакцией: одна вставка в tasks_log на все задачи.
+
+        Несуществующие id пропускаются; в key уведомлений подставляется меньший id.
+        Возвращает измененные задачи.
+        """
+        task_ids = sorted({int(task_id) for task_id in task_ids})
+        if not task_ids:
+            return []
+        in_ids = f"id IN ({','.join('?' * len(task_ids))})"
+        select = f"SELECT {TASK_COLUMNS} FROM tasks WHERE {in_ids}"
+
+        def _update(conn):
+            old = {row[0]: TaskRow._make(row) for row in conn.execute(select, task_ids)}
+            if not old:
+                return []
+            conn.execute(f"{SQL_TASK_LOG_COPY} WHERE {in_ids}", task_ids)
+            conn.executemany(sql, [(value, editor_id, task_id) for task_id in old])
+            _enqueue(conn, min(old), notifications)
+            new = {row[0]: TaskRow._make(row) for row in conn.execute(select, task_ids)}
+            return [(old[task_id], new[task_id]) for task_id in old]
+        changes = await self.db.run(_update)
+        for old, new in changes:
+            self._changed(old, new)
+        return [new for _, new in changes]
+
+    async def set_status(self, task_id, status: str, editor_id, notifications: Sequence[Notification] = ()):
+        await self._update_logged(SQL_TASK_SET_STATUS, status, editor_id, task_id, notifications)
+
+    async def set_text(self, task_id, task_text: str, editor_id):
+        await self._update_logged(SQL_TASK_SET_TEXT, task_text, editor_id, task_id)
+
+    async def set_executor(self, task_id, executor: str, editor_id, notifications: Sequence[Notification] = ()):
+        await self._update_logged(SQL_TASK_SET_EXECUTOR, executor, editor_id, task_id, notifications)
+
+    async def set_deadline(self, task_id, deadline: Optional[str], editor_id):
+        await self._update_logged(SQL_TASK_SET_DEADLINE, deadline, editor_id, task_id)
+
+    async def set_status_many(self, task_ids, status: str, editor_id,
+                              notifications: Sequence[Notification] = ()) -> List[TaskRow]:
+        return await self._update_many_logged(SQL_TASK_SET_STATUS, status, editor_id, task_ids, notifications)
+
+    async def set_executor_many(self, task_ids, executor: str, editor_id,
+                                notifications: Sequence[Notification] = ()) -> List[TaskRow]:
+        return await self._update_many_logged(SQL_TASK_SET_EXECUTOR, executor, editor_id, task_ids, notifications)
+
+    async def set_deadline_many(self, task_ids, deadline: Optional[str], editor_id) -> List[TaskRow]:
+        return await self._update_many_logged(SQL_TASK_SET_DEADLINE, deadline, editor_id, task_ids)
+
+    async def append_text(self, task_id, text: str, editor_id) -> bool:
+        """Дописать текст в конец задачи, False если задача не найдена"""
+        def _append(conn):
+            old = _fetch_task(conn, task_id)
+            if old is None:
+                return None, None
+            conn.execute(SQL_TASK_LOG, (task_id,))
+            conn.execute(SQL_TASK_SET_TEXT, (old.task_text + "\n" + text, editor_id, task_id))
+            return old, _fetch_task(conn, task_id)
+        old, new = await self.db.run(_append)
+        self._changed(old, new)
+        return old is not None
+
+    async def delete(self, task_id):
+        """Удалить задачу вместе с историей"""
+        def _delete(conn):
+            old = _fetch_task(conn, task_id)
+            conn.execute(SQL_TASK_DELETE, (task_id,))
+            conn.execute(SQL_TASK_LOG_DELETE, (task_id,))
+            return old
+        self._changed(await self.db.run(_delete), None)
+
+    async def export_to(self, consume, include_done: bool = False):
+        """Выполнить consume(cursor) над строками экспорта в потоке выгрузок.
+
+        Строки читаются с курсора по мере записи, без fetchall, а цикл
+        событий не блокируется. Возвращает результат consume.
+        """
+        sql = SQL_EXPORT_WITH_DONE if include_done else SQL_EXPORT_ACTIVE
+        return await self.db.read_bulk(lambda conn: consume(conn.execute(sql)))
+
+    async def export_full_to(self, consume, id_from: Optional[int] = None, id_to: Optional[int] = None,
+                             date_from: Optional[str] = None, date_to: Optional[str] = None):
+        """Выполнить consume(cursor) над задачами и их историей в потоке выгрузок.
+
+        Необязательные границы: диапазон id и диапазон сроков (YYYY-MM-DD,
+        включительно). Возвращает результат consume.
+        """
+        condition, params = "", ()
+        if id_from is not None:
+            condition += " AND id >= ?"
+            params += (id_from,)
+        if id_to is not None:
+            condition += " AND id <= ?"
+            params += (id_to,)
+        if date_from is not None:
+            condition += " AND deadline >= ?"
+            params += (date_from,)
+        if date_to is not None:
+            # Сроки хранятся строками YYYY-MM-DD[ HH:MM], граница - начало следующего дня
+            condition += " AND deadline < ?"
+            params += ((date.fromisoformat(date_to) + timedelta(days=1)).isoformat(),)
+        sql = SQL_EXPORT_FULL.format(condition=condition)
+        return await self.db.read_bulk(lambda conn: consume(conn.execute(sql, params * 2)))
+
+
+# ======================
+# НАПОМИНАНИЯ
+# ======================
+
+class ReminderRepository:
+    """Журнал отправленных напоминаний (таблица reminders_sent)"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def pending(self) -> List[Tuple[int, str, Optional[int], Optional[int]]]:
+        """(id, срок, отправлено шагов, время отправки) активных задач со сроком"""
+        return await self.db.fetchall(SQL_REMINDERS_PENDING)
+
+    async def mark_sent(self, entries):
+        """Записать отправку: [(id задачи, отправлено шагов, время)]"""
+        entries = list(entries)
+        if entries:
+            await self.db.run(lambda conn: conn.executemany(SQL_REMINDER_SENT, entries))
+
+
+# ======================
+# OUTBOX
+# ======================
+
+class OutboxRepository:
+    """Очередь исходящих уведомлений (таблица outbox)"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def claim(self, now: int, lease: int, limit: int) -> List[OutboxRow]:
+        """Забрать готовые к отправке записи, отложив их на lease секунд.
+
+        Выборка и отметка идут одной транзакцией записи, поэтому несколько
+        экземпляров бота не заберут одно и то же уведомление.
+        """
+        def _claim(conn):
+            rows = [OutboxRow._make(row) for row in conn.execute(SQL_OUTBOX_DUE, (now, limit)).fetchall()]
+            conn.executemany(SQL_OUTBOX_LEASE, [(now + lease, row.id) for row in rows])
+            return rows
+        return await self.db.run(_claim)
+
+    async def done(self, outbox_id: int):
+        await self.db.execute(SQL_OUTBOX_DELETE, (outbox_id,))
+
+    async def retry(self, outbox_id: int, attempts: int, next_attempt_at: int):
+        await self.db.execute(SQL_OUTBOX_RETRY, (attempts, next_attempt_at, outbox_id))
+
+
+# ======================
+# ПОЛЬЗОВАТЕЛИ
+# ======================
+
+class UserRepository:
+    """Доступ к таблице users"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def all(self) -> List[UserRow]:
+        return [UserRow._make(row) for row in await self.db.fetchall(SQL_USER_ALL)]
+
+    async def exists(self, tg_user_id) -> bool:
+        return await self.db.fetchone(SQL_USER_EXISTS, (tg_user_id,)) is not None
+
+    async def add(self, tg_user_id, name: str, is_moderator: Optional[str], username: str):
+        await self.db.execute(SQL_USER_INSERT, (tg_user_id, name, is_moderator, username))
+
+    async def remove(self, tg_user_id):
+        await self.db.execute(SQL_USER_DELETE, (tg_user_id,))
+
+    async def tg_id_by_username(self, username: Optional[str]) -> Optional[str]:
+        row = await self.db.fetchone(SQL_USER_TG_ID, (username,))
+        return row[0] if row else None
+
+    async def username_by_tg_id(self, tg_user_id) -> Optional[str]:
+        row = await self.db.fetchone(SQL_USER_USERNAME, (tg_user_id,))
+        return row[0] if row else None
@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, time as day_time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dates import parse_stored
+from repository import TaskRow
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """Напоминания по срокам задач на куче таймеров.
+
+    В куче лежат пары (время срабатывания, id задачи); при изменении задачи
+    запись заменяется новой, а устаревшие записи пропускаются при извлечении.
+    Цикл спит ровно до ближайшего срока, поэтому таблица задач целиком
+    читается только при запуске.
+
+    Напоминания идут по шагам: steps - смещения от срока в секундах, после
+    последнего шага напоминание повторяется каждые repeat_interval секунд.
+    Номер отправленного шага хранится в журнале, поэтому после перезапуска
+    отправка продолжается с того же места.
+
+    fire возвращает id задач, напоминание по которым не доставлено: для них
+    шаг не засчитывается и повторяется через retry_delay секунд.
+    """
+
+    # Срабатывания в пределах этого окна отправляются одной пачкой
+    BATCH_WINDOW = 1.0
+
+    def __init__(self, fire: Callable[[List[Tuple[int, int]]], Awaitable[Optional[Iterable[int]]]],
+                 day_start: day_time = day_time(9, 0), steps: Sequence[float] = (0,), repeat_interval: float = 21600,
+                 retry_delay: float = 60):
+        self.fire = fire
+        self.day_start = day_start
+        self.steps = sorted(steps) or [0]
+        self.repeat_interval = repeat_interval
+        self.retry_delay = retry_delay
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        # id задачи -> (момент срока, число отправленных шагов, время последней отправки)
+        self._state: Dict[int, Tuple[float, int, Optional[float]]] = {}
+        self._wakeup = asyncio.Event()
+
+    def due_time(self, deadline: Optional[str]) -> Optional[float]:
+        """Момент срока: точное время, для срока без времени - начало рабочего дня"""
+        if not deadline:
+            return None
+        value = parse_stored(deadline)
+        if value is None:
+            logger.warning(f"Не удалось разобрать срок: {deadline}")
+            return None
+        if len(deadline) <= 10:
+            value = datetime.combine(value.date(), self.day_start)
+        return value.timestamp()
+
+    def next_time(self, base: float, step: int, sent_at: Optional[float]) -> Optional[float]:
+        """Когда отправлять шаг step (None - больше не напоминать)"""
+        if step < len(self.steps):
+            return base + self.steps[step]
+        if self.repeat_interval:
+            return (sent_at or base) + self.repeat_interval
+        return None
+
+    def _push(self, task_id: int, due: Optional[float]):
+        if due is None:
+            self._due.pop(task_id, None)
+            return
+        earliest = self._heap[0][0] if self._heap else None
+        self._due[task_id] = due
+        heapq.heappush(self._heap, (due, task_id))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            # Слишком много устаревших записей - пересобираем кучу
+            self._heap = [(value, key) for key, value in self._due.items()]
+            heapq.heapify(self._heap)
+        if earliest is None or due < earliest:
+            self._wakeup.set()
+
+    def track(self, task_id: int, deadline: Optional[str], step: int = 0, sent_at: Optional[float] = None):
+        """Поставить (или переставить) напоминания по задаче"""
+        base = self.due_time(deadline)
+        if base is None:
+            self.forget(task_id)
+            return
+        self._state[task_id] = (base, step, sent_at)
+        self._push(task_id, self.next_time(base, step, sent_at))
+
+    def forget(self, task_id: int):
+        self._state.pop(task_id, None)
+        self._push(task_id, None)
+
+    def load(self, rows):
+        """Начальное заполнение: (id, срок, отправлено шагов, время отправки) активных задач"""
+        for task_id, deadline, step, sent_at in rows:
+            self.track(task_id, deadline, step or 0, sent_at)
+
+    def on_task_change(self, old: Optional[TaskRow], new: Optional[TaskRow]):
+        """Подписчик изменений TaskRepository: новый срок начинает шаги заново"""
+        if new is None or not new.is_active:
+            self.forget((old or new).id)
+        elif old is None or old.deadline != new.deadline or not old.is_active:
+            self.track(new.id, new.deadline)
+
+    def __len__(self):
+        return len(self._due)
+
+    def _advance(self, task_id: int, now: float) -> int:
+        """Отметить отправку, вернуть номер отправленного шага.
+
+        Если бот был недоступен и пропустил несколько шагов, отправляется
+        один - последний из наступивших.
+        """
+        base, step, _ = self._state[task_id]
+        while step + 1 < len(self.steps) and base + self.steps[step + 1] <= now + self.BATCH_WINDOW:
+            step += 1
+        self._state[task_id] = (base, step + 1, now)
+        self._push(task_id, self.next_time(base, step + 1, now))
+        return step
+
+    def _pop_due(self, now: float) -> Tuple[List[Tuple[int, int]], Dict[int, tuple]]:
+        """Сработавшие (id, шаг) и состояния задач до отправки"""
+        fired, previous = [], {}
+        while self._heap and self._heap[0][0] <= now + self.BATCH_WINDOW:
+            due, task_id = heapq.heappop(self._heap)
+            if self._due.get(task_id) != due:
+                continue  # Запись устарела: задачу перенесли или закрыли
+            del self._due[task_id]
+            previous[task_id] = self._state[task_id]
+            fired.append((task_id, self._advance(task_id, now)))
+        return fired, previous
+
+    def _retry(self, task_ids: Iterable[int], previous: Dict[int, tuple], advanced: Dict[int, tuple], now: float):
+        """Вернуть недоставленным задачам прежний шаг и повторить через retry_delay"""
+        for task_id in task_ids:
+            if task_id not in previous or self._state.get(task_id) != advanced[task_id]:
+                continue  # Пока шла отправка, задачу перенесли или закрыли
+            self._state[task_id] = previous[task_id]
+            self._push(task_id, now + self.retry_delay)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            fired, previous = self._pop_due(time.time())
+            if not fired:
+                continue
+            advanced = {task_id: self._state[task_id] for task_id in previous}
+            try:
+                failed = await self.fire(fired) or ()
+            except Exception as e:
+                logger.error(f"Ошибка при отправке напоминаний: {e}", exc_info=True)
+                failed = previous
+            self._retry(failed, previous, advanced, time.time())
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class ViewSession:
+    """Фильтр открытого списка задач, не поместившийся в callback_data"""
+
+    __slots__ = ("filter", "expires_at")
+
+    def __init__(self, filter_value: Optional[str], expires_at: float):
+        self.filter = filter_value
+        self.expires_at = expires_at
+
+
+class SessionCache:
+    """Сессии просмотра списков: (пользователь, вид списка) -> ViewSession.
+
+    Ограничена по числу записей (вытесняются давно не использованные)
+    и по времени: сессия без обращений дольше ttl секунд удаляется,
+    поэтому память не растет за время работы бота.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions: "OrderedDict[Tuple[int, Hashable], ViewSession]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _purge_expired(self, now: float):
+        # Записи упорядочены по последнему обращению, устаревшие - в начале
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[key]
+            self.expired += 1
+
+    def open(self, user_id: int, view: Hashable, filter_value: Optional[str] = None) -> ViewSession:
+        """Новая сессия списка вместо прежней"""
+        now = time.monotonic()
+        self._purge_expired(now)
+        key = (user_id, view)
+        self._sessions.pop(key, None)
+        session = self._sessions[key] = ViewSession(filter_value, now + self.ttl)
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        return session
+
+    def get(self, user_id: int, view: Hashable) -> Optional[ViewSession]:
+        """Сессия списка или None, если ее нет или она устарела; продлевает срок"""
+        now = time.monotonic()
+        key = (user_id, view)
+        session = self._sessions.get(key)
+        if session is not None and session.expires_at <= now:
+            del self._sessions[key]
+            self.expired += 1
+            session = None
+        if session is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        session.expires_at = now + self.ttl
+        self._sessions.move_to_end(key)
+        return session
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._sessions),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
@@ -0,0 +1,153 @@
+import csv
+import io
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from dates import STORED_DATE, STORED_DATETIME, parse_deadline
+from export import TASK_HEADERS
+from quick_task import parse_quick_task
+from repository import NewTask, UserRow
+
+# Больше задач за раз не создается
+BULK_LIMIT = 1000
+
+# Колонки файла в раскладке /export: ищутся по заголовку
+_EXECUTOR_HEADER, _TEXT_HEADER, _DEADLINE_HEADER = TASK_HEADERS[1], TASK_HEADERS[2], TASK_HEADERS[4]
+
+# Имя пользователя Telegram: 5-32 латинских буквы, цифры и "_"
+_USERNAME_RE = re.compile(r"@?([A-Za-z0-9_]{5,32})")
+
+ImportResult = Tuple[List[NewTask], List[str]]
+ExecutorNames = Dict[str, Optional[str]]
+
+
+def _check_limit(tasks: List[NewTask], errors: List[str]):
+    if len(tasks) > BULK_LIMIT:
+        errors.append(f"Слишком много задач, за раз можно создать не больше {BULK_LIMIT}")
+
+
+def parse_task_lines(text: str) -> ImportResult:
+    """Каждая непустая строка - быстрая задача "текст @исполнитель //срок".
+
+    Возвращает задачи и ошибки с номерами строк.
+    """
+    tasks, errors = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            quick = parse_quick_task(line)
+            deadline = parse_deadline(quick.deadline) if quick.deadline else None
+        except ValueError as e:
+            errors.append(f"Строка {number}: {e}")
+            continue
+        for executor in quick.executors or (None,):
+            tasks.append(NewTask(executor, quick.text, deadline, quick.priority))
+    _check_limit(tasks, errors)
+    return tasks, errors
+
+
+def executor_names(users: Iterable[UserRow]) -> ExecutorNames:
+    """Имя пользователя, как его пишет /export, -> @username.
+
+    Для имени, которое носят несколько пользователей, - None.
+    """
+    names: ExecutorNames = {}
+    for user in users:
+        if not user.name or not user.username:
+            continue
+        username = user.username if user.username.startswith("@") else f"@{user.username}"
+        name = user.name.strip()
+        names[name] = username if names.get(name, username) == username else None
+    return names
+
+
+def _executor_value(value, names: ExecutorNames) -> Optional[str]:
+    """Исполнитель из файла -> @username; ValueError, если его не узнать.
+
+    В /export колонка содержит имя пользователя из users, а для
+    незарегистрированных исполнителей - @username из задачи.
+    """
+    value = str(value).strip() if value is not None else ""
+    if not value or value.lower() == "none":
+        return None
+    if value in names:
+        if names[value] is None:
+            raise ValueError(f"Несколько пользователей с именем \"{value}\"")
+        return names[value]
+    match = _USERNAME_RE.fullmatch(value)
+    if not match:
+        raise ValueError(f"Неизвестный исполнитель \"{value}\"")
+    return f"@{match.group(1)}"
+
+
+def _deadline_value(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(STORED_DATE if value.hour == value.minute == 0 else STORED_DATETIME)
+    if isinstance(value, date):
+        return value.strftime(STORED_DATE)
+    return parse_deadline(str(value))
+
+
+def _read_rows(rows: Iterable[tuple], names: ExecutorNames) -> ImportResult:
+    """Строки таблицы с заголовком -> задачи; колонки ищутся по названию"""
+    rows = iter(rows)
+    header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+    if _TEXT_HEADER not in header:
+        return [], [f"Не найдена колонка \"{_TEXT_HEADER}\" (нужны заголовки как в /export)"]
+    text_index = header.index(_TEXT_HEADER)
+    executor_index = header.index(_EXECUTOR_HEADER) if _EXECUTOR_HEADER in header else None
+    deadline_index = header.index(_DEADLINE_HEADER) if _DEADLINE_HEADER in header else None
+
+    def cell(row, index):
+        return row[index] if index is not None and index < len(row) else None
+
+    tasks, errors = [], []
+    for number, row in enumerate(rows, 2):
+        text = cell(row, text_index)
+        text = str(text).strip() if text is not None else ""
+        if not text:
+            continue
+        try:
+            executor = _executor_value(cell(row, executor_index), names)
+            deadline = _deadline_value(cell(row, deadline_index))
+        except ValueError as e:
+            errors.append(f"Строка {number}: {e}")
+            continue
+        tasks.append(NewTask(executor, text, deadline))
+        if len(tasks) > BULK_LIMIT:
+            break
+    _check_limit(tasks, errors)
+    return tasks, errors
+
+
+def read_task_file(filename: str, data: bytes, names: Optional[ExecutorNames] = None) -> ImportResult:
+    """Задачи из CSV или XLSX в раскладке /export (№, Исполнитель, Задача, Статус, Срок).
+
+    Номер и статус не переносятся: задачи создаются новыми. Исполнитель
+    ищется по имени в names (см. executor_names) или берется как @username.
+    """
+    names = names or {}
+    name = filename.lower()
+    if name.endswith(".xlsx"):
+        wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            return _read_rows(wb.worksheets[0].iter_rows(values_only=True), names)
+        finally:
+            wb.close()
+    if name.endswith(".csv"):
+        try:
+            content = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            content = data.decode("cp1251")
+        try:
+            delimiter = csv.Sniffer().sniff(content[:4096], delimiters=";,\t").delimiter
+        except csv.Error:
+            delimiter = ";"
+        return _read_rows(csv.reader(io.StringIO(content), delimiter=delimiter), names)
+    return [], ["Поддерживаются файлы .csv и .xlsx"]
@@ -0,0 +1,50 @@
+"""Сравнение parse_quick_task с прежним разбором в несколько проходов.
+
+Запуск: python -m tests.bench_quick_task
+"""
+import re
+import timeit
+
+from quick_task import parse_quick_task
+
+MESSAGES = (
+    "Купить бумагу",
+    "Подготовить отчет @ivan //завтра 15:00",
+    "@ivan Подготовить отчет //пт",
+    "Проверить https://example.com/page#section @ivan !1 #сайт //10.05.2025 12:30",
+)
+
+NUMBER = 20000
+
+
+def legacy_parse(text: str):
+    """Разбор быстрой задачи до quick_task.py: отдельный поиск на каждую часть"""
+    if text and text.startswith('@'):
+        task_match = re.search(r'^(.*?)(?=//|$)', text)
+    else:
+        task_match = re.search(r'^(.*?)(\s@|$)', text)
+    executor_match = re.search(r'(@[^\s]+)', text)
+    deadline_match = re.search(r'//\s*(.+)', text)
+
+    task_text = task_match.group(1).strip() if task_match else None
+    executor = executor_match.group(0).strip() if executor_match else None
+    deadline = deadline_match.group(1) if deadline_match else None
+    if not task_text:
+        raise ValueError("Не указан текст задачи")
+    return task_text, executor, deadline
+
+
+def bench(parse) -> float:
+    """Среднее время разбора одного сообщения, мкс"""
+    seconds = min(timeit.repeat(lambda: [parse(message) for message in MESSAGES], number=NUMBER, repeat=5))
+    return seconds / (NUMBER * len(MESSAGES)) * 1e6
+
+
+def main():
+    legacy, current = bench(legacy_parse), bench(parse_quick_task)
+    print(f"прежний разбор:   {legacy:.2f} мкс на сообщение")
+    print(f"parse_quick_task: {current:.2f} мкс на сообщение ({current / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import gzip
+import sqlite3
+import unittest
+import zipfile
+from unittest import mock
+
+from aiogram.types import InputFile
+from openpyxl import load_workbook
+
+import export
+from export import COMPRESSIONS, csv_filename, spooled_file, spooled_stream, write_csv, write_tasks_xlsx
+
+ROWS = [
+    (1, "Иван Петров", "Отчет", "в работе", "2025-05-10"),
+    (2, "@stranger", "Звонок", "новая", "2025-05-11 12:30"),
+    (3, None, "Письмо", "новая", None),
+]
+
+
+def input_file(output, filename: str) -> InputFile:
+    """Как в bot.py: буфер экспорта -> InputFile для reply_document"""
+    output.seek(0)
+    return InputFile(spooled_stream(output), filename=filename)
+
+
+class XlsxInputFileTest(unittest.TestCase):
+
+    def check_xlsx(self, output):
+        document = input_file(output, "tasks_export.xlsx")
+        self.assertEqual(document.filename, "tasks_export.xlsx")
+        wb = load_workbook(document.file, read_only=True)
+        values = [row[0] for row in wb.worksheets[0].iter_rows(min_row=2, values_only=True)]
+        wb.close()
+        self.assertEqual(values, ["1", "2", "3"])
+
+    def test_in_memory(self):
+        with spooled_file() as output:
+            self.assertEqual(write_tasks_xlsx(ROWS, output=output), 3)
+            self.assertFalse(output._rolled)
+            self.check_xlsx(output)
+
+    def test_rolled_over_to_disk(self):
+        with mock.patch.object(export, "SPOOL_MAX_SIZE", 1024):
+            with spooled_file() as output:
+                write_tasks_xlsx(ROWS * 200, output=output)
+                self.assertTrue(output._rolled)
+                output.seek(0)
+                document = input_file(output, "tasks_export.xlsx")
+                self.assertEqual(document.file.read(4), b"PK\x03\x04")
+
+
+class CsvInputFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE t (id, executor, text, status, deadline)")
+        self.conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?)", ROWS)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def export(self, compression, output) -> bytes:
+        """CSV как в /export3; возвращает содержимое файла без сжатия"""
+        count = write_csv(self.conn.execute("SELECT * FROM t"), output, headers=["ID", "Исполнитель"],
+                          compression=compression, name="tasks_export", batch_size=2)
+        self.assertEqual(count, 3)
+        document = input_file(output, csv_filename("tasks_export", compression))
+        data = document.file.read()
+        if compression == "gz":
+            return gzip.decompress(data)
+        if compression == "zip":
+            with zipfile.ZipFile(document.file) as archive:
+                return archive.read("tasks_export.csv")
+        return data
+
+    def test_compressions(self):
+        for compression in (None,) + COMPRESSIONS:
+            with self.subTest(compression=compression), spooled_file() as output:
+                lines = self.export(compression, output).decode("utf-8-sig").splitlines()
+                self.assertEqual(lines[0], "ID;Исполнитель")
+                self.assertEqual(lines[1], "1;Иван Петров;Отчет;в работе;2025-05-10")
+                self.assertEqual(len(lines), 4)
+
+    def test_rolled_over_to_disk(self):
+        with mock.patch.object(export, "SPOOL_MAX_SIZE", 16), spooled_file() as output:
+            data = self.export(None, output)
+            self.assertTrue(output._rolled)
+            self.assertTrue(data.startswith("ID;".encode("utf-8-sig")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from db import Database
+from fsm_storage import SQL_FSM_GET, SQLiteStorage, create_storage
+
+HAS_REDIS = importlib.util.find_spec("redis") is not None
+
+
+class SQLiteStorageTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.dir.name, "fsm.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.dir.cleanup()
+
+    def storage(self, **kwargs) -> SQLiteStorage:
+        kwargs.setdefault("flush_interval", 3600)
+        return SQLiteStorage(self.db, **kwargs)
+
+    async def test_changes_are_buffered_until_flush(self):
+        storage = self.storage()
+        await storage.set_state(chat=1, user=2, state="Form:name")
+        await storage.update_data(chat=1, user=2, name="Иван")
+
+        self.assertIsNone(await self.db.fetchone(SQL_FSM_GET, ("1", "2")))
+        self.assertEqual(await storage.get_state(chat=1, user=2), "Form:name")
+        self.assertEqual(await storage.get_data(chat=1, user=2), {"name": "Иван"})
+
+        await storage.flush()
+        self.assertIsNotNone(await self.db.fetchone(SQL_FSM_GET, ("1", "2")))
+        fresh = self.storage()
+        self.assertEqual(await fresh.get_state(chat=1, user=2), "Form:name")
+        self.assertEqual(await fresh.get_data(chat=1, user=2), {"name": "Иван"})
+        await storage.close()
+
+    async def test_finished_state_is_deleted(self):
+        storage = self.storage()
+        await storage.set_state(chat=1, user=2, state="Form:name")
+        await storage.flush()
+        await storage.reset_state(chat=1, user=2)
+        await storage.flush()
+        self.assertIsNone(await self.db.fetchone(SQL_FSM_GET, ("1", "2")))
+
+    async def test_flush_runs_in_background(self):
+        storage = self.storage(flush_interval=0.01)
+        await storage.set_state(chat=1, user=2, state="Form:name")
+        await asyncio.sleep(0.1)
+        self.assertIsNotNone(await self.db.fetchone(SQL_FSM_GET, ("1", "2")))
+        await storage.close()
+
+    async def test_expired_record_is_empty_and_removed(self):
+        storage = self.storage(ttl=60)
+        with mock.patch("fsm_storage.time.time", return_value=time.time() - 120):
+            await storage.set_state(chat=1, user=2, state="Form:name")
+            await storage.flush()
+
+        fresh = self.storage(ttl=60)
+        self.assertIsNone(await fresh.get_state(chat=1, user=2))
+        self.assertEqual(await fresh.get_data(chat=1, user=2), {})
+
+        # Очистка устаревших записей идет вместе с очередной записью
+        await fresh.set_state(chat=3, user=4, state="Form:name")
+        await fresh.flush()
+        self.assertIsNone(await self.db.fetchone(SQL_FSM_GET, ("1", "2")))
+        self.assertIsNotNone(await self.db.fetchone(SQL_FSM_GET, ("3", "4")))
+
+    async def test_concurrent_updates_are_not_lost(self):
+        storage = self.storage()
+        await storage.set_data(chat=1, user=2, data={"a": 0})
+        await storage.flush()
+
+        fresh = self.storage()
+        fetchone = self.db.fetchone
+
+        async def slow_fetchone(*args):
+            await asyncio.sleep(0.05)
+            return await fetchone(*args)
+
+        with mock.patch.object(self.db, "fetchone", slow_fetchone):
+            await asyncio.gather(*(fresh.update_data(chat=1, user=2, **{f"k{i}": i}) for i in range(5)))
+        self.assertEqual(await fresh.get_data(chat=1, user=2), {"a": 0, "k0": 0, "k1": 1, "k2": 2, "k3": 3, "k4": 4})
+        self.assertEqual(fresh._locks, {})
+
+
+class FakeRedis:
+    """Замена redis.asyncio.Redis в памяти: get/set с ex/delete"""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.now = 0.0
+
+    async def get(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.values.pop(key, None)
+            self.expires.pop(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if ex:
+            self.expires[key] = self.now + ex
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+    async def close(self):
+        pass
+
+
+@unittest.skipUnless(HAS_REDIS, "нужен пакет redis")
+class RedisStorageTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        with mock.patch.dict(os.environ, {"FSM_TTL": "60"}):
+            self.storage = create_storage("redis", db=None)
+        self.redis = self.storage._redis = FakeRedis()
+
+    async def test_state_and_data(self):
+        await self.storage.set_state(chat=1, user=2, state="Form:name")
+        await self.storage.update_data(chat=1, user=2, name="Иван")
+        self.assertEqual(await self.storage.get_state(chat=1, user=2), "Form:name")
+        self.assertEqual(await self.storage.get_data(chat=1, user=2), {"name": "Иван"})
+
+    async def test_ttl_expiry(self):
+        await self.storage.set_state(chat=1, user=2, state="Form:name")
+        await self.storage.set_data(chat=1, user=2, data={"name": "Иван"})
+        self.redis.now += 61
+        self.assertIsNone(await self.storage.get_state(chat=1, user=2))
+        self.assertEqual(await self.storage.get_data(chat=1, user=2), {})
+
+
+class CreateStorageTest(unittest.TestCase):
+
+    @unittest.skipIf(HAS_REDIS, "пакет redis установлен")
+    def test_redis_without_package(self):
+        with self.assertRaises(RuntimeError):
+            create_storage("redis", db=None)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            create_storage("mongo", db=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from quick_task import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_MEDIUM, parse_quick_task
+
+
+class ParseQuickTaskTest(unittest.TestCase):
+
+    def test_text_only(self):
+        quick = parse_quick_task("Купить бумагу")
+        self.assertEqual(quick.text, "Купить бумагу")
+        self.assertEqual(quick.executors, ())
+        self.assertIsNone(quick.deadline)
+        self.assertEqual(quick.tags, ())
+        self.assertIsNone(quick.priority)
+
+    def test_single_executor_and_deadline(self):
+        quick = parse_quick_task("Подготовить отчет @ivan //завтра 15:00")
+        self.assertEqual(quick.text, "Подготовить отчет")
+        self.assertEqual(quick.executors, ("@ivan",))
+        self.assertEqual(quick.deadline, "завтра 15:00")
+
+    def test_executor_first(self):
+        quick = parse_quick_task("@ivan Подготовить отчет //пт")
+        self.assertEqual(quick.text, "Подготовить отчет")
+        self.assertEqual(quick.executors, ("@ivan",))
+        self.assertEqual(quick.deadline, "пт")
+
+    def test_several_executors(self):
+        quick = parse_quick_task("Созвон @ivan, @petr; @anna @ivan")
+        self.assertEqual(quick.text, "Созвон")
+        self.assertEqual(quick.executors, ("@ivan", "@petr", "@anna"))
+
+    def test_tags_stay_in_text(self):
+        quick = parse_quick_task("Починить #сайт и #почта @ivan")
+        self.assertEqual(quick.text, "Починить #сайт и #почта")
+        self.assertEqual(quick.tags, ("#сайт", "#почта"))
+
+    def test_priority_aliases(self):
+        cases = {
+            "!!": PRIORITY_HIGH, "!1": PRIORITY_HIGH, "!высокий": PRIORITY_HIGH, "!ВЫСОКИЙ": PRIORITY_HIGH,
+            "!2": PRIORITY_MEDIUM, "!средний": PRIORITY_MEDIUM,
+            "!3": PRIORITY_LOW, "!низкий": PRIORITY_LOW,
+        }
+        for alias, priority in cases.items():
+            with self.subTest(alias=alias):
+                quick = parse_quick_task(f"Задача {alias} @ivan")
+                self.assertEqual(quick.priority, priority)
+                self.assertEqual(quick.text, "Задача")
+
+    def test_unknown_priority_stays_in_text(self):
+        quick = parse_quick_task("Срочно!! !4")
+        self.assertIsNone(quick.priority)
+        self.assertEqual(quick.text, "Срочно!! !4")
+
+    def test_deadline_takes_rest_of_message(self):
+        quick = parse_quick_task("Отчет @ivan // 10.05.2025 12:30 @petr")
+        self.assertEqual(quick.deadline, "10.05.2025 12:30 @petr")
+        self.assertEqual(quick.executors, ("@ivan",))
+
+    def test_empty_deadline(self):
+        quick = parse_quick_task("Отчет //")
+        self.assertIsNone(quick.deadline)
+        self.assertEqual(quick.text, "Отчет")
+
+    def test_token_glued_to_previous_token(self):
+        cases = {
+            "Отчет @ivan//завтра": ("Отчет", ("@ivan",), "завтра", None),
+            "Отчет @ivan,//завтра": ("Отчет", ("@ivan",), "завтра", None),
+            "Отчет !1//пт": ("Отчет", (), "пт", PRIORITY_HIGH),
+            "Отчет #сайт//пт": ("Отчет #сайт", (), "пт", None),
+            "Созвон @ivan@petr": ("Созвон", ("@ivan", "@petr"), None, None),
+        }
+        for message, expected in cases.items():
+            with self.subTest(message=message):
+                quick = parse_quick_task(message)
+                self.assertEqual((quick.text, quick.executors, quick.deadline, quick.priority), expected)
+
+    def test_url_is_not_deadline_or_tag(self):
+        quick = parse_quick_task("Проверить https://example.com/page#section @ivan")
+        self.assertEqual(quick.text, "Проверить https://example.com/page#section")
+        self.assertEqual(quick.executors, ("@ivan",))
+        self.assertIsNone(quick.deadline)
+        self.assertEqual(quick.tags, ())
+
+    def test_email_is_not_executor(self):
+        quick = parse_quick_task("Написать на support@example.com")
+        self.assertEqual(quick.text, "Написать на support@example.com")
+        self.assertEqual(quick.executors, ())
+
+    def test_multiline_text(self):
+        quick = parse_quick_task("Первая строка @ivan\n\n  Вторая   строка\n//завтра")
+        self.assertEqual(quick.text, "Первая строка\nВторая строка")
+        self.assertEqual(quick.deadline, "завтра")
+
+    def test_empty_text_raises(self):
+        for message in ("", "   ", "@ivan", "@ivan !1 //завтра"):
+            with self.subTest(message=message):
+                with self.assertRaises(ValueError):
+                    parse_quick_task(message)
+
+
+if __name__ == "__main__":
+    unittest.main()
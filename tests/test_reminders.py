@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from db import Database
+from migrations import migrate
+from reminders import ReminderSender
+from repository import ReminderRepository, TaskRepository
+from scheduler import DeadlineScheduler
+
+
+# Исходные таблицы из bot.create_schema, остальное добавляют миграции
+SCHEMA = """
+    CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, creator_id TEXT, user_id TEXT, chat_id INTEGER,
+                        task_text TEXT, status TEXT DEFAULT 'новая', deadline TEXT);
+    CREATE TABLE users (tg_user_id TEXT PRIMARY KEY, name TEXT, username TEXT, is_moderator TEXT);
+    CREATE TABLE tasks_log (id INTEGER, creator_id TEXT, user_id TEXT, chat_id INTEGER, task_text TEXT, status TEXT,
+                            deadline TEXT, priority TEXT, id_log INTEGER PRIMARY KEY AUTOINCREMENT);
+"""
+
+
+class FakeNotifier:
+    """Замена MessageDispatcher: в чат failing_chat отправка не проходит"""
+
+    def __init__(self, failing_chat=None):
+        self.failing_chat = failing_chat
+        self.sent = []
+
+    async def send_quiet(self, chat_id, text, **kwargs):
+        if chat_id == self.failing_chat:
+            return None
+        self.sent.append((chat_id, text))
+        return object()
+
+
+class ReminderSenderTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.dir.name, "tasks.db"))
+        self.db.run_sync(lambda conn: conn.executescript(SCHEMA))
+        self.db.run_sync(migrate)
+        self.tasks = TaskRepository(self.db)
+        self.reminders = ReminderRepository(self.db)
+        self.delivered = await self.tasks.create("@ivan", 1, "Отчет", "2025-05-10", 1)
+        self.failed = await self.tasks.create("@ivan", 2, "Звонок", "2025-05-10", 2)
+
+    async def asyncTearDown(self):
+        self.db.close()
+        self.dir.cleanup()
+
+    async def pending(self):
+        return {task_id: step for task_id, _, step, _ in await self.reminders.pending()}
+
+    async def test_failed_send_stays_pending(self):
+        for mode in ("digest", "single"):
+            with self.subTest(mode=mode):
+                notifier = FakeNotifier(failing_chat=2)
+                send = ReminderSender(self.tasks, self.reminders, notifier, mode=mode)
+                failed = await send([(self.delivered, 0), (self.failed, 0)])
+
+                self.assertEqual(failed, [self.failed])
+                self.assertEqual([chat_id for chat_id, _ in notifier.sent], [1])
+                self.assertEqual(await self.pending(), {self.delivered: 1, self.failed: None})
+
+    async def test_failed_task_is_retried(self):
+        notifier = FakeNotifier(failing_chat=2)
+        send = ReminderSender(self.tasks, self.reminders, notifier)
+        scheduler = DeadlineScheduler(send, retry_delay=0.05, repeat_interval=0)
+        scheduler.load(await self.reminders.pending())
+        runner = asyncio.create_task(scheduler.run())
+        try:
+            await asyncio.sleep(0.02)
+            self.assertEqual(len(notifier.sent), 1)
+            self.assertEqual(len(scheduler), 1)  # Недоставленное ждет повтора
+
+            notifier.failing_chat = None
+            await asyncio.sleep(0.1)
+            self.assertEqual([chat_id for chat_id, _ in notifier.sent], [1, 2])
+            self.assertEqual(len(scheduler), 0)
+            self.assertEqual(await self.pending(), {self.delivered: 1, self.failed: 1})
+        finally:
+            runner.cancel()
+
+
+class SchedulerRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_retry_skips_retracked_task(self):
+        async def fire(fired):
+            scheduler.track(1, "2000-01-02")  # Срок перенесли во время отправки
+            return [task_id for task_id, _ in fired]
+
+        scheduler = DeadlineScheduler(fire, retry_delay=3600, repeat_interval=0)
+        scheduler.track(1, "2000-01-01")
+        fired, previous = scheduler._pop_due(time.time())
+        advanced = {task_id: scheduler._state[task_id] for task_id in previous}
+        scheduler._retry(await fire(fired), previous, advanced, time.time())
+        self.assertEqual(scheduler._state[1][1], 0)
+        self.assertLess(scheduler._due[1], time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
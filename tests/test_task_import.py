@@ -0,0 +1,53 @@
+import unittest
+
+from repository import UserRow
+from task_import import executor_names, read_task_file
+
+USERS = [
+    UserRow("5", "Иван Петров", "@ivanp", None),
+    UserRow("6", "Анна", "annak", None),
+    UserRow("7", "Олег", "@oleg1", None),
+    UserRow("8", "Олег", "@oleg2", None),
+    UserRow("9", "Без ника", None, None),
+]
+
+
+def csv_file(*rows: str) -> bytes:
+    return "\n".join(("№;Исполнитель;Задача;Статус;Срок",) + rows).encode("utf-8")
+
+
+class ExecutorNamesTest(unittest.TestCase):
+
+    def test_names(self):
+        self.assertEqual(executor_names(USERS), {"Иван Петров": "@ivanp", "Анна": "@annak", "Олег": None})
+
+
+class ReadTaskFileTest(unittest.TestCase):
+
+    def read(self, *rows):
+        return read_task_file("tasks.csv", csv_file(*rows), executor_names(USERS))
+
+    def test_display_name_maps_to_username(self):
+        tasks, errors = self.read("1;Иван Петров;Отчет;в работе;2025-05-10", "2;Анна;Звонок;в работе;")
+        self.assertEqual(errors, [])
+        self.assertEqual([(task.executor, task.task_text, task.deadline) for task in tasks],
+                         [("@ivanp", "Отчет", "2025-05-10"), ("@annak", "Звонок", None)])
+
+    def test_username_and_empty_executor(self):
+        tasks, errors = self.read("1;@stranger;Отчет;;", "2;someone;Звонок;;", "3;None;Письмо;;", "4;;Счет;;")
+        self.assertEqual(errors, [])
+        self.assertEqual([task.executor for task in tasks], ["@stranger", "@someone", None, None])
+
+    def test_unknown_executor_is_error(self):
+        tasks, errors = self.read("1;Петр Иванов;Отчет;;", "2;Иван Петров;Звонок;;")
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(errors, ['Строка 2: Неизвестный исполнитель "Петр Иванов"'])
+
+    def test_ambiguous_name_is_error(self):
+        tasks, errors = self.read("1;Олег;Отчет;;")
+        self.assertEqual(tasks, [])
+        self.assertEqual(errors, ['Строка 2: Несколько пользователей с именем "Олег"'])
+
+
+if __name__ == "__main__":
+    unittest.main()